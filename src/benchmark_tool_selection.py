@@ -0,0 +1,114 @@
+"""
+Benchmark: גודל הפרומפט וזמן התגובה עם בחירת כלים (ToolRetriever) מול כל הכלים.
+
+הרצה מתיקיית הפרויקט, כמו הבוט עצמו (דורש את אותם משתני סביבה):
+
+    python src/benchmark_tool_selection.py          # מדידה מקומית: טוקנים של הגדרות הכלים ו-recall
+    python src/benchmark_tool_selection.py --live   # בנוסף: קריאה אמיתית למודל עם כל אחת מהאפשרויות
+"""
+
+import json
+import time
+import argparse
+import statistics
+from typing import List, Sequence
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from main import SYSTEM_MESSAGE, agent_tools, llm, tool_retriever
+from utils.token_budget import count_tokens
+
+# הודעות לדוגמה והכלי שהסוכן צריך כדי לענות עליהן
+SAMPLES = [
+    ("הצג את כל המוצרים בחנות", "list_products"),
+    ("תוריד 15% מהמחיר של חולצה כחולה", "update_price"),
+    ("שנה את המחיר של כובע קש ל-80 שקל", "update_price"),
+    ("תסיר את המבצע מהנעליים האדומות", "remove_discount"),
+    ("צור מוצר חדש: ספל קרמיקה במחיר 45 שקלים, 30 יחידות", "create_product"),
+    ("תעדכן את התיאור של ספל קרמיקה ל'ספל בעבודת יד'", "edit_product"),
+    ("מחק את המוצר מחזיק מפתחות", "delete_product"),
+    ("צור קופון SUMMER10 של 10 אחוז שתקף עד סוף אוגוסט", "create_coupon"),
+    ("תאריך את הקופון WELCOME עד 2025-12-31", "edit_coupon"),
+    ("מחק את הקופון BLACKFRIDAY", "delete_coupon"),
+    ("מה המצב של הזמנה 1043?", "get_order_details"),
+    ("תעדכן את הזמנה 1043 להושלמה", "update_order_status"),
+    ("אילו הזמנות היו ב-1 במרץ?", "search_orders"),
+    ("צור קטגוריה חדשה בשם אביזרי קיץ תחת אביזרים", "create_category"),
+    ("תשייך את כובע קש לקטגוריות קיץ ואביזרים", "assign_product_to_categories"),
+    ("מי הלקוחות שלי?", "list_customers"),
+    ("תן לי את הפרטים של הלקוחה דנה כהן", "get_customer_details"),
+    ("תעדכן את הטלפון של dana@example.com ל-0501234567", "update_customer"),
+    ("תרשום לקוח חדש: יוסי לוי yossi@example.com", "create_customer"),
+    ("אילו מוצרים עומדים להיגמר?", "get_low_stock_products"),
+    ("תוסיף 20 יחידות למלאי של חולצה כחולה", "update_product_stock"),
+    ("כמה נשאר במלאי מהמכנסיים השחורים?", "get_product_stock_status"),
+    ("מלאי לחולצה כחולה: מידה M 15, מידה L 25", "manage_product_stock_by_attributes"),
+    ("תקבע סף התראה של 5 יחידות לספל קרמיקה", "set_product_low_stock_threshold"),
+    ("כמה מכרתי החודש?", "get_sales"),
+    # ה' הידיעה וריבוי - אותה מילה בצורות שונות
+    ("מה עם ההזמנה האחרונה של דנה?", "search_orders"),
+    ("תראה לי את ההזמנות של יוסי לוי", "search_orders"),
+    ("תבטל את ההנחות על החולצות", "remove_discount"),
+    ("אילו קופונים והנחות פעילים?", "list_coupons"),
+    ("תוסיף את המוצרים החדשים לקטגוריה קיץ", "assign_product_to_categories"),
+]
+
+
+def tools_tokens(tools: Sequence) -> int:
+    """הטוקנים שהגדרות הכלים תופסות בבקשה למודל (ה-JSON schema של כל כלי)"""
+    return sum(count_tokens(json.dumps(convert_to_openai_tool(tool), ensure_ascii=False)) for tool in tools)
+
+
+def timed_call(tools: Sequence, message: str):
+    start = time.perf_counter()
+    response = llm.bind_tools(tools).invoke([SYSTEM_MESSAGE, ("human", message)])
+    elapsed = time.perf_counter() - start
+    usage = (response.response_metadata or {}).get("token_usage", {})
+    return elapsed, usage.get("prompt_tokens", 0)
+
+
+def main(live: bool = False) -> None:
+    full_tokens = tools_tokens(agent_tools)
+    system_tokens = count_tokens(SYSTEM_MESSAGE.content)
+    print(f"All tools: {len(agent_tools)} tools, {full_tokens} tokens of tool definitions "
+          f"(system message: {system_tokens} tokens), top_k={tool_retriever.top_k}\n")
+
+    hits = 0
+    selected_tokens: List[int] = []
+    select_times: List[float] = []
+    full_latency: List[float] = []
+    selected_latency: List[float] = []
+
+    for message, expected in SAMPLES:
+        start = time.perf_counter()
+        selected = tool_retriever.select(message)
+        select_times.append((time.perf_counter() - start) * 1000)
+        names = [tool.name for tool in selected]
+        hit = expected in names
+        hits += hit
+        tokens = tools_tokens(selected)
+        selected_tokens.append(tokens)
+        line = f"{'✓' if hit else '✗'} {len(selected):2d} tools {tokens:5d} tokens  {expected:36s} {message}"
+        if live:
+            full_time, full_prompt = timed_call(agent_tools, message)
+            selected_time, selected_prompt = timed_call(selected, message)
+            full_latency.append(full_time)
+            selected_latency.append(selected_time)
+            line += (f"\n      prompt {full_prompt} -> {selected_prompt} tokens, "
+                     f"latency {full_time:.2f}s -> {selected_time:.2f}s")
+        print(line)
+
+    average = statistics.mean(selected_tokens)
+    print(f"\nRecall (expected tool among the selected): {hits}/{len(SAMPLES)}")
+    print(f"Tool definition tokens per request: {full_tokens} -> {average:.0f} "
+          f"({100 * (1 - average / full_tokens):.0f}% less)")
+    print(f"Selection time: {statistics.mean(select_times):.2f} ms average")
+    if live:
+        print(f"Model latency (first call): {statistics.median(full_latency):.2f}s -> "
+              f"{statistics.median(selected_latency):.2f}s median")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare prompt size and latency with and without tool selection")
+    parser.add_argument("--live", action="store_true", help="also call the model with both tool lists (uses the OpenAI API)")
+    main(parser.parse_args().live)
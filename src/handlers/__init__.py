@@ -3,14 +3,26 @@ Handlers module for WordPress AI Agent.
 Contains handlers for different aspects of the WooCommerce store management.
 """
 
-from .media_handler import MediaHandler
-from .coupon_handler import CouponHandler
-from .order_handler import OrderHandler
-from .category_handler import CategoryHandler
-from .customer_handler import CustomerHandler
-from .inventory_handler import InventoryHandler
-from .product_handler import ProductHandler
-from .settings_handler import SettingsHandler
+from .media_handler import MediaHandler, AsyncMediaHandler
+from .coupon_handler import CouponHandler, AsyncCouponHandler
+from .order_handler import OrderHandler, AsyncOrderHandler
+from .category_handler import CategoryHandler, AsyncCategoryHandler
+from .customer_handler import CustomerHandler, AsyncCustomerHandler
+from .inventory_handler import InventoryHandler, AsyncInventoryHandler
+from .product_handler import ProductHandler, AsyncProductHandler
+from .settings_handler import SettingsHandler, AsyncSettingsHandler
+from .transport import WooTransport, AsyncWooTransport
+from .pagination import Paginator, AsyncPaginator
+from .batch import BatchWriter, AsyncBatchWriter
+from .product_cache import ProductCache
+from .product_index import ProductIndex
+from .customer_stats import CustomerSpendAggregator
+from .category_tree import CategoryTree
+from .store_mirror import StoreMirror
+from .sync_worker import SyncWorker
+from .webhooks import WebhookReceiver
+from .rate_limit import RateLimiter, RetryPolicy
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
 
 __all__ = [
     'MediaHandler',
@@ -20,5 +32,30 @@ __all__ = [
     'CustomerHandler',
     'InventoryHandler',
     'ProductHandler',
-    'SettingsHandler'
-] 
\ No newline at end of file
+    'SettingsHandler',
+    'AsyncMediaHandler',
+    'AsyncCouponHandler',
+    'AsyncOrderHandler',
+    'AsyncCategoryHandler',
+    'AsyncCustomerHandler',
+    'AsyncInventoryHandler',
+    'AsyncProductHandler',
+    'AsyncSettingsHandler',
+    'WooTransport',
+    'AsyncWooTransport',
+    'Paginator',
+    'AsyncPaginator',
+    'BatchWriter',
+    'AsyncBatchWriter',
+    'ProductCache',
+    'ProductIndex',
+    'CustomerSpendAggregator',
+    'CategoryTree',
+    'StoreMirror',
+    'SyncWorker',
+    'WebhookReceiver',
+    'RateLimiter',
+    'RetryPolicy',
+    'CircuitBreaker',
+    'CircuitOpenError'
+]
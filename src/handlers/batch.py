@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 100  # המקסימום ש-WooCommerce מאפשר בבקשת batch אחת (create+update+delete יחד)
+
+BATCH_ACTIONS = ("create", "update", "delete")
+
+# שם המפתח בתוצאה המאוחדת לכל פעולה
+RESULT_KEYS = {"create": "created", "update": "updated", "delete": "deleted"}
+
+
+def chunk_operations(create: Optional[List] = None, update: Optional[List] = None,
+                     delete: Optional[List] = None, size: int = MAX_BATCH_SIZE) -> List[Dict[str, List]]:
+    """חלוקת הפעולות לגופי בקשה של עד size פריטים, תוך שמירה על הסדר"""
+    operations = [(action, item)
+                  for action, items in zip(BATCH_ACTIONS, (create, update, delete))
+                  for item in (items or [])]
+    chunks = []
+    for start in range(0, len(operations), size):
+        payload: Dict[str, List] = {}
+        for action, item in operations[start:start + size]:
+            payload.setdefault(action, []).append(item)
+        chunks.append(payload)
+    return chunks
+
+
+def _item_ref(action: str, item) -> Dict:
+    """זיהוי פריט בהודעת שגיאה (מזהה אם יש, אחרת הפריט עצמו)"""
+    if action == "delete":
+        return {"id": item}
+    if isinstance(item, dict) and "id" in item:
+        return {"id": item["id"]}
+    return {"item": item}
+
+
+def merge_chunk_result(result: Dict, payload: Dict[str, List], response) -> None:
+    """הוספת התשובה של חלק אחד לתוצאה המאוחדת, כולל שגיאות ברמת הפריט"""
+    if response.status_code not in (200, 201):
+        error = response.text
+        logger.error(f"Batch chunk failed: {error}")
+        for action, items in payload.items():
+            for item in items:
+                result["errors"].append({"action": action, **_item_ref(action, item), "error": error})
+        return
+
+    data = response.json()
+    for action in BATCH_ACTIONS:
+        for item in data.get(action, []):
+            if isinstance(item, dict) and item.get("error"):
+                result["errors"].append({"action": action, "id": item.get("id"), "error": item["error"]})
+            else:
+                result[RESULT_KEYS[action]].append(item)
+
+
+def _empty_result() -> Dict[str, List]:
+    return {"created": [], "updated": [], "deleted": [], "errors": []}
+
+
+class BatchWriter:
+    """שליחת פעולות create/update/delete מרובות דרך נקודת batch של WooCommerce
+
+    הפעולות מחולקות לחלקים של עד 100 פריטים, החלקים נשלחים במקביל (עד
+    max_workers בו-זמנית) והתוצאה מאוחדת לפי הסדר המקורי:
+        {"created": [...], "updated": [...], "deleted": [...], "errors": [...]}
+    פריט שנכשל (או חלק שלם שנכשל) מופיע ב-errors ולא עוצר את שאר הפריטים.
+    """
+
+    def __init__(self, wcapi, endpoint: str, max_workers: Optional[int] = None,
+                 batch_size: int = MAX_BATCH_SIZE):
+        """
+        Args:
+            wcapi: שכבת התקשורת (WooTransport)
+            endpoint: נקודת הקצה של האוסף, למשל "products" או "products/12/variations"
+            max_workers: מספר בקשות מקביליות (ברירת מחדל: page_workers של שכבת התקשורת)
+            batch_size: מספר פריטים מקסימלי בבקשה
+        """
+        self.wcapi = wcapi
+        self.endpoint = f"{endpoint.strip('/')}/batch"
+        self.max_workers = max_workers or getattr(wcapi, "page_workers", 4)
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+
+    def _send(self, payload: Dict[str, List]) -> Tuple[Dict[str, List], object]:
+        try:
+            return payload, self.wcapi.post(self.endpoint, payload)
+        except Exception as e:
+            logger.error(f"Error sending batch to {self.endpoint}: {e}")
+            return payload, _FailedResponse(str(e))
+
+    def run(self, create: Optional[List[Dict]] = None, update: Optional[List[Dict]] = None,
+            delete: Optional[List[int]] = None) -> Dict[str, List]:
+        """ביצוע כל הפעולות והחזרת תוצאה לכל פריט"""
+        chunks = chunk_operations(create, update, delete, self.batch_size)
+        result = _empty_result()
+        if not chunks:
+            return result
+
+        logger.debug(f"Sending {len(chunks)} batch request(s) to {self.endpoint}")
+        if len(chunks) == 1:
+            responses = [self._send(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="wc-batch") as executor:
+                futures = [executor.submit(contextvars.copy_context().run, self._send, chunk) for chunk in chunks]
+                responses = [future.result() for future in futures]
+
+        for payload, response in responses:
+            merge_chunk_result(result, payload, response)
+        return result
+
+
+class AsyncBatchWriter(BatchWriter):
+    """גרסה אסינכרונית של BatchWriter עבור AsyncWooTransport"""
+
+    async def _send(self, payload: Dict[str, List]) -> Tuple[Dict[str, List], object]:
+        try:
+            return payload, await self.wcapi.post(self.endpoint, payload)
+        except Exception as e:
+            logger.error(f"Error sending batch to {self.endpoint}: {e}")
+            return payload, _FailedResponse(str(e))
+
+    async def run(self, create: Optional[List[Dict]] = None, update: Optional[List[Dict]] = None,
+                  delete: Optional[List[int]] = None) -> Dict[str, List]:
+        """ביצוע כל הפעולות והחזרת תוצאה לכל פריט"""
+        chunks = chunk_operations(create, update, delete, self.batch_size)
+        result = _empty_result()
+        if not chunks:
+            return result
+
+        logger.debug(f"Sending {len(chunks)} batch request(s) to {self.endpoint}")
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def send_limited(payload):
+            async with semaphore:
+                return await self._send(payload)
+
+        for payload, response in await asyncio.gather(*(send_limited(chunk) for chunk in chunks)):
+            merge_chunk_result(result, payload, response)
+        return result
+
+
+class _FailedResponse:
+    """תשובה מדומה לחלק שלא הגיע לשרת (שגיאת רשת וכו')"""
+
+    status_code = None
+
+    def __init__(self, text: str):
+        self.text = text
@@ -1,35 +1,58 @@
 import os
 import logging
-import requests
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
+from .transport import WooTransport, AsyncWooTransport, with_fields
+from .store_mirror import StoreMirror
+from .category_tree import CategoryTree, CATEGORY_TREE_FIELDS
 
 logger = logging.getLogger(__name__)
 
 class CategoryHandler:
     """מחלקה לניהול קטגוריות בחנות WooCommerce"""
     
-    def __init__(self, wp_url: str):
+    def __init__(self, wp_url: str, transport: Optional[WooTransport] = None,
+                 tree: Optional[CategoryTree] = None, mirror: Optional[StoreMirror] = None):
         """אתחול המחלקה עם כתובת האתר והרשאות"""
         self.wp_url = wp_url
-        self.auth_params = {
-            'consumer_key': os.getenv('WC_CONSUMER_KEY'),
-            'consumer_secret': os.getenv('WC_CONSUMER_SECRET')
-        }
+        self.wcapi = transport or WooTransport.from_env(wp_url)
+        self.mirror = mirror if mirror is not None else StoreMirror()
+        self.mirror.attach(self.wcapi)
+        self.tree = tree if tree is not None else CategoryTree()
+        self.tree.attach(self.wcapi)
         
-    def list_categories(self) -> List[Dict]:
+    def list_categories(self, fields: Optional[Iterable[str]] = None) -> List[Dict]:
         """קבלת רשימת כל הקטגוריות בחנות"""
         try:
-            response = requests.get(
-                f"{self.wp_url}/wp-json/wc/v3/products/categories",
-                params=self.auth_params,
-                verify=False
-            )
-            response.raise_for_status()
-            return response.json()
+            return self.wcapi.get_all("products/categories", params=with_fields(fields=fields))
         except Exception as e:
             logger.error(f"Error listing categories: {e}")
             raise Exception(f"שגיאה בקבלת רשימת הקטגוריות: {str(e)}")
             
+    def get_tree(self) -> CategoryTree:
+        """עץ הקטגוריות מהמטמון (נבנה מחדש מהחנות רק כשפג תוקפו)"""
+        if self.tree.needs_refresh():
+            # אחרי הפעלה מחדש העץ נבנה מהמראה המקומית, אם היא טרייה
+            categories = self.mirror.list_all("categories", CATEGORY_TREE_FIELDS)
+            if categories is None:
+                categories = self.list_categories(fields=CATEGORY_TREE_FIELDS)
+                self.mirror.replace_all("categories", categories, CATEGORY_TREE_FIELDS)
+            self.tree.build(categories)
+        return self.tree
+        
+    def find_category(self, name: str) -> Optional[Dict]:
+        """מציאת קטגוריה לפי שם מתוך עץ הקטגוריות, בלי פנייה לחנות"""
+        return self.get_tree().find(name)
+        
+    def get_category(self, category_id: int, fields: Optional[Iterable[str]] = None) -> Dict:
+        """קבלת קטגוריה בודדת ישירות מהחנות (למשל מספר מוצרים עדכני)"""
+        try:
+            response = self.wcapi.get(f"products/categories/{category_id}", params=with_fields(fields=fields))
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error getting category: {e}")
+            raise Exception(f"שגיאה בקבלת הקטגוריה: {str(e)}")
+            
     def create_category(self, name: str, description: str = "", parent_id: Optional[int] = None) -> Dict:
         """יצירת קטגוריה חדשה"""
         try:
@@ -40,14 +63,12 @@ class CategoryHandler:
             if parent_id:
                 data["parent"] = parent_id
                 
-            response = requests.post(
-                f"{self.wp_url}/wp-json/wc/v3/products/categories",
-                params=self.auth_params,
-                json=data,
-                verify=False
-            )
+            response = self.wcapi.post("products/categories", data)
             response.raise_for_status()
-            return response.json()
+            category = response.json()
+            self.tree.upsert(category)
+            self.mirror.put("categories", category)
+            return category
         except Exception as e:
             logger.error(f"Error creating category: {e}")
             raise Exception(f"שגיאה ביצירת הקטגוריה: {str(e)}")
@@ -55,14 +76,12 @@ class CategoryHandler:
     def update_category(self, category_id: int, **kwargs) -> Dict:
         """עדכון פרטי קטגוריה קיימת"""
         try:
-            response = requests.put(
-                f"{self.wp_url}/wp-json/wc/v3/products/categories/{category_id}",
-                params=self.auth_params,
-                json=kwargs,
-                verify=False
-            )
+            response = self.wcapi.put(f"products/categories/{category_id}", kwargs)
             response.raise_for_status()
-            return response.json()
+            category = response.json()
+            self.tree.upsert(category)
+            self.mirror.put("categories", category)
+            return category
         except Exception as e:
             logger.error(f"Error updating category: {e}")
             raise Exception(f"שגיאה בעדכון הקטגוריה: {str(e)}")
@@ -70,11 +89,7 @@ class CategoryHandler:
     def delete_category(self, category_id: int) -> Dict:
         """מחיקת קטגוריה"""
         try:
-            response = requests.delete(
-                f"{self.wp_url}/wp-json/wc/v3/products/categories/{category_id}",
-                params={**self.auth_params, "force": True},
-                verify=False
-            )
+            response = self.wcapi.delete(f"products/categories/{category_id}", params={"force": True})
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -88,14 +103,134 @@ class CategoryHandler:
                 "categories": [{"id": cat_id} for cat_id in category_ids]
             }
             
-            response = requests.put(
-                f"{self.wp_url}/wp-json/wc/v3/products/{product_id}",
-                params=self.auth_params,
-                json=data,
-                verify=False
-            )
+            response = self.wcapi.put(f"products/{product_id}", data)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error assigning product to categories: {e}")
+            raise Exception(f"שגיאה בשיוך המוצר לקטגוריות: {str(e)}")
+
+    def assign_products_to_category(self, product_ids: List[int], category_ids: List[int]) -> Dict:
+        """שיוך מוצרים רבים לקטגוריות דרך products/batch"""
+        try:
+            categories = [{"id": cat_id} for cat_id in category_ids]
+            return self.wcapi.batch("products", update=[
+                {"id": product_id, "categories": categories} for product_id in product_ids
+            ])
+        except Exception as e:
+            logger.error(f"Error assigning products to categories: {e}")
+            raise Exception(f"שגיאה בשיוך המוצרים לקטגוריות: {str(e)}")
+
+class AsyncCategoryHandler:
+    """גרסה אסינכרונית של CategoryHandler שאינה חוסמת את לולאת האירועים"""
+    
+    def __init__(self, wp_url: str, transport: Optional[AsyncWooTransport] = None,
+                 tree: Optional[CategoryTree] = None, mirror: Optional[StoreMirror] = None):
+        """אתחול המחלקה עם כתובת האתר והרשאות"""
+        self.wp_url = wp_url
+        self.wcapi = transport or AsyncWooTransport.from_env(wp_url)
+        self.mirror = mirror if mirror is not None else StoreMirror()
+        self.mirror.attach(self.wcapi)
+        self.tree = tree if tree is not None else CategoryTree()
+        self.tree.attach(self.wcapi)
+        
+    async def list_categories(self, fields: Optional[Iterable[str]] = None) -> List[Dict]:
+        """קבלת רשימת כל הקטגוריות בחנות"""
+        try:
+            return await self.wcapi.get_all("products/categories", params=with_fields(fields=fields))
+        except Exception as e:
+            logger.error(f"Error listing categories: {e}")
+            raise Exception(f"שגיאה בקבלת רשימת הקטגוריות: {str(e)}")
+            
+    async def get_tree(self) -> CategoryTree:
+        """עץ הקטגוריות מהמטמון (נבנה מחדש מהחנות רק כשפג תוקפו)"""
+        if self.tree.needs_refresh():
+            # אחרי הפעלה מחדש העץ נבנה מהמראה המקומית, אם היא טרייה
+            categories = self.mirror.list_all("categories", CATEGORY_TREE_FIELDS)
+            if categories is None:
+                categories = await self.list_categories(fields=CATEGORY_TREE_FIELDS)
+                self.mirror.replace_all("categories", categories, CATEGORY_TREE_FIELDS)
+            self.tree.build(categories)
+        return self.tree
+        
+    async def find_category(self, name: str) -> Optional[Dict]:
+        """מציאת קטגוריה לפי שם מתוך עץ הקטגוריות, בלי פנייה לחנות"""
+        return (await self.get_tree()).find(name)
+        
+    async def get_category(self, category_id: int, fields: Optional[Iterable[str]] = None) -> Dict:
+        """קבלת קטגוריה בודדת ישירות מהחנות (למשל מספר מוצרים עדכני)"""
+        try:
+            response = await self.wcapi.get(f"products/categories/{category_id}", params=with_fields(fields=fields))
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error getting category: {e}")
+            raise Exception(f"שגיאה בקבלת הקטגוריה: {str(e)}")
+            
+    async def create_category(self, name: str, description: str = "", parent_id: Optional[int] = None) -> Dict:
+        """יצירת קטגוריה חדשה"""
+        try:
+            data = {
+                "name": name,
+                "description": description
+            }
+            if parent_id:
+                data["parent"] = parent_id
+                
+            response = await self.wcapi.post("products/categories", data)
+            response.raise_for_status()
+            category = response.json()
+            self.tree.upsert(category)
+            self.mirror.put("categories", category)
+            return category
+        except Exception as e:
+            logger.error(f"Error creating category: {e}")
+            raise Exception(f"שגיאה ביצירת הקטגוריה: {str(e)}")
+            
+    async def update_category(self, category_id: int, **kwargs) -> Dict:
+        """עדכון פרטי קטגוריה קיימת"""
+        try:
+            response = await self.wcapi.put(f"products/categories/{category_id}", kwargs)
+            response.raise_for_status()
+            category = response.json()
+            self.tree.upsert(category)
+            self.mirror.put("categories", category)
+            return category
+        except Exception as e:
+            logger.error(f"Error updating category: {e}")
+            raise Exception(f"שגיאה בעדכון הקטגוריה: {str(e)}")
+            
+    async def delete_category(self, category_id: int) -> Dict:
+        """מחיקת קטגוריה"""
+        try:
+            response = await self.wcapi.delete(f"products/categories/{category_id}", params={"force": True})
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error deleting category: {e}")
+            raise Exception(f"שגיאה במחיקת הקטגוריה: {str(e)}")
+            
+    async def assign_product_to_category(self, product_id: int, category_ids: List[int]) -> Dict:
+        """שיוך מוצר לקטגוריות"""
+        try:
+            data = {
+                "categories": [{"id": cat_id} for cat_id in category_ids]
+            }
+            
+            response = await self.wcapi.put(f"products/{product_id}", data)
             response.raise_for_status()
             return response.json()
         except Exception as e:
             logger.error(f"Error assigning product to categories: {e}")
-            raise Exception(f"שגיאה בשיוך המוצר לקטגוריות: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"שגיאה בשיוך המוצר לקטגוריות: {str(e)}")
+
+    async def assign_products_to_category(self, product_ids: List[int], category_ids: List[int]) -> Dict:
+        """שיוך מוצרים רבים לקטגוריות דרך products/batch"""
+        try:
+            categories = [{"id": cat_id} for cat_id in category_ids]
+            return await self.wcapi.batch("products", update=[
+                {"id": product_id, "categories": categories} for product_id in product_ids
+            ])
+        except Exception as e:
+            logger.error(f"Error assigning products to categories: {e}")
+            raise Exception(f"שגיאה בשיוך המוצרים לקטגוריות: {str(e)}")
@@ -0,0 +1,157 @@
+import html
+import time
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .product_index import normalize_name
+
+logger = logging.getLogger(__name__)
+
+# השדות שנשלפים מהחנות לבניית העץ
+CATEGORY_TREE_FIELDS = ("id", "name", "parent", "count")
+
+
+def _name_key(name: str) -> str:
+    # WooCommerce מחזיר שמות קטגוריות עם ישויות HTML (&amp;)
+    return normalize_name(html.unescape(str(name)))
+
+
+class CategoryTree:
+    """עץ הקטגוריות בזיכרון, עם מיפוי מזהה -> קטגוריה ושם מנורמל -> קטגוריות
+
+    נבנה מרשימת הקטגוריות המלאה ומתעדכן ביצירה, עדכון ומחיקה דרך ההנדלר,
+    כך שזיהוי קטגוריה לפי שם לא דורש פנייה לחנות והצגת העץ כולו לינארית.
+    מספר המוצרים (count) מתעדכן רק בבנייה מחדש, כל ttl שניות.
+    """
+
+    def __init__(self, ttl: float = 300):
+        """
+        Args:
+            ttl: כל כמה שניות לבנות את העץ מחדש מהחנות
+        """
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._nodes: Dict[int, Dict] = {}  # id -> קטגוריה
+        self._children: Dict[int, List[int]] = {}  # id אב (0 = שורש) -> ids של הבנים
+        self._names: Dict[str, List[int]] = {}  # שם מנורמל -> ids (שם יכול לחזור תחת אבות שונים)
+        self._built_at: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "CategoryTree":
+        """יצירת עץ מתוך מילון ההגדרות של load_config"""
+        return cls(ttl=config['CATEGORY_TREE_TTL'])
+
+    def attach(self, transport) -> None:
+        """עדכון העץ לפי שינויים בקטגוריות שעוברים בשכבת התקשורת"""
+        transport.add_mutation_listener(self.on_mutation)
+
+    def needs_refresh(self) -> bool:
+        """האם צריך לבנות את העץ (לא נבנה עדיין, פג תוקפו או בוטל)"""
+        return self._built_at is None or time.monotonic() - self._built_at > self.ttl
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built_at = None
+
+    def build(self, categories: Iterable[Dict]) -> None:
+        """בניית העץ מחדש מכל הקטגוריות בחנות"""
+        with self._lock:
+            self._nodes.clear()
+            self._children.clear()
+            self._names.clear()
+            for category in categories:
+                self._add(category)
+            self._built_at = time.monotonic()
+        logger.debug(f"Built category tree: {len(self._nodes)} categories")
+
+    def upsert(self, category: Dict) -> None:
+        """הוספה או עדכון של קטגוריה (לפי התשובה של החנות)"""
+        if not isinstance(category, dict) or "id" not in category:
+            return
+        with self._lock:
+            existing = self._nodes.get(category["id"])
+            if existing is not None:
+                category = {**existing, **category}
+                self._unlink(existing)
+            self._add(category)
+
+    def remove(self, category_id: int) -> None:
+        """הסרת קטגוריה; הבנים שלה עוברים לאב שלה, כמו ב-WordPress"""
+        with self._lock:
+            category = self._nodes.pop(category_id, None)
+            if category is None:
+                return
+            self._unlink(category)
+            parent_id = category.get("parent") or 0
+            for child_id in self._children.pop(category_id, []):
+                self._nodes[child_id]["parent"] = parent_id
+                self._children.setdefault(parent_id, []).append(child_id)
+
+    def on_mutation(self, method: str, endpoint: str, data=None) -> None:
+        parts = endpoint.strip("/").split("/")
+        if parts[:2] != ["products", "categories"]:
+            return
+        if method == "DELETE" and len(parts) == 3 and parts[2].isdigit():
+            self.remove(int(parts[2]))
+        elif parts[2:3] == ["batch"]:
+            self.invalidate()
+        # יצירה ועדכון בודדים נכנסים לעץ מהתשובה (upsert) דרך ההנדלר
+
+    # ---- קריאה ----
+
+    def get(self, category_id: int) -> Optional[Dict]:
+        with self._lock:
+            category = self._nodes.get(category_id)
+            return dict(category) if category is not None else None
+
+    def find(self, name: str) -> Optional[Dict]:
+        """קטגוריה לפי שם (לא תלוי רישיות, ניקוד ורווחים); בשם כפול - הראשונה"""
+        with self._lock:
+            ids = self._names.get(_name_key(name))
+            return dict(self._nodes[ids[0]]) if ids else None
+
+    def parent_of(self, category: Dict) -> Optional[Dict]:
+        return self.get(category.get("parent") or 0)
+
+    def children(self, category_id: int = 0) -> List[Dict]:
+        with self._lock:
+            return [dict(self._nodes[child_id]) for child_id in self._children.get(category_id, [])]
+
+    def walk(self) -> Iterator[Tuple[Dict, int]]:
+        """מעבר על כל העץ לעומק (אב לפני בניו): (קטגוריה, עומק)"""
+        with self._lock:
+            roots = [cid for cid, c in self._nodes.items() if (c.get("parent") or 0) not in self._nodes]
+            stack = [(cid, 0) for cid in reversed(roots)]
+            ordered = []
+            while stack:
+                category_id, depth = stack.pop()
+                ordered.append((dict(self._nodes[category_id]), depth))
+                stack.extend((child_id, depth + 1) for child_id in reversed(self._children.get(category_id, [])))
+        return iter(ordered)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    # ---- עזר ----
+
+    def _add(self, category: Dict) -> None:
+        category_id = category.get("id")
+        if category_id is None:
+            return
+        category = dict(category)
+        self._nodes[category_id] = category
+        self._children.setdefault(category.get("parent") or 0, []).append(category_id)
+        if category.get("name"):
+            self._names.setdefault(_name_key(category["name"]), []).append(category_id)
+
+    def _unlink(self, category: Dict) -> None:
+        siblings = self._children.get(category.get("parent") or 0)
+        if siblings and category["id"] in siblings:
+            siblings.remove(category["id"])
+        if category.get("name"):
+            key = _name_key(category["name"])
+            ids = self._names.get(key)
+            if ids and category["id"] in ids:
+                ids.remove(category["id"])
+                if not ids:
+                    del self._names[key]
@@ -0,0 +1,135 @@
+import os
+import math
+import time
+import logging
+import threading
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def circuit_key(endpoint: str) -> str:
+    """המעגל שאליו שייכת נקודת קצה: "products/123" -> "products", "wp/v2/media/5" -> "wp/v2/media" """
+    parts = endpoint.strip("/").split("/")
+    if parts[:2] == ["products", "categories"]:
+        return "products/categories"
+    if parts[0] == "wp":
+        return "/".join(parts[:3])
+    return parts[0]
+
+
+class CircuitOpenError(Exception):
+    """החנות לא זמינה בנקודת הקצה הזו - הבקשה נכשלה מיד בלי לפנות אליה"""
+
+    def __init__(self, circuit: str, retry_in: float):
+        self.circuit = circuit
+        self.retry_in = retry_in
+        super().__init__(f"Store API is unavailable for {circuit} (circuit open), retry in {math.ceil(retry_in)}s")
+
+
+class CircuitBreaker:
+    """מפסק זרם לכל נקודת קצה של החנות (products, orders, wp/v2/media...)
+
+    אחרי failure_threshold כשלונות רצופים (שגיאת חיבור, timeout או 5xx)
+    המעגל נפתח: בקשות נכשלות מיד ב-CircuitOpenError (או מקבלות את התשובה
+    התקינה האחרונה, ראו שכבת התקשורת) במקום לחכות לחנות שלא עונה. אחרי
+    reset_timeout שניות עוברת בקשת בדיקה אחת (half-open); הצלחה סוגרת את
+    המעגל וכשלון פותח אותו מחדש. failure_threshold=0 מבטל את המפסק.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30, fallback_size: int = 128):
+        """
+        Args:
+            failure_threshold: כשלונות רצופים עד לפתיחת המעגל
+            reset_timeout: שניות עד לבקשת הבדיקה הראשונה
+            fallback_size: כמה תשובות GET תקינות אחרונות לשמור בכל שכבת תקשורת
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.fallback_size = fallback_size
+        self.rejected = 0
+        self._circuits: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        """יצירת מפסק לפי משתני הסביבה CIRCUIT_FAILURE_THRESHOLD / CIRCUIT_RESET_TIMEOUT"""
+        return cls(failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),
+                   reset_timeout=float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30')),
+                   fallback_size=int(os.getenv('CIRCUIT_FALLBACK_SIZE', '128')))
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "CircuitBreaker":
+        """יצירת מפסק מתוך מילון ההגדרות של load_config"""
+        return cls(failure_threshold=config['CIRCUIT_FAILURE_THRESHOLD'],
+                   reset_timeout=config['CIRCUIT_RESET_TIMEOUT'],
+                   fallback_size=config['CIRCUIT_FALLBACK_SIZE'])
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def allow(self, circuit: str) -> bool:
+        """האם לשלוח בקשה; במצב half-open רק בקשת בדיקה אחת עוברת"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            state = self._circuits.get(circuit)
+            if state is None or state["state"] == CLOSED:
+                return True
+            now = time.monotonic()
+            # גם בדיקה שלא דיווחה על תוצאה (נתקעה או נזרקה חריגה אחרת) לא חוסמת לתמיד
+            if now - state["opened_at"] >= self.reset_timeout:
+                state["state"] = HALF_OPEN
+                state["opened_at"] = now
+                logger.info(f"Circuit {circuit} half-open, probing the store")
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_in(self, circuit: str) -> float:
+        """שניות עד לבקשת הבדיקה הבאה"""
+        with self._lock:
+            state = self._circuits.get(circuit)
+            if state is None or state["state"] == CLOSED:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - state["opened_at"]))
+
+    def record_success(self, circuit: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            state = self._circuits.get(circuit)
+            if state is None:
+                return
+            if state["state"] != CLOSED:
+                logger.info(f"Circuit {circuit} closed, store is responding again")
+            del self._circuits[circuit]
+
+    def record_failure(self, circuit: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            state = self._circuits.setdefault(circuit, {"state": CLOSED, "failures": 0, "opened_at": 0.0})
+            state["failures"] += 1
+            if state["state"] == HALF_OPEN or (
+                    state["state"] == CLOSED and state["failures"] >= self.failure_threshold):
+                state["state"] = OPEN
+                state["opened_at"] = time.monotonic()
+                logger.warning(f"Circuit {circuit} opened after {state['failures']} consecutive failures, "
+                               f"failing fast for {self.reset_timeout:g}s")
+
+    def states(self) -> Dict[str, Dict]:
+        """מצב המעגלים שאינם תקינים לגמרי: {circuit: {"state", "failures"}}"""
+        with self._lock:
+            return {circuit: {"state": state["state"], "failures": state["failures"]}
+                    for circuit, state in self._circuits.items()}
+
+    def state(self, circuit: str) -> str:
+        with self._lock:
+            state = self._circuits.get(circuit)
+            return state["state"] if state is not None else CLOSED
@@ -1,8 +1,10 @@
 import os
 import logging
-from woocommerce import API
+from .transport import WooTransport, AsyncWooTransport, with_fields
+from .store_mirror import StoreMirror
 from dotenv import load_dotenv
 from datetime import datetime
+from typing import Iterable, Optional
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -11,26 +13,48 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+def build_coupon_data(code: str, discount_type: str, amount: float, description: str = None,
+                      expiry_date: str = None, min_amount: float = None, max_amount: float = None,
+                      individual_use: bool = True, exclude_sale_items: bool = False) -> dict:
+    """Build the WooCommerce payload for a new coupon"""
+    coupon_data = {
+        "code": code,
+        "discount_type": discount_type,
+        "amount": str(amount),
+        "individual_use": individual_use,
+        "exclude_sale_items": exclude_sale_items
+    }
+    
+    # Add optional fields
+    if description:
+        coupon_data["description"] = description
+    if expiry_date:
+        coupon_data["date_expires"] = f"{expiry_date}T23:59:59"
+    if min_amount:
+        coupon_data["minimum_amount"] = str(min_amount)
+    if max_amount:
+        coupon_data["maximum_amount"] = str(max_amount)
+    return coupon_data
+
+def stringify_amounts(fields: dict) -> dict:
+    """Convert numeric values to strings for the API"""
+    for key in ('amount', 'minimum_amount', 'maximum_amount'):
+        if key in fields:
+            fields[key] = str(fields[key])
+    return fields
+
 class CouponHandler:
-    def __init__(self, wp_url):
+    def __init__(self, wp_url, transport: Optional[WooTransport] = None, mirror: Optional[StoreMirror] = None):
         """Initialize CouponHandler with WooCommerce API credentials"""
         self.wp_url = wp_url
         
-        # Initialize WooCommerce API with WooCommerce API keys
-        wc_key = os.getenv('WC_CONSUMER_KEY')
-        wc_secret = os.getenv('WC_CONSUMER_SECRET')
-        
-        if not wc_key or not wc_secret:
-            raise ValueError("WooCommerce API keys not found in environment")
-            
+        # Shared WooCommerce transport (pooled keep-alive connections)
         logger.debug(f"Initializing WooCommerce API for coupons with URL: {wp_url}")
-        self.wcapi = API(
-            url=wp_url,
-            consumer_key=wc_key,
-            consumer_secret=wc_secret,
-            version="wc/v3",
-            timeout=30
-        )
+        self.wcapi = transport or WooTransport.from_env(wp_url)
+        
+        # Optional on-disk mirror, read before going to the store
+        self.mirror = mirror if mirror is not None else StoreMirror()
+        self.mirror.attach(self.wcapi)
     
     def create_coupon(self, code: str, discount_type: str, amount: float, description: str = None,
                      expiry_date: str = None, min_amount: float = None, max_amount: float = None,
@@ -52,24 +76,8 @@ class CouponHandler:
         try:
             logger.debug(f"Creating new coupon with code: {code}")
             
-            # Prepare coupon data
-            coupon_data = {
-                "code": code,
-                "discount_type": discount_type,
-                "amount": str(amount),
-                "individual_use": individual_use,
-                "exclude_sale_items": exclude_sale_items
-            }
-            
-            # Add optional fields
-            if description:
-                coupon_data["description"] = description
-            if expiry_date:
-                coupon_data["date_expires"] = f"{expiry_date}T23:59:59"
-            if min_amount:
-                coupon_data["minimum_amount"] = str(min_amount)
-            if max_amount:
-                coupon_data["maximum_amount"] = str(max_amount)
+            coupon_data = build_coupon_data(code, discount_type, amount, description, expiry_date,
+                                            min_amount, max_amount, individual_use, exclude_sale_items)
             
             # Create coupon
             response = self.wcapi.post("coupons", coupon_data)
@@ -85,35 +93,39 @@ class CouponHandler:
             logger.error(f"Error creating coupon: {str(e)}")
             raise
     
-    def list_coupons(self) -> list:
+    def list_coupons(self, fields: Optional[Iterable[str]] = None) -> list:
         """Get list of all coupons"""
         try:
             logger.debug("Fetching list of coupons")
             
-            response = self.wcapi.get("coupons")
-            
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch coupons. Status: {response.status_code}, Response: {response.text}")
-                raise Exception(f"Failed to fetch coupons: {response.text}")
-            
-            return response.json()
+            coupons = self.mirror.list_all("coupons", fields)
+            if coupons is None:
+                coupons = self.wcapi.get_all("coupons", params=with_fields(fields=fields))
+                self.mirror.replace_all("coupons", coupons, fields)
+            return coupons
             
         except Exception as e:
             logger.error(f"Error listing coupons: {str(e)}")
             raise
     
-    def get_coupon_details(self, coupon_id: int) -> dict:
+    def get_coupon_details(self, coupon_id: int, fields: Optional[Iterable[str]] = None) -> dict:
         """Get detailed information about a specific coupon"""
         try:
             logger.debug(f"Fetching details for coupon ID: {coupon_id}")
             
-            response = self.wcapi.get(f"coupons/{coupon_id}")
+            mirrored = self.mirror.get("coupons", coupon_id, fields)
+            if mirrored is not None:
+                return mirrored
+            
+            response = self.wcapi.get(f"coupons/{coupon_id}", params=with_fields(fields=fields))
             
             if response.status_code != 200:
                 logger.error(f"Failed to fetch coupon details. Status: {response.status_code}, Response: {response.text}")
                 raise Exception(f"Failed to fetch coupon details: {response.text}")
             
-            return response.json()
+            coupon = response.json()
+            self.mirror.put("coupons", coupon, fields)
+            return coupon
             
         except Exception as e:
             logger.error(f"Error getting coupon details: {str(e)}")
@@ -130,15 +142,7 @@ class CouponHandler:
         try:
             logger.debug(f"Updating coupon ID: {coupon_id}")
             
-            # Convert numeric values to strings for the API
-            if 'amount' in kwargs:
-                kwargs['amount'] = str(kwargs['amount'])
-            if 'minimum_amount' in kwargs:
-                kwargs['minimum_amount'] = str(kwargs['minimum_amount'])
-            if 'maximum_amount' in kwargs:
-                kwargs['maximum_amount'] = str(kwargs['maximum_amount'])
-            
-            response = self.wcapi.put(f"coupons/{coupon_id}", kwargs)
+            response = self.wcapi.put(f"coupons/{coupon_id}", stringify_amounts(kwargs))
             
             if response.status_code != 200:
                 logger.error(f"Failed to update coupon. Status: {response.status_code}, Response: {response.text}")
@@ -169,12 +173,149 @@ class CouponHandler:
             logger.error(f"Error deleting coupon: {str(e)}")
             raise
     
-    def search_coupons(self, search_term: str) -> list:
+    def batch_coupons(self, create: list = None, update: list = None, delete: list = None) -> dict:
+        """Create, update and delete many coupons at once through coupons/batch"""
+        try:
+            if create:
+                create = [stringify_amounts(dict(coupon)) for coupon in create]
+            if update:
+                update = [stringify_amounts(dict(coupon)) for coupon in update]
+            return self.wcapi.batch("coupons", create=create, update=update, delete=delete)
+            
+        except Exception as e:
+            logger.error(f"Error in coupons batch: {str(e)}")
+            raise
+    
+    def search_coupons(self, search_term: str, fields: Optional[Iterable[str]] = None) -> list:
         """Search for coupons by code or description"""
         try:
             logger.debug(f"Searching for coupons with term: {search_term}")
             
-            response = self.wcapi.get("coupons", params={"search": search_term})
+            response = self.wcapi.get("coupons", params=with_fields({"search": search_term}, fields))
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to search coupons. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to search coupons: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error searching coupons: {str(e)}")
+            raise
+
+
+class AsyncCouponHandler:
+    """Async variant of CouponHandler that does not block the event loop"""
+    
+    def __init__(self, wp_url, transport: Optional[AsyncWooTransport] = None, mirror: Optional[StoreMirror] = None):
+        """Initialize AsyncCouponHandler with a shared async transport"""
+        self.wp_url = wp_url
+        self.wcapi = transport or AsyncWooTransport.from_env(wp_url)
+        self.mirror = mirror if mirror is not None else StoreMirror()
+        self.mirror.attach(self.wcapi)
+    
+    async def create_coupon(self, code: str, discount_type: str, amount: float, description: str = None,
+                            expiry_date: str = None, min_amount: float = None, max_amount: float = None,
+                            individual_use: bool = True, exclude_sale_items: bool = False) -> dict:
+        """Create a new coupon"""
+        try:
+            logger.debug(f"Creating new coupon with code: {code}")
+            coupon_data = build_coupon_data(code, discount_type, amount, description, expiry_date,
+                                            min_amount, max_amount, individual_use, exclude_sale_items)
+            
+            response = await self.wcapi.post("coupons", coupon_data)
+            
+            if response.status_code != 201:
+                logger.error(f"Failed to create coupon. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to create coupon: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error creating coupon: {str(e)}")
+            raise
+    
+    async def list_coupons(self, fields: Optional[Iterable[str]] = None) -> list:
+        """Get list of all coupons"""
+        try:
+            coupons = self.mirror.list_all("coupons", fields)
+            if coupons is None:
+                coupons = await self.wcapi.get_all("coupons", params=with_fields(fields=fields))
+                self.mirror.replace_all("coupons", coupons, fields)
+            return coupons
+            
+        except Exception as e:
+            logger.error(f"Error listing coupons: {str(e)}")
+            raise
+    
+    async def get_coupon_details(self, coupon_id: int, fields: Optional[Iterable[str]] = None) -> dict:
+        """Get detailed information about a specific coupon"""
+        try:
+            mirrored = self.mirror.get("coupons", coupon_id, fields)
+            if mirrored is not None:
+                return mirrored
+            
+            response = await self.wcapi.get(f"coupons/{coupon_id}", params=with_fields(fields=fields))
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to fetch coupon details. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to fetch coupon details: {response.text}")
+            
+            coupon = response.json()
+            self.mirror.put("coupons", coupon, fields)
+            return coupon
+            
+        except Exception as e:
+            logger.error(f"Error getting coupon details: {str(e)}")
+            raise
+    
+    async def edit_coupon(self, coupon_id: int, **kwargs) -> dict:
+        """Edit an existing coupon"""
+        try:
+            response = await self.wcapi.put(f"coupons/{coupon_id}", stringify_amounts(kwargs))
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to update coupon. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to update coupon: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error updating coupon: {str(e)}")
+            raise
+    
+    async def delete_coupon(self, coupon_id: int, force: bool = True) -> dict:
+        """Delete a coupon"""
+        try:
+            response = await self.wcapi.delete(f"coupons/{coupon_id}", params={"force": force})
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to delete coupon. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to delete coupon: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error deleting coupon: {str(e)}")
+            raise
+    
+    async def batch_coupons(self, create: list = None, update: list = None, delete: list = None) -> dict:
+        """Create, update and delete many coupons at once through coupons/batch"""
+        try:
+            if create:
+                create = [stringify_amounts(dict(coupon)) for coupon in create]
+            if update:
+                update = [stringify_amounts(dict(coupon)) for coupon in update]
+            return await self.wcapi.batch("coupons", create=create, update=update, delete=delete)
+            
+        except Exception as e:
+            logger.error(f"Error in coupons batch: {str(e)}")
+            raise
+    
+    async def search_coupons(self, search_term: str, fields: Optional[Iterable[str]] = None) -> list:
+        """Search for coupons by code or description"""
+        try:
+            response = await self.wcapi.get("coupons", params=with_fields({"search": search_term}, fields))
             
             if response.status_code != 200:
                 logger.error(f"Failed to search coupons. Status: {response.status_code}, Response: {response.text}")
@@ -184,4 +325,4 @@ class CouponHandler:
             
         except Exception as e:
             logger.error(f"Error searching coupons: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
@@ -1,45 +1,72 @@
 import os
 import logging
+import httpx
 import requests
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
+from .transport import WooTransport, AsyncWooTransport, with_fields
+from .store_mirror import StoreMirror
+from .customer_stats import CustomerSpendAggregator, ORDER_SCAN_FIELDS, summarize_orders
 
 logger = logging.getLogger(__name__)
 
+# השדות הנדרשים מכל הזמנה לחישוב סך הרכישות
+TOTAL_SPENT_FIELDS = ("status", "total")
+
+def build_customer_data(first_name: str, last_name: str, email: str, **kwargs) -> Dict:
+    """בניית גוף הבקשה ליצירת לקוח, כולל ארגון שדות billing_* במבנה הנכון"""
+    data = {
+        "first_name": first_name,
+        "last_name": last_name,
+        "email": email,
+        "username": email,  # נדרש ע"י WooCommerce
+        "role": "customer"  # נדרש ע"י WooCommerce
+    }
+    
+    # אם יש פרטי חיוב, נארגן אותם במבנה הנכון
+    billing = {k.replace('billing_', '', 1): v for k, v in kwargs.items() if k.startswith('billing_')}
+    if billing:
+        data['billing'] = billing
+    
+    # הוספת שאר הפרמטרים
+    data.update({k: v for k, v in kwargs.items() if not k.startswith('billing_')})
+    return data
+
 class CustomerHandler:
     """מחלקה לניהול לקוחות בחנות WooCommerce"""
     
-    def __init__(self, wp_url: str):
+    def __init__(self, wp_url: str, transport: Optional[WooTransport] = None,
+                 stats: Optional[CustomerSpendAggregator] = None, mirror: Optional[StoreMirror] = None):
         """אתחול המחלקה עם כתובת האתר והרשאות"""
         self.wp_url = wp_url
-        self.auth_params = {
-            'consumer_key': os.getenv('WC_CONSUMER_KEY'),
-            'consumer_secret': os.getenv('WC_CONSUMER_SECRET')
-        }
+        self.wcapi = transport or WooTransport.from_env(wp_url)
+        self.mirror = mirror if mirror is not None else StoreMirror()
+        self.mirror.attach(self.wcapi)
+        self.stats = stats if stats is not None else CustomerSpendAggregator()
+        self.stats.attach(self.wcapi)
         
-    def list_customers(self, page: int = 1, per_page: int = 10) -> List[Dict]:
+    def list_customers(self, page: int = 1, per_page: int = 10,
+                       fields: Optional[Iterable[str]] = None) -> List[Dict]:
         """קבלת רשימת כל הלקוחות בחנות"""
         try:
-            response = requests.get(
-                f"{self.wp_url}/wp-json/wc/v3/customers",
-                params={**self.auth_params, "page": page, "per_page": per_page},
-                verify=False
-            )
+            response = self.wcapi.get("customers", params=with_fields({"page": page, "per_page": per_page}, fields))
             response.raise_for_status()
             return response.json()
         except Exception as e:
             logger.error(f"Error listing customers: {e}")
             raise Exception(f"שגיאה בקבלת רשימת הלקוחות: {str(e)}")
             
-    def get_customer_details(self, customer_id: int) -> Dict:
+    def get_customer_details(self, customer_id: int, fields: Optional[Iterable[str]] = None) -> Dict:
         """קבלת פרטים מלאים על לקוח ספציפי"""
         try:
-            response = requests.get(
-                f"{self.wp_url}/wp-json/wc/v3/customers/{customer_id}",
-                params=self.auth_params,
-                verify=False
-            )
+            mirrored = self.mirror.get("customers", customer_id, fields)
+            if mirrored is not None:
+                return mirrored
+            
+            response = self.wcapi.get(f"customers/{customer_id}", params=with_fields(fields=fields))
             response.raise_for_status()
-            return response.json()
+            customer = response.json()
+            self.mirror.put("customers", customer, fields)
+            return customer
         except Exception as e:
             logger.error(f"Error getting customer details: {e}")
             raise Exception(f"שגיאה בקבלת פרטי הלקוח: {str(e)}")
@@ -47,52 +74,57 @@ class CustomerHandler:
     def update_customer(self, customer_id: int, **kwargs) -> Dict:
         """עדכון פרטי לקוח"""
         try:
-            response = requests.put(
-                f"{self.wp_url}/wp-json/wc/v3/customers/{customer_id}",
-                params=self.auth_params,
-                json=kwargs,
-                verify=False
-            )
+            response = self.wcapi.put(f"customers/{customer_id}", kwargs)
             response.raise_for_status()
             return response.json()
         except Exception as e:
             logger.error(f"Error updating customer: {e}")
             raise Exception(f"שגיאה בעדכון פרטי הלקוח: {str(e)}")
             
-    def search_customers(self, search: str) -> List[Dict]:
+    def batch_customers(self, create: List[Dict] = None, update: List[Dict] = None,
+                        delete: List[int] = None) -> Dict:
+        """יצירה, עדכון ומחיקה של לקוחות רבים דרך customers/batch"""
+        try:
+            return self.wcapi.batch("customers", create=create, update=update, delete=delete)
+        except Exception as e:
+            logger.error(f"Error in customers batch: {e}")
+            raise Exception(f"שגיאה בעדכון קבוצתי של לקוחות: {str(e)}")
+            
+    def search_customers(self, search: str, fields: Optional[Iterable[str]] = None) -> List[Dict]:
         """חיפוש לקוחות לפי טקסט חופשי"""
         try:
-            response = requests.get(
-                f"{self.wp_url}/wp-json/wc/v3/customers",
-                params={**self.auth_params, "search": search},
-                verify=False
-            )
+            response = self.wcapi.get("customers", params=with_fields({"search": search}, fields))
             response.raise_for_status()
             return response.json()
         except Exception as e:
             logger.error(f"Error searching customers: {e}")
             raise Exception(f"שגיאה בחיפוש לקוחות: {str(e)}")
             
-    def get_customer_orders(self, customer_id: int) -> List[Dict]:
+    def get_customer_orders(self, customer_id: int, fields: Optional[Iterable[str]] = None) -> List[Dict]:
         """קבלת רשימת ההזמנות של לקוח ספציפי"""
         try:
-            response = requests.get(
-                f"{self.wp_url}/wp-json/wc/v3/orders",
-                params={**self.auth_params, "customer": customer_id},
-                verify=False
-            )
-            response.raise_for_status()
-            return response.json()
+            return self.wcapi.get_all("orders", params=with_fields({"customer": customer_id}, fields))
         except Exception as e:
             logger.error(f"Error getting customer orders: {e}")
             raise Exception(f"שגיאה בקבלת הזמנות הלקוח: {str(e)}")
             
+    def get_customers_summary(self, customer_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict]:
+        """סיכום רכישות (total_spent, orders_count, last_order_date) ללקוחות רבים מסריקה אחת של ההזמנות"""
+        try:
+            if self.stats.needs_scan():
+                params = self.stats.scan_params()
+                orders = self.wcapi.get_all("orders", params=with_fields(params, ORDER_SCAN_FIELDS))
+                self.stats.apply(orders, full=not params)
+            return self.stats.summaries(customer_ids)
+        except Exception as e:
+            logger.error(f"Error aggregating customer orders: {e}")
+            raise Exception(f"שגיאה בחישוב סיכומי הלקוחות: {str(e)}")
+            
     def get_customer_total_spent(self, customer_id: int) -> float:
         """חישוב סך כל הרכישות של לקוח"""
         try:
-            orders = self.get_customer_orders(customer_id)
-            total = sum(float(order['total']) for order in orders if order['status'] == 'completed')
-            return total
+            orders = self.get_customer_orders(customer_id, fields=TOTAL_SPENT_FIELDS)
+            return summarize_orders(orders)['total_spent']
         except Exception as e:
             logger.error(f"Error calculating customer total spent: {e}")
             raise Exception(f"שגיאה בחישוב סך הרכישות: {str(e)}")
@@ -100,35 +132,11 @@ class CustomerHandler:
     def create_customer(self, first_name: str, last_name: str, email: str, **kwargs) -> Dict:
         """יצירת לקוח חדש"""
         try:
-            data = {
-                "first_name": first_name,
-                "last_name": last_name,
-                "email": email,
-                "username": email,  # נדרש ע"י WooCommerce
-                "role": "customer"  # נדרש ע"י WooCommerce
-            }
-            
-            # אם יש פרטי חיוב, נארגן אותם במבנה הנכון
-            if any(k.startswith('billing_') for k in kwargs):
-                billing = {}
-                for k, v in dict(kwargs).items():
-                    if k.startswith('billing_'):
-                        billing_key = k.replace('billing_', '')
-                        billing[billing_key] = v
-                        del kwargs[k]
-                data['billing'] = billing
-            
-            # הוספת שאר הפרמטרים
-            data.update({k: v for k, v in kwargs.items() if not k.startswith('billing_')})
+            data = build_customer_data(first_name, last_name, email, **kwargs)
             
             logger.info(f"Creating customer with data: {data}")
             
-            response = requests.post(
-                f"{self.wp_url}/wp-json/wc/v3/customers",
-                params=self.auth_params,
-                json=data,
-                verify=False
-            )
+            response = self.wcapi.post("customers", data)
             
             if response.status_code != 201:
                 logger.error(f"Error response from WooCommerce: {response.status_code} - {response.text}")
@@ -144,4 +152,127 @@ class CustomerHandler:
             raise Exception(f"שגיאת רשת ביצירת הלקוח: {str(e)}")
         except Exception as e:
             logger.error(f"Error creating customer: {e}")
-            raise Exception(f"שגיאה ביצירת הלקוח: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"שגיאה ביצירת הלקוח: {str(e)}") 
+
+
+class AsyncCustomerHandler:
+    """גרסה אסינכרונית של CustomerHandler שאינה חוסמת את לולאת האירועים"""
+    
+    def __init__(self, wp_url: str, transport: Optional[AsyncWooTransport] = None,
+                 stats: Optional[CustomerSpendAggregator] = None, mirror: Optional[StoreMirror] = None):
+        """אתחול המחלקה עם כתובת האתר והרשאות"""
+        self.wp_url = wp_url
+        self.wcapi = transport or AsyncWooTransport.from_env(wp_url)
+        self.mirror = mirror if mirror is not None else StoreMirror()
+        self.mirror.attach(self.wcapi)
+        self.stats = stats if stats is not None else CustomerSpendAggregator()
+        self.stats.attach(self.wcapi)
+        
+    async def list_customers(self, page: int = 1, per_page: int = 10,
+                             fields: Optional[Iterable[str]] = None) -> List[Dict]:
+        """קבלת רשימת כל הלקוחות בחנות"""
+        try:
+            response = await self.wcapi.get("customers", params=with_fields({"page": page, "per_page": per_page}, fields))
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error listing customers: {e}")
+            raise Exception(f"שגיאה בקבלת רשימת הלקוחות: {str(e)}")
+            
+    async def get_customer_details(self, customer_id: int, fields: Optional[Iterable[str]] = None) -> Dict:
+        """קבלת פרטים מלאים על לקוח ספציפי"""
+        try:
+            mirrored = self.mirror.get("customers", customer_id, fields)
+            if mirrored is not None:
+                return mirrored
+            
+            response = await self.wcapi.get(f"customers/{customer_id}", params=with_fields(fields=fields))
+            response.raise_for_status()
+            customer = response.json()
+            self.mirror.put("customers", customer, fields)
+            return customer
+        except Exception as e:
+            logger.error(f"Error getting customer details: {e}")
+            raise Exception(f"שגיאה בקבלת פרטי הלקוח: {str(e)}")
+            
+    async def update_customer(self, customer_id: int, **kwargs) -> Dict:
+        """עדכון פרטי לקוח"""
+        try:
+            response = await self.wcapi.put(f"customers/{customer_id}", kwargs)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error updating customer: {e}")
+            raise Exception(f"שגיאה בעדכון פרטי הלקוח: {str(e)}")
+            
+    async def batch_customers(self, create: List[Dict] = None, update: List[Dict] = None,
+                              delete: List[int] = None) -> Dict:
+        """יצירה, עדכון ומחיקה של לקוחות רבים דרך customers/batch"""
+        try:
+            return await self.wcapi.batch("customers", create=create, update=update, delete=delete)
+        except Exception as e:
+            logger.error(f"Error in customers batch: {e}")
+            raise Exception(f"שגיאה בעדכון קבוצתי של לקוחות: {str(e)}")
+            
+    async def search_customers(self, search: str, fields: Optional[Iterable[str]] = None) -> List[Dict]:
+        """חיפוש לקוחות לפי טקסט חופשי"""
+        try:
+            response = await self.wcapi.get("customers", params=with_fields({"search": search}, fields))
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error searching customers: {e}")
+            raise Exception(f"שגיאה בחיפוש לקוחות: {str(e)}")
+            
+    async def get_customer_orders(self, customer_id: int, fields: Optional[Iterable[str]] = None) -> List[Dict]:
+        """קבלת רשימת ההזמנות של לקוח ספציפי"""
+        try:
+            return await self.wcapi.get_all("orders", params=with_fields({"customer": customer_id}, fields))
+        except Exception as e:
+            logger.error(f"Error getting customer orders: {e}")
+            raise Exception(f"שגיאה בקבלת הזמנות הלקוח: {str(e)}")
+            
+    async def get_customers_summary(self, customer_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict]:
+        """סיכום רכישות (total_spent, orders_count, last_order_date) ללקוחות רבים מסריקה אחת של ההזמנות"""
+        try:
+            if self.stats.needs_scan():
+                params = self.stats.scan_params()
+                orders = await self.wcapi.get_all("orders", params=with_fields(params, ORDER_SCAN_FIELDS))
+                self.stats.apply(orders, full=not params)
+            return self.stats.summaries(customer_ids)
+        except Exception as e:
+            logger.error(f"Error aggregating customer orders: {e}")
+            raise Exception(f"שגיאה בחישוב סיכומי הלקוחות: {str(e)}")
+            
+    async def get_customer_total_spent(self, customer_id: int) -> float:
+        """חישוב סך כל הרכישות של לקוח"""
+        try:
+            orders = await self.get_customer_orders(customer_id, fields=TOTAL_SPENT_FIELDS)
+            return summarize_orders(orders)['total_spent']
+        except Exception as e:
+            logger.error(f"Error calculating customer total spent: {e}")
+            raise Exception(f"שגיאה בחישוב סך הרכישות: {str(e)}")
+            
+    async def create_customer(self, first_name: str, last_name: str, email: str, **kwargs) -> Dict:
+        """יצירת לקוח חדש"""
+        try:
+            data = build_customer_data(first_name, last_name, email, **kwargs)
+            logger.info(f"Creating customer with data: {data}")
+            
+            response = await self.wcapi.post("customers", data)
+            
+            if response.status_code != 201:
+                logger.error(f"Error response from WooCommerce: {response.status_code} - {response.text}")
+                error_data = response.json() if response.text else {}
+                if 'message' in error_data:
+                    raise Exception(f"שגיאה מ-WooCommerce: {error_data['message']}")
+                raise Exception(f"שגיאה ביצירת הלקוח: {response.status_code} - {response.text}")
+            
+            return response.json()
+            
+        except httpx.HTTPError as e:
+            logger.error(f"Network error creating customer: {e}")
+            raise Exception(f"שגיאת רשת ביצירת הלקוח: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error creating customer: {e}")
+            raise Exception(f"שגיאה ביצירת הלקוח: {str(e)}")
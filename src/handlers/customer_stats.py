@@ -0,0 +1,159 @@
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# השדות שנשלפים מכל הזמנה בסריקה (סריקה מלאה של עמודי ההזמנות, לא בקשה לכל לקוח)
+ORDER_SCAN_FIELDS = ("id", "customer_id", "status", "total", "date_created", "date_modified_gmt")
+
+# סטטוס שנחשב לרכישה בסך הרכישות
+COMPLETED_STATUS = "completed"
+
+
+def empty_summary() -> Dict:
+    return {"total_spent": 0.0, "orders_count": 0, "last_order_date": None}
+
+
+def summarize_orders(orders: Iterable[Dict]) -> Dict:
+    """סיכום הזמנות של לקוח אחד: סך רכישות (הזמנות שהושלמו), מספר הזמנות ותאריך הזמנה אחרונה"""
+    summary = empty_summary()
+    for order in orders:
+        _add_order(summary, order.get("status"), order.get("total"), order.get("date_created"))
+    return summary
+
+
+def _add_order(summary: Dict, status: Optional[str], total, date_created: Optional[str]) -> None:
+    summary["orders_count"] += 1
+    if status == COMPLETED_STATUS:
+        summary["total_spent"] += float(total or 0)
+    if date_created and (summary["last_order_date"] is None or date_created > summary["last_order_date"]):
+        summary["last_order_date"] = date_created
+
+
+class CustomerSpendAggregator:
+    """סיכומי רכישות לכל הלקוחות מסריקה אחת של ההזמנות, עם עדכון מצטבר
+
+    הסריקה הראשונה עוברת על כל עמודי ההזמנות (בקשה לכל עמוד, לא לכל לקוח)
+    ושומרת לכל הזמנה רק את השדות הדרושים. הסריקות הבאות שולפות רק הזמנות
+    ששונו מאז הסריקה הקודמת (modified_after), וסריקה מלאה חוזרת כל
+    full_refresh שניות כדי לתפוס הזמנות שנמחקו לצמיתות.
+
+    המחלקה לא פונה לחנות בעצמה - ההנדלר שולף לפי scan_params() ומעביר
+    את התוצאה ל-apply(), כך שאותו מצב משמש גם את הגרסה האסינכרונית.
+    """
+
+    def __init__(self, ttl: float = 60, full_refresh: float = 3600):
+        """
+        Args:
+            ttl: כמה שניות הסיכומים נחשבים טריים לפני סריקה מצטברת
+            full_refresh: כל כמה שניות לבצע סריקה מלאה מחדש
+        """
+        self.ttl = ttl
+        self.full_refresh = full_refresh
+        self._lock = threading.RLock()
+        self._orders: Dict[int, tuple] = {}  # id -> (customer_id, status, total, date_created)
+        self._summaries: Optional[Dict[int, Dict]] = None
+        self._cursor: Optional[str] = None  # date_modified_gmt המאוחר ביותר שנראה
+        self._scanned_at: Optional[float] = None
+        self._full_scan_at: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "CustomerSpendAggregator":
+        """יצירת מצבר מתוך מילון ההגדרות של load_config"""
+        return cls(ttl=config['CUSTOMER_STATS_TTL'])
+
+    def attach(self, transport) -> None:
+        """סימון הסיכומים כלא-טריים בכל שינוי הזמנה שעובר בשכבת התקשורת"""
+        transport.add_mutation_listener(self.on_mutation)
+
+    def on_mutation(self, method: str, endpoint: str, data=None) -> None:
+        parts = endpoint.strip("/").split("/")
+        if parts[0] != "orders":
+            return
+        with self._lock:
+            if method == "DELETE" and len(parts) == 2 and parts[1].isdigit():
+                # הזמנה שנמחקה לא תופיע בסריקה מצטברת
+                self.remove_orders([int(parts[1])])
+            elif parts[1:2] == ["batch"]:
+                self.remove_orders((data or {}).get("delete", []))
+            self._scanned_at = None
+
+    def needs_scan(self) -> bool:
+        return self._scanned_at is None or time.monotonic() - self._scanned_at > self.ttl
+
+    def needs_full_scan(self) -> bool:
+        return (self._cursor is None or self._full_scan_at is None
+                or time.monotonic() - self._full_scan_at > self.full_refresh)
+
+    def scan_params(self) -> Dict:
+        """פרמטרים לסריקה הבאה: הכל בסריקה מלאה, או רק הזמנות ששונו מאז הסמן"""
+        if self.needs_full_scan():
+            return {}
+        # שנייה של חפיפה - הזמנה ששונתה באותה שנייה של הסמן לא תפוספס (החלה חוזרת לא משנה)
+        since = datetime.fromisoformat(self._cursor) - timedelta(seconds=1)
+        return {"modified_after": since.isoformat(), "dates_are_gmt": "true"}
+
+    def apply(self, orders: List[Dict], full: bool) -> None:
+        """עדכון המצב בתוצאות סריקה (full=True מחליף את כל ההזמנות השמורות)"""
+        now = time.monotonic()
+        with self._lock:
+            if full:
+                self._orders.clear()
+                self._full_scan_at = now
+            for order in orders:
+                if "id" not in order:
+                    continue
+                modified = order.get("date_modified_gmt")
+                if modified and (self._cursor is None or modified > self._cursor):
+                    self._cursor = modified
+                if order.get("status") == "trash":
+                    self._orders.pop(order["id"], None)
+                    continue
+                self._orders[order["id"]] = (
+                    order.get("customer_id"), order.get("status"),
+                    order.get("total"), order.get("date_created"),
+                )
+            if full and self._cursor is None:
+                # חנות בלי הזמנות - הסריקה הבאה עדיין יכולה להיות מצטברת
+                self._cursor = datetime.utcnow().replace(microsecond=0).isoformat()
+            self._summaries = None
+            self._scanned_at = now
+        logger.debug(f"Applied {'full' if full else 'incremental'} order scan: "
+                     f"{len(orders)} orders, {len(self._orders)} tracked")
+
+    def apply_changes(self, orders: List[Dict]) -> None:
+        """החלת הזמנות ששונו שהגיעו ממקור חיצוני (עובד הסנכרון) - רק אחרי סריקה מלאה ראשונה"""
+        if self._full_scan_at is None:
+            return
+        self.apply(orders, full=False)
+
+    def remove_orders(self, order_ids: Iterable[int]) -> None:
+        """הסרת הזמנות שנמחקו מהסיכומים"""
+        with self._lock:
+            for order_id in order_ids:
+                if self._orders.pop(order_id, None) is not None:
+                    self._summaries = None
+
+    def summaries(self, customer_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict]:
+        """סיכום לכל לקוח: {customer_id: {"total_spent", "orders_count", "last_order_date"}}
+
+        לקוח ללא הזמנות מקבל סיכום ריק; הזמנות אורח (customer_id=0) לא נספרות.
+        """
+        with self._lock:
+            if self._summaries is None:
+                summaries: Dict[int, Dict] = {}
+                for customer_id, status, total, date_created in self._orders.values():
+                    if not customer_id:
+                        continue
+                    summary = summaries.get(customer_id)
+                    if summary is None:
+                        summary = summaries[customer_id] = empty_summary()
+                    _add_order(summary, status, total, date_created)
+                self._summaries = summaries
+            if customer_ids is None:
+                return {customer_id: dict(summary) for customer_id, summary in self._summaries.items()}
+            return {customer_id: dict(self._summaries.get(customer_id) or empty_summary())
+                    for customer_id in customer_ids}
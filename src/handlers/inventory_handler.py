@@ -1,7 +1,7 @@
 import os
 import logging
-from typing import List, Dict, Optional
-from woocommerce import API
+from typing import Iterable, List, Dict, Optional
+from .transport import WooTransport, AsyncWooTransport, with_fields
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -12,53 +12,102 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+STOCK_OPERATIONS = ('set', 'add', 'subtract')
+
+# השדות שנשלפים מהחנות לכל פעולת מלאי (נשלחים כ-_fields)
+LOW_STOCK_REQUIRED_FIELDS = ('manage_stock', 'stock_quantity')
+STOCK_STATUS_FIELDS = ('id', 'name', 'manage_stock', 'stock_quantity', 'stock_status',
+                       'backorders_allowed', 'low_stock_amount')
+
+def is_low_stock(product: Dict, threshold: int) -> bool:
+    """האם למוצר יש ניהול מלאי וכמות שמתחת לסף"""
+    return bool(product.get('manage_stock', False)) and (product.get('stock_quantity') or 0) <= threshold
+
+def filter_low_stock(products: Iterable[Dict], threshold: int) -> List[Dict]:
+    """סינון מוצרים עם ניהול מלאי שהכמות שלהם מתחת לסף"""
+    return [product for product in products if is_low_stock(product, threshold)]
+
+def low_stock_fields(fields: Optional[Iterable[str]]) -> Optional[List[str]]:
+    """השדות לסריקת מלאי נמוך - תמיד כולל את השדות שהסינון צריך"""
+    if not fields:
+        return None
+    return list(dict.fromkeys([*fields, *LOW_STOCK_REQUIRED_FIELDS]))
+
+def compute_new_stock(current_stock: int, quantity: int, operation: str) -> int:
+    """חישוב כמות המלאי החדשה לפי סוג הפעולה"""
+    current_stock = current_stock or 0
+    if operation == 'set':
+        return quantity
+    if operation == 'add':
+        return current_stock + quantity
+    if operation == 'subtract':
+        return current_stock - quantity
+    raise ValueError("Invalid operation. Must be 'set', 'add', or 'subtract'")
+
+def build_stock_status(product_id: int, product: Dict) -> Dict:
+    """תמצית סטטוס המלאי של מוצר"""
+    return {
+        "product_id": product_id,
+        "name": product.get('name'),
+        "manage_stock": product.get('manage_stock', False),
+        "stock_quantity": product.get('stock_quantity', 0),
+        "stock_status": product.get('stock_status', 'instock'),
+        "backorders_allowed": product.get('backorders_allowed', False),
+        "low_stock_amount": product.get('low_stock_amount', None)
+    }
+
+def build_variations(attributes: Dict[str, Dict[str, int]]) -> List[Dict]:
+    """בניית נתוני וריאציות מתוך מילון מאפיינים וכמויות"""
+    variations = []
+    for attr_name, attr_values in attributes.items():
+        for value, quantity in attr_values.items():
+            variations.append({
+                "manage_stock": True,
+                "stock_quantity": quantity,
+                "attributes": [
+                    {
+                        "name": attr_name,
+                        "option": value
+                    }
+                ]
+            })
+    return variations
+
+def build_variations_result(result: Dict) -> Dict:
+    """סיכום תוצאת ה-batch של הווריאציות; נכשל רק אם אף וריאציה לא עודכנה"""
+    if result["errors"] and not result["created"]:
+        raise Exception(f"Failed to create/update variations: {result['errors']}")
+    return {
+        "status": "partial" if result["errors"] else "success",
+        "variations_updated": len(result["created"]),
+        "errors": result["errors"]
+    }
+
+
 class InventoryHandler:
     """מחלקה לניהול מלאי מתקדם בחנות WooCommerce"""
     
-    def __init__(self, wp_url: str):
+    def __init__(self, wp_url: str, transport: Optional[WooTransport] = None):
         """אתחול המחלקה עם כתובת האתר והרשאות"""
         self.wp_url = wp_url
         
-        # Initialize WooCommerce API
-        wc_key = os.getenv('WC_CONSUMER_KEY')
-        wc_secret = os.getenv('WC_CONSUMER_SECRET')
-        
-        if not wc_key or not wc_secret:
-            raise ValueError("WooCommerce API keys not found in environment")
-            
+        # Shared WooCommerce transport (pooled keep-alive connections)
         logger.debug(f"Initializing WooCommerce API for inventory with URL: {wp_url}")
-        self.wcapi = API(
-            url=wp_url,
-            consumer_key=wc_key,
-            consumer_secret=wc_secret,
-            version="wc/v3",
-            timeout=30
-        )
+        self.wcapi = transport or WooTransport.from_env(wp_url)
         
-    def get_low_stock_products(self, threshold: int = 5) -> List[Dict]:
+    def get_low_stock_products(self, threshold: int = 5, fields: Optional[Iterable[str]] = None) -> List[Dict]:
         """קבלת רשימת מוצרים עם מלאי נמוך"""
         try:
             logger.debug(f"Fetching products with stock below {threshold}")
             
-            # Get all products that have stock management enabled
-            response = self.wcapi.get("products", params={
-                "per_page": 100,
+            # Scan all products that have stock management enabled (all pages), keeping only matches
+            products = self.wcapi.iter_all("products", params=with_fields({
                 "stock_status": "instock",
                 "manage_stock": True
-            })
-            
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch products. Status: {response.status_code}, Response: {response.text}")
-                raise Exception(f"Failed to fetch products: {response.text}")
-            
-            products = response.json()
+            }, low_stock_fields(fields)))
             
             # Filter products with low stock
-            low_stock = [
-                product for product in products
-                if product.get('manage_stock', False) 
-                and product.get('stock_quantity', 0) <= threshold
-            ]
+            low_stock = filter_low_stock(products, threshold)
             
             logger.debug(f"Found {len(low_stock)} products with low stock")
             return low_stock
@@ -80,7 +129,7 @@ class InventoryHandler:
             logger.debug(f"Updating stock for product {product_id}, operation: {operation}, quantity: {quantity}")
             
             # Get current stock
-            response = self.wcapi.get(f"products/{product_id}")
+            response = self.wcapi.get(f"products/{product_id}", params=with_fields(fields=("id", "stock_quantity")))
             if response.status_code != 200:
                 raise Exception(f"Failed to get product: {response.text}")
             
@@ -88,14 +137,7 @@ class InventoryHandler:
             current_stock = product.get('stock_quantity', 0)
             
             # Calculate new stock based on operation
-            if operation == 'set':
-                new_stock = quantity
-            elif operation == 'add':
-                new_stock = current_stock + quantity
-            elif operation == 'subtract':
-                new_stock = current_stock - quantity
-            else:
-                raise ValueError("Invalid operation. Must be 'set', 'add', or 'subtract'")
+            new_stock = compute_new_stock(current_stock, quantity, operation)
             
             # Update product stock
             update_data = {
@@ -119,21 +161,11 @@ class InventoryHandler:
         try:
             logger.debug(f"Getting stock status for product {product_id}")
             
-            response = self.wcapi.get(f"products/{product_id}")
+            response = self.wcapi.get(f"products/{product_id}", params=with_fields(fields=STOCK_STATUS_FIELDS))
             if response.status_code != 200:
                 raise Exception(f"Failed to get product: {response.text}")
             
-            product = response.json()
-            
-            return {
-                "product_id": product_id,
-                "name": product.get('name'),
-                "manage_stock": product.get('manage_stock', False),
-                "stock_quantity": product.get('stock_quantity', 0),
-                "stock_status": product.get('stock_status', 'instock'),
-                "backorders_allowed": product.get('backorders_allowed', False),
-                "low_stock_amount": product.get('low_stock_amount', None)
-            }
+            return build_stock_status(product_id, response.json())
             
         except Exception as e:
             logger.error(f"Error getting stock status: {str(e)}")
@@ -161,42 +193,37 @@ class InventoryHandler:
         try:
             logger.debug(f"Managing stock by attributes for product {product_id}")
             
-            # Get current product data
-            response = self.wcapi.get(f"products/{product_id}")
+            # Make sure the product exists
+            response = self.wcapi.get(f"products/{product_id}", params=with_fields(fields=("id",)))
             if response.status_code != 200:
                 raise Exception(f"Failed to get product: {response.text}")
             
-            product = response.json()
-            
             # Update or create variations based on attributes
-            variations = []
-            for attr_name, attr_values in attributes.items():
-                for value, quantity in attr_values.items():
-                    variation_data = {
-                        "manage_stock": True,
-                        "stock_quantity": quantity,
-                        "attributes": [
-                            {
-                                "name": attr_name,
-                                "option": value
-                            }
-                        ]
-                    }
-                    variations.append(variation_data)
+            variations = build_variations(attributes)
             
-            # Create/update variations
-            for variation in variations:
-                response = self.wcapi.post(f"products/{product_id}/variations", variation)
-                if response.status_code not in [200, 201]:
-                    raise Exception(f"Failed to create/update variation: {response.text}")
+            # Create/update all variations in one batch request
+            result = self.wcapi.batch(f"products/{product_id}/variations", create=variations)
             
-            logger.debug(f"Successfully updated stock for all variations")
-            return {"status": "success", "variations_updated": len(variations)}
+            logger.debug(f"Updated stock for {len(result['created'])} variations ({len(result['errors'])} errors)")
+            return build_variations_result(result)
             
         except Exception as e:
             logger.error(f"Error managing stock by attributes: {str(e)}")
             raise
             
+    def bulk_update_stock(self, quantities: Dict[int, int]) -> Dict:
+        """קביעת כמות מלאי למוצרים רבים בבת אחת דרך products/batch: {product_id: quantity}"""
+        try:
+            logger.debug(f"Batch setting stock for {len(quantities)} products")
+            return self.wcapi.batch("products", update=[
+                {"id": product_id, "manage_stock": True, "stock_quantity": quantity}
+                for product_id, quantity in quantities.items()
+            ])
+            
+        except Exception as e:
+            logger.error(f"Error batch updating stock: {str(e)}")
+            raise
+            
     def set_low_stock_threshold(self, product_id: int, threshold: int) -> Dict:
         """הגדרת סף התראה למלאי נמוך"""
         try:
@@ -216,4 +243,99 @@ class InventoryHandler:
             
         except Exception as e:
             logger.error(f"Error setting low stock threshold: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+
+class AsyncInventoryHandler:
+    """גרסה אסינכרונית של InventoryHandler שאינה חוסמת את לולאת האירועים"""
+    
+    def __init__(self, wp_url: str, transport: Optional[AsyncWooTransport] = None):
+        """אתחול המחלקה עם כתובת האתר והרשאות"""
+        self.wp_url = wp_url
+        self.wcapi = transport or AsyncWooTransport.from_env(wp_url)
+        
+    async def _get_product(self, product_id: int, fields: Optional[Iterable[str]] = None) -> Dict:
+        response = await self.wcapi.get(f"products/{product_id}", params=with_fields(fields=fields))
+        if response.status_code != 200:
+            raise Exception(f"Failed to get product: {response.text}")
+        return response.json()
+        
+    async def get_low_stock_products(self, threshold: int = 5, fields: Optional[Iterable[str]] = None) -> List[Dict]:
+        """קבלת רשימת מוצרים עם מלאי נמוך"""
+        try:
+            products = self.wcapi.iter_all("products", params=with_fields({
+                "stock_status": "instock",
+                "manage_stock": True
+            }, low_stock_fields(fields)))
+            return [product async for product in products if is_low_stock(product, threshold)]
+            
+        except Exception as e:
+            logger.error(f"Error getting low stock products: {str(e)}")
+            raise
+            
+    async def update_stock_quantity(self, product_id: int, quantity: int, operation: str = 'set') -> Dict:
+        """עדכון כמות מלאי למוצר (set / add / subtract)"""
+        try:
+            product = await self._get_product(product_id, ("id", "stock_quantity"))
+            new_stock = compute_new_stock(product.get('stock_quantity', 0), quantity, operation)
+            
+            response = await self.wcapi.put(f"products/{product_id}", {
+                "manage_stock": True,
+                "stock_quantity": new_stock
+            })
+            if response.status_code != 200:
+                raise Exception(f"Failed to update stock: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error updating stock quantity: {str(e)}")
+            raise
+            
+    async def get_stock_status(self, product_id: int) -> Dict:
+        """קבלת סטטוס מלאי מפורט למוצר"""
+        try:
+            return build_stock_status(product_id, await self._get_product(product_id, STOCK_STATUS_FIELDS))
+        except Exception as e:
+            logger.error(f"Error getting stock status: {str(e)}")
+            raise
+            
+    async def manage_stock_by_attributes(self, product_id: int, attributes: Dict[str, Dict[str, int]]) -> Dict:
+        """ניהול מלאי לפי מאפיינים (למשל: צבע, מידה)"""
+        try:
+            await self._get_product(product_id, ("id",))
+            variations = build_variations(attributes)
+            result = await self.wcapi.batch(f"products/{product_id}/variations", create=variations)
+            return build_variations_result(result)
+            
+        except Exception as e:
+            logger.error(f"Error managing stock by attributes: {str(e)}")
+            raise
+            
+    async def bulk_update_stock(self, quantities: Dict[int, int]) -> Dict:
+        """קביעת כמות מלאי למוצרים רבים בבת אחת דרך products/batch: {product_id: quantity}"""
+        try:
+            return await self.wcapi.batch("products", update=[
+                {"id": product_id, "manage_stock": True, "stock_quantity": quantity}
+                for product_id, quantity in quantities.items()
+            ])
+            
+        except Exception as e:
+            logger.error(f"Error batch updating stock: {str(e)}")
+            raise
+            
+    async def set_low_stock_threshold(self, product_id: int, threshold: int) -> Dict:
+        """הגדרת סף התראה למלאי נמוך"""
+        try:
+            response = await self.wcapi.put(f"products/{product_id}", {
+                "manage_stock": True,
+                "low_stock_amount": threshold
+            })
+            if response.status_code != 200:
+                raise Exception(f"Failed to set threshold: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error setting low stock threshold: {str(e)}")
+            raise
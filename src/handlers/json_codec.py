@@ -0,0 +1,134 @@
+import re
+import json
+import codecs
+import logging
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List
+
+try:
+    import orjson
+except ImportError:  # אופציונלי - בלעדיו משתמשים ב-json הרגיל
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JSON_BACKENDS = ("auto", "orjson", "json")
+
+# גודל הקטעים שנקראים מתשובה בהזרמה
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# רווחים בין איברי המערך
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class JsonBackend:
+    """פענוח וקידוד JSON לשכבת התקשורת: orjson אם מותקן, אחרת json הרגיל"""
+
+    def __init__(self, name: str = "auto"):
+        """
+        Args:
+            name: auto (orjson אם זמין) / orjson / json
+        """
+        if name not in JSON_BACKENDS:
+            raise ValueError(f"Unknown JSON backend: {name}")
+        if name == "orjson" and orjson is None:
+            logger.warning("orjson is not installed, falling back to the json module")
+            name = "json"
+        if name == "auto":
+            name = "orjson" if orjson is not None else "json"
+        self.name = name
+
+    @property
+    def fast(self) -> bool:
+        return self.name == "orjson"
+
+    def loads(self, data):
+        if self.fast:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        """קידוד לגוף בקשה (UTF-8, בלי \\u escapes לעברית)"""
+        if self.fast:
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                # טיפוסים ש-orjson לא מכיר (Decimal למשל) - ממשיכים כמו קודם
+                pass
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+class JsonArrayStream:
+    """פענוח הדרגתי של מערך JSON: מקבל קטעים של התשובה ומחזיר כל איבר ברגע שהוא שלם
+
+    רק האיבר הנוכחי נשמר בזיכרון (לא כל העמוד). כל איבר מפוענח ב-raw_decode
+    של המפענח המובנה (ב-C) מהמקום שבו הסתיים הקודם; איבר שעוד לא הגיע במלואו
+    מחכה לקטע הבא.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._opened = False
+        self.done = False
+
+    def feed(self, chunk: bytes, final: bool = False) -> List:
+        """הוספת קטע; מחזיר את האיברים שהושלמו בו"""
+        if self.done:
+            return []
+        buf = self._buffer + self._text.decode(chunk, final)
+        items = []
+        pos = 0
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            char = buf[pos]
+            if not self._opened:
+                if char != "[":
+                    raise ValueError("Expected a JSON array")
+                self._opened = True
+                pos += 1
+            elif char == "]":
+                self.done = True
+                break
+            elif char == ",":
+                pos += 1
+            else:
+                try:
+                    item, end = self._decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    break  # האיבר לא הגיע במלואו
+                after = _WHITESPACE.match(buf, end).end()
+                if after >= len(buf) or buf[after] not in ",]":
+                    break  # מספר שנקטע ("-25" מתוך "-25.5") ממשיך בקטע הבא
+                items.append(item)
+                pos = after
+        # מה שכבר פוענח לא נשמר
+        self._buffer = buf[pos:]
+        return items
+
+    def close(self) -> List:
+        """סוף התשובה; מחזיר איברים אחרונים, או זורק ValueError אם המערך לא נסגר"""
+        items = self.feed(b"", final=True)
+        if not self.done:
+            raise ValueError("Incomplete JSON array")
+        return items
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator:
+    """האיברים של מערך JSON מתוך קטעי התשובה, אחד אחרי השני"""
+    stream = JsonArrayStream()
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+    yield from stream.close()
+
+
+async def aiter_json_array(chunks: AsyncIterable[bytes]) -> AsyncIterator:
+    """גרסה אסינכרונית של iter_json_array"""
+    stream = JsonArrayStream()
+    async for chunk in chunks:
+        for item in stream.feed(chunk):
+            yield item
+    for item in stream.close():
+        yield item
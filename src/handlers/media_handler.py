@@ -4,9 +4,8 @@ from PIL import Image
 from io import BytesIO
 import logging
 from datetime import datetime
-from woocommerce import API
-import time
-import requests
+from typing import Optional
+from .transport import WooTransport, AsyncWooTransport
 from dotenv import load_dotenv
 import mimetypes
 
@@ -18,45 +17,19 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 class MediaHandler:
-    def __init__(self, wp_url, wp_user, wp_password):
+    def __init__(self, wp_url, wp_user, wp_password, transport: Optional[WooTransport] = None):
         self.wp_url = wp_url
         # Store WordPress credentials for media uploads
         self.wp_user = wp_user
         self.wp_password = wp_password
         
-        # Initialize WooCommerce API with WooCommerce API keys
-        wc_key = os.getenv('WC_CONSUMER_KEY')
-        wc_secret = os.getenv('WC_CONSUMER_SECRET')
-        
-        if not wc_key or not wc_secret:
-            raise ValueError("WooCommerce API keys not found in environment")
-            
+        # Shared WooCommerce transport (pooled keep-alive connections)
         logger.debug(f"Initializing WooCommerce API with URL: {wp_url}")
-        self.wcapi = API(
-            url=wp_url,
-            consumer_key=wc_key,
-            consumer_secret=wc_secret,
-            version="wc/v3",
-            timeout=30
-        )
+        self.wcapi = transport or WooTransport.from_env(wp_url)
         
         self.temp_dir = 'temp_media'
         os.makedirs(self.temp_dir, exist_ok=True)
         
-    def _retry_operation(self, operation, max_retries=3, delay=1):
-        """Retry an operation with exponential backoff"""
-        last_error = None
-        for attempt in range(max_retries):
-            try:
-                return operation()
-            except Exception as e:
-                last_error = e
-                if attempt < max_retries - 1:
-                    sleep_time = delay * (2 ** attempt)  # Exponential backoff
-                    logger.warning(f"Attempt {attempt + 1} failed, retrying in {sleep_time} seconds...")
-                    time.sleep(sleep_time)
-        raise last_error
-
     def optimize_image(self, image_data: bytes, max_size: tuple = (800, 800)) -> bytes:
         """Optimize image size and quality"""
         try:
@@ -146,11 +119,11 @@ class MediaHandler:
                 auth = (self.wp_user, self.wp_password)
                 
                 logger.debug("Sending media upload request to WordPress")
-                response = requests.post(
-                    f"{self.wp_url}/wp-json/wp/v2/media",
+                response = self.wcapi.wp_request(
+                    "POST",
+                    "wp/v2/media",
                     files=files,
-                    auth=auth,
-                    verify=False
+                    auth=auth
                 )
                 
                 if response.status_code != 201:
@@ -222,7 +195,7 @@ class MediaHandler:
                     raise Exception(f"Failed to get product: {response.text}")
                 return response.json()
             
-            product = self._retry_operation(get_product)
+            product = get_product()
             return product.get('images', [])
             
         except Exception as e:
@@ -239,7 +212,7 @@ class MediaHandler:
                     raise Exception(f"Failed to get product: {response.text}")
                 return response.json()
             
-            product = self._retry_operation(get_product)
+            product = get_product()
             
             # Filter out the image to delete
             new_images = [img for img in product.get('images', []) if img['id'] != image_id]
@@ -253,7 +226,7 @@ class MediaHandler:
                     raise Exception(f"Failed to update product: {response.text}")
                 return response.json()
             
-            updated_product = self._retry_operation(update_product)
+            updated_product = update_product()
             logger.debug(f"Removed image {image_id} from product {product_id}")
             
             return updated_product
@@ -271,3 +244,98 @@ class MediaHandler:
                     os.remove(filepath)
         except Exception as e:
             logger.error(f"Error cleaning up temporary files: {e}")
+
+
+class AsyncMediaHandler:
+    """Async variant of MediaHandler that does not block the event loop"""
+
+    def __init__(self, wp_url, wp_user, wp_password, transport: Optional[AsyncWooTransport] = None):
+        self.wp_url = wp_url
+        # Store WordPress credentials for media uploads
+        self.wp_user = wp_user
+        self.wp_password = wp_password
+        self.wcapi = transport or AsyncWooTransport.from_env(wp_url)
+
+    async def _get_product(self, product_id: int) -> dict:
+        response = await self.wcapi.get(f"products/{product_id}")
+        if response.status_code != 200:
+            raise Exception(f"Failed to get product: {response.text}")
+        return response.json()
+
+    async def upload_media(self, image_data: bytes, filename: str, mime_type: str = 'image/jpeg') -> dict:
+        """Upload media bytes to WordPress (no temporary file needed)"""
+        try:
+            logger.debug(f"Starting media upload for file: {filename}")
+            response = await self.wcapi.wp_request(
+                "POST",
+                "wp/v2/media",
+                files={'file': (filename, image_data, mime_type)},
+                auth=(self.wp_user, self.wp_password)
+            )
+            
+            if response.status_code != 201:
+                logger.error(f"Media upload failed. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to upload media: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error in upload_media: {str(e)}")
+            raise
+
+    async def set_product_image(self, product_id: int, image_data: bytes) -> dict:
+        """Set product image using WooCommerce API"""
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            media = await self.upload_media(bytes(image_data), f"product_{product_id}_{timestamp}.jpg")
+            
+            if not media or 'id' not in media:
+                raise Exception("Failed to get media ID from upload response")
+            
+            update_data = {
+                "images": [
+                    {
+                        "id": media.get('id'),
+                        "src": media.get('source_url'),
+                        "position": 0
+                    }
+                ]
+            }
+            
+            response = await self.wcapi.put(f"products/{product_id}", update_data)
+            if response.status_code != 200:
+                logger.error(f"Failed to update product. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to update product: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error setting product image: {str(e)}")
+            raise
+
+    async def get_product_images(self, product_id: int) -> list:
+        """Get all images for a product"""
+        try:
+            product = await self._get_product(product_id)
+            return product.get('images', [])
+        except Exception as e:
+            logger.error(f"Error getting product images: {e}")
+            raise
+
+    async def delete_product_image(self, product_id: int, image_id: int) -> dict:
+        """Delete an image from a product"""
+        try:
+            product = await self._get_product(product_id)
+            new_images = [img for img in product.get('images', []) if img['id'] != image_id]
+            
+            async def update_product():
+                response = await self.wcapi.put(f"products/{product_id}", {"images": new_images})
+                if response.status_code != 200:
+                    raise Exception(f"Failed to update product: {response.text}")
+                return response.json()
+            
+            return await update_product()
+            
+        except Exception as e:
+            logger.error(f"Error deleting product image: {e}")
+            raise
@@ -1,8 +1,10 @@
 import os
 import logging
-from woocommerce import API
+from .transport import WooTransport, AsyncWooTransport, with_fields
+from .store_mirror import StoreMirror
 from dotenv import load_dotenv
 from datetime import datetime
+from typing import Iterable, Optional
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -11,26 +13,72 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+VALID_ORDER_STATUSES = ['pending', 'processing', 'on-hold', 'completed', 'cancelled', 'refunded', 'failed']
+
+def build_order_data(customer_data: dict, items: list, shipping_method: str = None) -> dict:
+    """Build the WooCommerce payload for a new order"""
+    order_data = {
+        "status": "pending",
+        "billing": {
+            "first_name": customer_data.get("first_name", ""),
+            "last_name": customer_data.get("last_name", ""),
+            "email": customer_data.get("email", ""),
+            "phone": customer_data.get("phone", ""),
+            "address_1": customer_data.get("address_1", ""),
+            "city": customer_data.get("city", ""),
+            "postcode": customer_data.get("postcode", ""),
+            "country": "IL"
+        },
+        "shipping": {
+            "first_name": customer_data.get("first_name", ""),
+            "last_name": customer_data.get("last_name", ""),
+            "address_1": customer_data.get("address_1", ""),
+            "city": customer_data.get("city", ""),
+            "postcode": customer_data.get("postcode", ""),
+            "country": "IL"
+        },
+        "line_items": items
+    }
+    
+    # Add shipping method if specified
+    if shipping_method:
+        order_data["shipping_lines"] = [
+            {
+                "method_id": shipping_method,
+                "method_title": shipping_method
+            }
+        ]
+    return order_data
+
+def build_order_search_params(search_term: str = None, customer_id: int = None,
+                              date_from: str = None, date_to: str = None,
+                              status: str = None) -> dict:
+    """Build the query parameters for an orders search"""
+    params = {}
+    if search_term:
+        params["search"] = search_term
+    if customer_id:
+        params["customer"] = customer_id
+    if date_from:
+        params["after"] = f"{date_from}T00:00:00"
+    if date_to:
+        params["before"] = f"{date_to}T23:59:59"
+    if status:
+        params["status"] = status
+    return params
+
 class OrderHandler:
-    def __init__(self, wp_url):
+    def __init__(self, wp_url, transport: Optional[WooTransport] = None, mirror: Optional[StoreMirror] = None):
         """Initialize OrderHandler with WooCommerce API credentials"""
         self.wp_url = wp_url
         
-        # Initialize WooCommerce API with WooCommerce API keys
-        wc_key = os.getenv('WC_CONSUMER_KEY')
-        wc_secret = os.getenv('WC_CONSUMER_SECRET')
-        
-        if not wc_key or not wc_secret:
-            raise ValueError("WooCommerce API keys not found in environment")
-            
+        # Shared WooCommerce transport (pooled keep-alive connections)
         logger.debug(f"Initializing WooCommerce API for orders with URL: {wp_url}")
-        self.wcapi = API(
-            url=wp_url,
-            consumer_key=wc_key,
-            consumer_secret=wc_secret,
-            version="wc/v3",
-            timeout=30
-        )
+        self.wcapi = transport or WooTransport.from_env(wp_url)
+        
+        # Optional on-disk mirror, read before going to the store
+        self.mirror = mirror if mirror is not None else StoreMirror()
+        self.mirror.attach(self.wcapi)
     
     def create_order(self, customer_data: dict, items: list, shipping_method: str = None) -> dict:
         """
@@ -61,38 +109,7 @@ class OrderHandler:
         try:
             logger.debug(f"Creating new order for customer: {customer_data.get('email')}")
             
-            # Prepare order data
-            order_data = {
-                "status": "pending",
-                "billing": {
-                    "first_name": customer_data.get("first_name", ""),
-                    "last_name": customer_data.get("last_name", ""),
-                    "email": customer_data.get("email", ""),
-                    "phone": customer_data.get("phone", ""),
-                    "address_1": customer_data.get("address_1", ""),
-                    "city": customer_data.get("city", ""),
-                    "postcode": customer_data.get("postcode", ""),
-                    "country": "IL"
-                },
-                "shipping": {
-                    "first_name": customer_data.get("first_name", ""),
-                    "last_name": customer_data.get("last_name", ""),
-                    "address_1": customer_data.get("address_1", ""),
-                    "city": customer_data.get("city", ""),
-                    "postcode": customer_data.get("postcode", ""),
-                    "country": "IL"
-                },
-                "line_items": items
-            }
-            
-            # Add shipping method if specified
-            if shipping_method:
-                order_data["shipping_lines"] = [
-                    {
-                        "method_id": shipping_method,
-                        "method_title": shipping_method
-                    }
-                ]
+            order_data = build_order_data(customer_data, items, shipping_method)
             
             # Create order
             response = self.wcapi.post("orders", order_data)
@@ -108,13 +125,15 @@ class OrderHandler:
             logger.error(f"Error creating order: {str(e)}")
             raise
     
-    def list_orders(self, status: str = None, per_page: int = 10) -> list:
+    def list_orders(self, status: str = None, per_page: int = 10,
+                    fields: Optional[Iterable[str]] = None) -> list:
         """
         Get list of orders with optional filtering
         
         Args:
             status: סטטוס ההזמנות לסינון (למשל: 'processing', 'completed', 'on-hold')
             per_page: כמה הזמנות להציג בכל עמוד
+            fields: השדות שיוחזרו מכל הזמנה (ברירת מחדל: כל השדות)
         """
         try:
             logger.debug(f"Fetching orders with status: {status}, per_page: {per_page}")
@@ -124,7 +143,7 @@ class OrderHandler:
             if status:
                 params["status"] = status
             
-            response = self.wcapi.get("orders", params=params)
+            response = self.wcapi.get("orders", params=with_fields(params, fields))
             
             if response.status_code != 200:
                 logger.error(f"Failed to fetch orders. Status: {response.status_code}, Response: {response.text}")
@@ -136,18 +155,24 @@ class OrderHandler:
             logger.error(f"Error listing orders: {str(e)}")
             raise
     
-    def get_order_details(self, order_id: int) -> dict:
+    def get_order_details(self, order_id: int, fields: Optional[Iterable[str]] = None) -> dict:
         """Get detailed information about a specific order"""
         try:
             logger.debug(f"Fetching details for order ID: {order_id}")
             
-            response = self.wcapi.get(f"orders/{order_id}")
+            mirrored = self.mirror.get("orders", order_id, fields)
+            if mirrored is not None:
+                return mirrored
+            
+            response = self.wcapi.get(f"orders/{order_id}", params=with_fields(fields=fields))
             
             if response.status_code != 200:
                 logger.error(f"Failed to fetch order details. Status: {response.status_code}, Response: {response.text}")
                 raise Exception(f"Failed to fetch order details: {response.text}")
             
-            return response.json()
+            order = response.json()
+            self.mirror.put("orders", order, fields)
+            return order
             
         except Exception as e:
             logger.error(f"Error getting order details: {str(e)}")
@@ -165,9 +190,8 @@ class OrderHandler:
             logger.debug(f"Updating status for order {order_id} to: {status}")
             
             # Validate status
-            valid_statuses = ['pending', 'processing', 'on-hold', 'completed', 'cancelled', 'refunded', 'failed']
-            if status not in valid_statuses:
-                raise ValueError(f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
+            if status not in VALID_ORDER_STATUSES:
+                raise ValueError(f"Invalid status. Must be one of: {', '.join(VALID_ORDER_STATUSES)}")
             
             response = self.wcapi.put(f"orders/{order_id}", {"status": status})
             
@@ -182,9 +206,24 @@ class OrderHandler:
             logger.error(f"Error updating order status: {str(e)}")
             raise
     
+    def update_orders_status(self, order_ids: list, status: str) -> dict:
+        """Update the status of many orders at once through orders/batch"""
+        try:
+            if status not in VALID_ORDER_STATUSES:
+                raise ValueError(f"Invalid status. Must be one of: {', '.join(VALID_ORDER_STATUSES)}")
+            
+            logger.debug(f"Batch updating status for {len(order_ids)} orders to: {status}")
+            return self.wcapi.batch("orders", update=[
+                {"id": order_id, "status": status} for order_id in order_ids
+            ])
+            
+        except Exception as e:
+            logger.error(f"Error batch updating order status: {str(e)}")
+            raise
+    
     def search_orders(self, search_term: str = None, customer_id: int = None,
                      date_from: str = None, date_to: str = None,
-                     status: str = None) -> list:
+                     status: str = None, fields: Optional[Iterable[str]] = None) -> list:
         """
         Search orders by various parameters
         
@@ -194,24 +233,14 @@ class OrderHandler:
             date_from: תאריך התחלה בפורמט YYYY-MM-DD
             date_to: תאריך סיום בפורמט YYYY-MM-DD
             status: סטטוס הזמנה לסינון
+            fields: השדות שיוחזרו מכל הזמנה (ברירת מחדל: כל השדות)
         """
         try:
             logger.debug(f"Searching orders with term: {search_term}, customer: {customer_id}, dates: {date_from}-{date_to}, status: {status}")
             
-            # Prepare search parameters
-            params = {}
-            if search_term:
-                params["search"] = search_term
-            if customer_id:
-                params["customer"] = customer_id
-            if date_from:
-                params["after"] = f"{date_from}T00:00:00"
-            if date_to:
-                params["before"] = f"{date_to}T23:59:59"
-            if status:
-                params["status"] = status
+            params = build_order_search_params(search_term, customer_id, date_from, date_to, status)
             
-            response = self.wcapi.get("orders", params=params)
+            response = self.wcapi.get("orders", params=with_fields(params, fields))
             
             if response.status_code != 200:
                 logger.error(f"Failed to search orders. Status: {response.status_code}, Response: {response.text}")
@@ -268,4 +297,157 @@ class OrderHandler:
             
         except Exception as e:
             logger.error(f"Error adding order note: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+
+class AsyncOrderHandler:
+    """Async variant of OrderHandler that does not block the event loop"""
+    
+    def __init__(self, wp_url, transport: Optional[AsyncWooTransport] = None, mirror: Optional[StoreMirror] = None):
+        """Initialize AsyncOrderHandler with a shared async transport"""
+        self.wp_url = wp_url
+        self.wcapi = transport or AsyncWooTransport.from_env(wp_url)
+        self.mirror = mirror if mirror is not None else StoreMirror()
+        self.mirror.attach(self.wcapi)
+    
+    async def create_order(self, customer_data: dict, items: list, shipping_method: str = None) -> dict:
+        """Create a new order (see OrderHandler.create_order for the data format)"""
+        try:
+            logger.debug(f"Creating new order for customer: {customer_data.get('email')}")
+            response = await self.wcapi.post("orders", build_order_data(customer_data, items, shipping_method))
+            
+            if response.status_code != 201:
+                logger.error(f"Failed to create order. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to create order: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error creating order: {str(e)}")
+            raise
+    
+    async def list_orders(self, status: str = None, per_page: int = 10,
+                          fields: Optional[Iterable[str]] = None) -> list:
+        """Get list of orders with optional filtering"""
+        try:
+            params = {"per_page": per_page}
+            if status:
+                params["status"] = status
+            
+            response = await self.wcapi.get("orders", params=with_fields(params, fields))
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to fetch orders. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to fetch orders: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error listing orders: {str(e)}")
+            raise
+    
+    async def get_order_details(self, order_id: int, fields: Optional[Iterable[str]] = None) -> dict:
+        """Get detailed information about a specific order"""
+        try:
+            mirrored = self.mirror.get("orders", order_id, fields)
+            if mirrored is not None:
+                return mirrored
+            
+            response = await self.wcapi.get(f"orders/{order_id}", params=with_fields(fields=fields))
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to fetch order details. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to fetch order details: {response.text}")
+            
+            order = response.json()
+            self.mirror.put("orders", order, fields)
+            return order
+            
+        except Exception as e:
+            logger.error(f"Error getting order details: {str(e)}")
+            raise
+    
+    async def update_order_status(self, order_id: int, status: str) -> dict:
+        """Update order status"""
+        try:
+            if status not in VALID_ORDER_STATUSES:
+                raise ValueError(f"Invalid status. Must be one of: {', '.join(VALID_ORDER_STATUSES)}")
+            
+            response = await self.wcapi.put(f"orders/{order_id}", {"status": status})
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to update order status. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to update order status: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error updating order status: {str(e)}")
+            raise
+    
+    async def update_orders_status(self, order_ids: list, status: str) -> dict:
+        """Update the status of many orders at once through orders/batch"""
+        try:
+            if status not in VALID_ORDER_STATUSES:
+                raise ValueError(f"Invalid status. Must be one of: {', '.join(VALID_ORDER_STATUSES)}")
+            
+            return await self.wcapi.batch("orders", update=[
+                {"id": order_id, "status": status} for order_id in order_ids
+            ])
+            
+        except Exception as e:
+            logger.error(f"Error batch updating order status: {str(e)}")
+            raise
+    
+    async def search_orders(self, search_term: str = None, customer_id: int = None,
+                            date_from: str = None, date_to: str = None,
+                            status: str = None, fields: Optional[Iterable[str]] = None) -> list:
+        """Search orders by various parameters"""
+        try:
+            params = build_order_search_params(search_term, customer_id, date_from, date_to, status)
+            response = await self.wcapi.get("orders", params=with_fields(params, fields))
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to search orders. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to search orders: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error searching orders: {str(e)}")
+            raise
+    
+    async def get_order_notes(self, order_id: int) -> list:
+        """Get all notes for a specific order"""
+        try:
+            response = await self.wcapi.get(f"orders/{order_id}/notes")
+            
+            if response.status_code != 200:
+                logger.error(f"Failed to fetch order notes. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to fetch order notes: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error getting order notes: {str(e)}")
+            raise
+    
+    async def add_order_note(self, order_id: int, note: str, is_customer_note: bool = False) -> dict:
+        """Add a note to an order"""
+        try:
+            data = {
+                "note": note,
+                "customer_note": is_customer_note
+            }
+            
+            response = await self.wcapi.post(f"orders/{order_id}/notes", data)
+            
+            if response.status_code != 201:
+                logger.error(f"Failed to add order note. Status: {response.status_code}, Response: {response.text}")
+                raise Exception(f"Failed to add order note: {response.text}")
+            
+            return response.json()
+            
+        except Exception as e:
+            logger.error(f"Error adding order note: {str(e)}")
+            raise
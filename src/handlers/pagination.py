@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from .json_codec import STREAM_CHUNK_SIZE, aiter_json_array, iter_json_array
+
+logger = logging.getLogger(__name__)
+
+MAX_PER_PAGE = 100  # המקסימום ש-WooCommerce מאפשר בעמוד אחד
+
+
+def _check_page(response, endpoint: str, page: int) -> List[Dict]:
+    if response.status_code != 200:
+        raise Exception(f"Failed to fetch {endpoint} (page {page}): {response.text}")
+    return response.json()
+
+
+def _read_totals(response) -> tuple:
+    """קריאת סך הפריטים והעמודים מהכותרות X-WP-Total / X-WP-TotalPages"""
+    total = response.headers.get("X-WP-Total")
+    total_pages = response.headers.get("X-WP-TotalPages")
+    return (
+        int(total) if total is not None else None,
+        int(total_pages) if total_pages is not None else 1,
+    )
+
+
+class Paginator:
+    """מעבר על כל העמודים של רשימת WooCommerce עם שליפה מקבילית של העמודים הבאים
+
+    העמוד הראשון נשלף כדי לקרוא את X-WP-TotalPages, ואז שאר העמודים נשלפים
+    במקביל (עד max_workers בו-זמנית) ומוחזרים לפי הסדר.
+
+    שימוש:
+        for product in Paginator(wcapi, "products"):        # זרימה פריט אחר פריט
+            ...
+        products = Paginator(wcapi, "products").collect()   # הכל ברשימה אחת
+        for product in Paginator(wcapi, "products").stream():  # פענוח הדרגתי, עמוד אחר עמוד
+            ...
+    """
+
+    def __init__(self, wcapi, endpoint: str, params: Optional[Dict] = None,
+                 per_page: int = MAX_PER_PAGE, max_workers: Optional[int] = None,
+                 max_pages: Optional[int] = None):
+        self.wcapi = wcapi
+        self.endpoint = endpoint
+        self.params = dict(params or {})
+        self.params.pop("page", None)
+        self.per_page = min(int(self.params.pop("per_page", per_page)), MAX_PER_PAGE)
+        self.max_workers = max_workers or getattr(wcapi, "page_workers", 4)
+        self.max_pages = max_pages
+        self.total: Optional[int] = None
+        self.total_pages: Optional[int] = None
+
+    def _fetch(self, page: int):
+        params = {**self.params, "per_page": self.per_page, "page": page}
+        return self.wcapi.get(self.endpoint, params=params)
+
+    def _last_page(self) -> int:
+        if self.max_pages:
+            return min(self.total_pages, self.max_pages)
+        return self.total_pages
+
+    def iter_pages(self) -> Iterator[List[Dict]]:
+        """מחזיר את העמודים אחד אחרי השני, לפי הסדר"""
+        first = self._fetch(1)
+        items = _check_page(first, self.endpoint, 1)
+        self.total, self.total_pages = _read_totals(first)
+        logger.debug(f"Paginating {self.endpoint}: {self.total} items in {self.total_pages} pages")
+        yield items
+
+        last_page = self._last_page()
+        if last_page <= 1:
+            return
+
+        # חלון שליפה מוגבל - לא שולחים יותר בקשות ממה שהצרכן מספיק לעבד
+        window = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="wc-page") as executor:
+            pending = deque()
+            next_page = 2
+            while next_page <= last_page or pending:
+                while next_page <= last_page and len(pending) < window:
+                    # ה-context עובר לתהליכון, כך שהבקשות משויכות לכלי שביקש אותן (מדדים)
+                    pending.append((next_page, executor.submit(contextvars.copy_context().run, self._fetch, next_page)))
+                    next_page += 1
+                page, future = pending.popleft()
+                yield _check_page(future.result(), self.endpoint, page)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for page in self.iter_pages():
+            yield from page
+
+    def collect(self) -> List[Dict]:
+        """שליפת כל הפריטים מכל העמודים לרשימה אחת"""
+        return [item for page in self.iter_pages() for item in page]
+
+    def stream(self) -> Iterator[Dict]:
+        """מעבר על כל הפריטים עם פענוח הדרגתי של כל עמוד תוך כדי ההורדה
+
+        העמודים נשלפים אחד אחרי השני (בלי שליפה מקבילית), וכל פריט מוחזר
+        ברגע שהוא שלם - עמוד שלם לא נשמר בזיכרון לא כטקסט ולא כרשימה.
+        מתאים לסריקות של כל הקטלוג שבהן הצרכן שומר רק חלק קטן מהפריטים.
+        """
+        page = 1
+        while True:
+            params = {**self.params, "per_page": self.per_page, "page": page}
+            response = self.wcapi.get(self.endpoint, params=params, stream=True)
+            try:
+                if response.status_code != 200:
+                    _check_page(response, self.endpoint, page)
+                self.total, self.total_pages = _read_totals(response)
+                yield from iter_json_array(response.iter_content(STREAM_CHUNK_SIZE))
+            finally:
+                response.close()
+            if page >= self._last_page():
+                return
+            page += 1
+
+
+class AsyncPaginator(Paginator):
+    """גרסה אסינכרונית של Paginator עבור AsyncWooTransport"""
+
+    async def _fetch(self, page: int):
+        params = {**self.params, "per_page": self.per_page, "page": page}
+        return await self.wcapi.get(self.endpoint, params=params)
+
+    async def iter_pages(self) -> AsyncIterator[List[Dict]]:
+        """מחזיר את העמודים אחד אחרי השני, לפי הסדר"""
+        first = await self._fetch(1)
+        items = _check_page(first, self.endpoint, 1)
+        self.total, self.total_pages = _read_totals(first)
+        logger.debug(f"Paginating {self.endpoint}: {self.total} items in {self.total_pages} pages")
+        yield items
+
+        last_page = self._last_page()
+        if last_page <= 1:
+            return
+
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def fetch_limited(page: int):
+            async with semaphore:
+                return await self._fetch(page)
+
+        tasks = [asyncio.ensure_future(fetch_limited(page)) for page in range(2, last_page + 1)]
+        try:
+            for page, task in enumerate(tasks, start=2):
+                yield _check_page(await task, self.endpoint, page)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def __aiter__(self) -> AsyncIterator[Dict]:
+        async for page in self.iter_pages():
+            for item in page:
+                yield item
+
+    def __iter__(self):
+        raise TypeError("AsyncPaginator supports only 'async for'")
+
+    async def collect(self) -> List[Dict]:
+        """שליפת כל הפריטים מכל העמודים לרשימה אחת"""
+        items = []
+        async for page in self.iter_pages():
+            items.extend(page)
+        return items
+
+    async def stream(self) -> AsyncIterator[Dict]:
+        """מעבר על כל הפריטים עם פענוח הדרגתי של כל עמוד תוך כדי ההורדה (ראו Paginator.stream)"""
+        page = 1
+        while True:
+            params = {**self.params, "per_page": self.per_page, "page": page}
+            response = await self.wcapi.get(self.endpoint, params=params, stream=True)
+            try:
+                if response.status_code != 200:
+                    await response.aread()
+                    _check_page(response, self.endpoint, page)
+                self.total, self.total_pages = _read_totals(response)
+                async for item in aiter_json_array(response.aiter_bytes(STREAM_CHUNK_SIZE)):
+                    yield item
+            finally:
+                await response.aclose()
+            if page >= self._last_page():
+                return
+            page += 1
@@ -0,0 +1,219 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# נקודות קצה תחת products/ שאינן מוצר בודד; שינוי בהן משפיע על נתונים שמוטמעים במוצרים
+_PRODUCT_SUBRESOURCES = ("categories", "tags", "attributes", "shipping_classes")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+class ProductCache:
+    """מטמון מוצרים בזיכרון לפי מזהה, עם אינדקס שמות, תפוגה (TTL) ופינוי LRU
+
+    כל רשומה זוכרת אילו שדות נשלפו (None = המוצר המלא), כך שבקשה עם _fields
+    מוגשת מהמטמון רק אם הרשומה מכילה את כל השדות המבוקשים. המטמון נרשם
+    לשכבת התקשורת ומתבטל אוטומטית בכל שינוי של מוצר (PUT/POST/DELETE).
+    """
+
+    def __init__(self, ttl: float = 300, max_size: int = 1000):
+        """
+        Args:
+            ttl: זמן חיים של רשומה בשניות
+            max_size: מספר מקסימלי של מוצרים במטמון
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._products: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (product, fields, stored_at)
+        self._names: Dict[str, int] = {}  # שם מנורמל -> id
+        self._name_of: Dict[int, str] = {}  # id -> שם מנורמל
+        self._searches: Dict[str, tuple] = {}  # מונח חיפוש מנורמל -> (ids, stored_at)
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "ProductCache":
+        """יצירת מטמון לפי משתני הסביבה PRODUCT_CACHE_TTL / PRODUCT_CACHE_SIZE"""
+        return cls(
+            ttl=float(os.getenv('PRODUCT_CACHE_TTL', '300')),
+            max_size=int(os.getenv('PRODUCT_CACHE_SIZE', '1000')),
+        )
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "ProductCache":
+        """יצירת מטמון מתוך מילון ההגדרות של load_config"""
+        return cls(ttl=config['PRODUCT_CACHE_TTL'], max_size=config['PRODUCT_CACHE_SIZE'])
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def attach(self, transport) -> None:
+        """רישום המטמון לשינויים שעוברים בשכבת התקשורת"""
+        transport.add_mutation_listener(self.on_mutation)
+
+    # ---- קריאה ----
+
+    def get(self, product_id: int, fields: Optional[Iterable[str]] = None) -> Optional[Dict]:
+        """קבלת מוצר מהמטמון אם הוא טרי ומכיל את השדות המבוקשים"""
+        with self._lock:
+            entry = self._fresh_entry(product_id)
+            if entry is None or not self._covers(entry[1], fields):
+                self.misses += 1
+                return None
+            self._products.move_to_end(product_id)
+            self.hits += 1
+            return self._project(entry[0], fields)
+
+    def search(self, term: str, fields: Optional[Iterable[str]] = None) -> Optional[List[Dict]]:
+        """תוצאות חיפוש מהמטמון: שם מוצר זהה, או חיפוש קודם זהה שכל תוצאותיו עדיין במטמון"""
+        key = _normalize(term)
+        with self._lock:
+            product_id = self._names.get(key)
+            if product_id is not None:
+                product = self.get(product_id, fields)
+                if product is not None:
+                    return [product]
+
+            cached = self._searches.get(key)
+            if cached is None or time.monotonic() - cached[1] > self.ttl:
+                self._searches.pop(key, None)
+                self.misses += 1
+                return None
+            products = [self.get(pid, fields) for pid in cached[0]]
+            if any(product is None for product in products):
+                self._searches.pop(key, None)
+                return None
+            return products
+
+    # ---- כתיבה ----
+
+    def put(self, product: Dict, fields: Optional[Iterable[str]] = None) -> None:
+        """שמירת מוצר (מלא, או רק השדות שנשלפו) במטמון"""
+        if not self.enabled or not isinstance(product, dict) or "id" not in product:
+            return
+        field_set = frozenset(fields) if fields else None
+        with self._lock:
+            product_id = product["id"]
+            existing = self._fresh_entry(product_id)
+            stored_at = time.monotonic()
+            if existing is not None and field_set is not None:
+                # מיזוג שדות חלקיים לרשומה קיימת במקום לדרוס מוצר מלא בחלקי
+                merged = {**existing[0], **product}
+                field_set = None if existing[1] is None else existing[1] | field_set
+                product = merged
+                # השדות הישנים לא רועננו - הרשומה טרייה רק כמו החלק הישן שבה (כמו במראה)
+                stored_at = existing[2]
+            self._drop_name(product_id)
+            self._products[product_id] = (product, field_set, stored_at)
+            self._products.move_to_end(product_id)
+            if product.get("name"):
+                name = _normalize(product["name"])
+                self._names[name] = product_id
+                self._name_of[product_id] = name
+            while len(self._products) > self.max_size:
+                old_id, _ = self._products.popitem(last=False)
+                self._drop_name(old_id)
+
+    def put_many(self, products: List[Dict], fields: Optional[Iterable[str]] = None) -> None:
+        for product in products:
+            self.put(product, fields)
+
+    def put_search(self, term: str, products: List[Dict], fields: Optional[Iterable[str]] = None) -> None:
+        """שמירת תוצאות חיפוש (המוצרים עצמם ורשימת המזהים)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.put_many(products, fields)
+            self._searches[_normalize(term)] = ([p["id"] for p in products if "id" in p], time.monotonic())
+            while len(self._searches) > self.max_size:
+                del self._searches[next(iter(self._searches))]
+
+    def invalidate(self, product_id: int) -> None:
+        """הסרת מוצר מהמטמון (וכל חיפוש שהחזיר אותו)"""
+        with self._lock:
+            if self._products.pop(product_id, None) is not None:
+                logger.debug(f"Invalidated cached product {product_id}")
+            self._drop_name(product_id)
+            for term in [t for t, (ids, _) in self._searches.items() if product_id in ids]:
+                del self._searches[term]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._products.clear()
+            self._names.clear()
+            self._name_of.clear()
+            self._searches.clear()
+
+    def on_mutation(self, method: str, endpoint: str, data=None) -> None:
+        """ביטול רשומות לפי בקשת שינוי שעברה בשכבת התקשורת"""
+        parts = endpoint.strip("/").split("/")
+        if parts[0] != "products":
+            return
+        if len(parts) == 1:
+            # מוצר חדש - חיפושים שמורים עלולים להיות חסרים
+            with self._lock:
+                self._searches.clear()
+        elif parts[1] == "batch":
+            data = data or {}
+            for item in data.get("update", []):
+                if isinstance(item, dict) and "id" in item:
+                    self.invalidate(item["id"])
+            for product_id in data.get("delete", []):
+                self.invalidate(product_id)
+            if data.get("create"):
+                with self._lock:
+                    self._searches.clear()
+        elif parts[1].isdigit():
+            # כולל שינוי בווריאציות של המוצר
+            self.invalidate(int(parts[1]))
+        elif parts[1] in _PRODUCT_SUBRESOURCES:
+            # שמות קטגוריות/תגיות מוטמעים בכל מוצר
+            self.clear()
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def ids(self) -> Set[int]:
+        """המזהים של כל המוצרים שבמטמון"""
+        with self._lock:
+            return set(self._products)
+
+    # ---- עזר ----
+
+    def _fresh_entry(self, product_id: int) -> Optional[tuple]:
+        entry = self._products.get(product_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[2] > self.ttl:
+            del self._products[product_id]
+            self._drop_name(product_id)
+            return None
+        return entry
+
+    def _drop_name(self, product_id: int) -> None:
+        name = self._name_of.pop(product_id, None)
+        if name is not None and self._names.get(name) == product_id:
+            del self._names[name]
+
+    @staticmethod
+    def _covers(stored_fields: Optional[frozenset], fields: Optional[Iterable[str]]) -> bool:
+        if stored_fields is None:
+            return True
+        if not fields:
+            return False
+        return set(fields) <= stored_fields
+
+    @staticmethod
+    def _project(product: Dict, fields: Optional[Iterable[str]]) -> Dict:
+        if not fields:
+            return dict(product)
+        return {field: product[field] for field in fields if field in product}
@@ -1,8 +1,13 @@
 import os
+import asyncio
 import logging
+import threading
 import requests
-from typing import List, Dict, Optional
-from woocommerce import API
+from typing import Iterable, List, Dict, Optional, Tuple
+from .transport import WooTransport, AsyncWooTransport, with_fields
+from .product_cache import ProductCache
+from .product_index import ProductIndex, INDEX_FIELDS
+from .store_mirror import StoreMirror
 
 # הגדרת לוגר ייעודי לקריאות API
 api_logger = logging.getLogger('api_calls')
@@ -15,45 +20,121 @@ api_logger.addHandler(api_handler)
 
 logger = logging.getLogger(__name__)
 
+
+def merge_search_results(index, name: str, products: List[Dict], limit: int) -> List[Dict]:
+    """הוספת תוצאות החיפוש בחנות לאינדקס ודירוג מחדש; מוצרים שהאינדקס לא מדרג נשארים בסוף"""
+    for product in products:
+        index.upsert(product)
+    matches = index.search(name, limit)
+    ranked = {match["id"] for match in matches}
+    matches.extend(product for product in products if product.get("id") not in ranked)
+    return matches[:limit]
+
+
 class ProductHandler:
     """מחלקה לניהול מוצרים בחנות WooCommerce"""
     
-    def __init__(self, wp_url: str):
+    def __init__(self, wp_url: str, transport: Optional[WooTransport] = None,
+                 cache: Optional[ProductCache] = None, index: Optional[ProductIndex] = None,
+                 mirror: Optional[StoreMirror] = None):
         """אתחול המחלקה עם כתובת האתר והרשאות"""
         self.wp_url = wp_url
         
-        # Initialize WooCommerce API
-        wc_key = os.getenv('WC_CONSUMER_KEY')
-        wc_secret = os.getenv('WC_CONSUMER_SECRET')
+        # Shared WooCommerce transport (pooled keep-alive connections)
+        logger.debug(f"Initializing WooCommerce API for products with URL: {wp_url}")
+        self.wcapi = transport or WooTransport.from_env(wp_url)
+        
+        # Product cache, invalidated by every product mutation on the transport
+        self.cache = cache if cache is not None else ProductCache.from_env()
+        self.cache.attach(self.wcapi)
+        
+        # Local name index used to resolve product names without a search request
+        self.index = index if index is not None else ProductIndex()
+        self.index.attach(self.wcapi)
+        self._index_lock = threading.Lock()
+        
+        # Optional on-disk mirror for warm restarts
+        self.mirror = mirror if mirror is not None else StoreMirror()
+        self.mirror.attach(self.wcapi)
+        
+    def _remember(self, product: Dict) -> None:
+        """עדכון המטמון והאינדקס במוצר שהוחזר מפעולת כתיבה"""
+        self.cache.put(product)
+        self.index.upsert(product)
+        self.mirror.put("products", product)
+        
+    def refresh_index(self) -> None:
+        """בניית אינדקס השמות מחדש מכל הקטלוג"""
+        with self._index_lock:
+            if self.index.needs_refresh():
+                # אחרי הפעלה מחדש האינדקס נבנה מהמראה המקומית, אם היא טרייה
+                products = self.mirror.list_all("products", INDEX_FIELDS)
+                if products is None:
+                    products = self.list_all_products(fields=INDEX_FIELDS)
+                self.index.build(products)
+        
+    def find_products(self, name: str, limit: int = 5) -> List[Dict]:
+        """
+        זיהוי מוצרים לפי שם מהאינדקס המקומי, מדורגים מהמתאים ביותר
         
-        if not wc_key or not wc_secret:
-            raise ValueError("WooCommerce API keys not found in environment")
+        מחזיר [{"id", "name", "score"}] בלי פנייה לחנות. אם אין התאמה חזקה
+        (למשל מוצר שנוסף מחוץ לבוט) מתבצע גם חיפוש בחנות.
+        """
+        try:
+            if self.index.needs_refresh():
+                self.refresh_index()
+            matches = self.index.search(name, limit)
+            if matches and matches[0]["score"] >= self.index.strict_score:
+                return matches
             
-        logger.debug(f"Initializing WooCommerce API for products with URL: {wp_url}")
-        self.wcapi = API(
-            url=wp_url,
-            consumer_key=wc_key,
-            consumer_secret=wc_secret,
-            version="wc/v3",
-            timeout=30
-        )
+            products = self.search_products(name, fields=INDEX_FIELDS)
+            return merge_search_results(self.index, name, products, limit)
+        except Exception as e:
+            logger.error(f"Error finding products: {str(e)}")
+            raise
+            
+    def resolve_product(self, name: str, limit: int = 5) -> Tuple[Optional[Dict], List[Dict]]:
+        """
+        זיהוי מוצר לפעולה שמשנה אותו (מחיר, מלאי, מחיקה...)
         
-    def list_products(self, per_page: int = 10) -> List[Dict]:
+        מחזיר (מוצר, מועמדים): המוצר רק כשההתאמה ודאית (ProductIndex.confident_match),
+        אחרת None - והמועמדים מוצגים למשתמש לאישור במקום לשנות מוצר אחר.
+        """
+        candidates = self.find_products(name, limit)
+        return self.index.confident_match(name, candidates), candidates
+            
+    def list_products(self, per_page: int = 10, fields: Optional[Iterable[str]] = None) -> List[Dict]:
         """קבלת רשימת המוצרים בחנות"""
         try:
             api_logger.info(f"Fetching products list (per_page={per_page})")
-            response = self.wcapi.get("products", params={"per_page": per_page})
+            response = self.wcapi.get("products", params=with_fields({"per_page": per_page}, fields))
             api_logger.info(f"Products list response: {response.status_code}")
-            api_logger.debug(f"Products list response body: {response.text}")
             
             if response.status_code != 200:
                 api_logger.error(f"Failed to fetch products: {response.text}")
                 raise Exception(f"Failed to fetch products: {response.text}")
-            return response.json()
+            products = response.json()
+            api_logger.debug(f"Products list returned {len(products)} products")
+            self.cache.put_many(products, fields)
+            return products
         except Exception as e:
             api_logger.error(f"Error listing products: {str(e)}")
             raise
             
+    def list_all_products(self, fields: Optional[Iterable[str]] = None, **params) -> List[Dict]:
+        """קבלת כל המוצרים בחנות מכל העמודים (שליפה מקבילית)"""
+        try:
+            api_logger.info(f"Fetching all products (params={params})")
+            products = self.wcapi.get_all("products", params=with_fields(params, fields))
+            self.cache.put_many(products, fields)
+            if not params:
+                # כל הקטלוג - סנכרון מלא של המראה
+                self.mirror.replace_all("products", products, fields)
+            return products
+        except Exception as e:
+            api_logger.error(f"Error listing all products: {str(e)}")
+            raise
+            
     def create_product(self, name: str, description: str, regular_price: str, stock_quantity: Optional[int] = None) -> Dict:
         """יצירת מוצר חדש"""
         try:
@@ -112,6 +193,7 @@ class ProductHandler:
             api_logger.info(f"Product ID: {product.get('id')}")
             api_logger.debug(f"Full Product Data: {product}")
             
+            self._remember(product)
             return product
             
         except ValueError as ve:
@@ -133,7 +215,9 @@ class ProductHandler:
             response = self.wcapi.put(f"products/{product_id}", kwargs)
             if response.status_code != 200:
                 raise Exception(f"Failed to update product: {response.text}")
-            return response.json()
+            product = response.json()
+            self._remember(product)
+            return product
         except Exception as e:
             logger.error(f"Error updating product: {str(e)}")
             raise
@@ -149,24 +233,42 @@ class ProductHandler:
             logger.error(f"Error deleting product: {str(e)}")
             raise
             
-    def get_product_details(self, product_id: int) -> Dict:
+    def get_product_details(self, product_id: int, fields: Optional[Iterable[str]] = None) -> Dict:
         """קבלת פרטים מלאים על מוצר"""
         try:
-            response = self.wcapi.get(f"products/{product_id}")
+            cached = self.cache.get(product_id, fields)
+            if cached is not None:
+                return cached
+            
+            mirrored = self.mirror.get("products", product_id, fields)
+            if mirrored is not None:
+                self.cache.put(mirrored, fields)
+                return mirrored
+            
+            response = self.wcapi.get(f"products/{product_id}", params=with_fields(fields=fields))
             if response.status_code != 200:
                 raise Exception(f"Failed to get product: {response.text}")
-            return response.json()
+            product = response.json()
+            self.cache.put(product, fields)
+            self.mirror.put("products", product, fields)
+            return product
         except Exception as e:
             logger.error(f"Error getting product details: {str(e)}")
             raise
             
-    def search_products(self, search_term: str) -> List[Dict]:
+    def search_products(self, search_term: str, fields: Optional[Iterable[str]] = None) -> List[Dict]:
         """חיפוש מוצרים לפי טקסט"""
         try:
-            response = self.wcapi.get("products", params={"search": search_term})
+            cached = self.cache.search(search_term, fields)
+            if cached is not None:
+                return cached
+            
+            response = self.wcapi.get("products", params=with_fields({"search": search_term}, fields))
             if response.status_code != 200:
                 raise Exception(f"Failed to search products: {response.text}")
-            return response.json()
+            products = response.json()
+            self.cache.put_search(search_term, products, fields)
+            return products
         except Exception as e:
             logger.error(f"Error searching products: {str(e)}")
             raise
@@ -183,18 +285,263 @@ class ProductHandler:
             response = self.wcapi.put(f"products/{product_id}", update_data)
             if response.status_code != 200:
                 raise Exception(f"Failed to update price: {response.text}")
-            return response.json()
+            product = response.json()
+            self._remember(product)
+            return product
         except Exception as e:
             logger.error(f"Error updating price: {str(e)}")
             raise
             
+    def batch_update_products(self, updates: List[Dict]) -> Dict:
+        """עדכון מוצרים רבים דרך products/batch (כל פריט חייב לכלול id)"""
+        try:
+            api_logger.info(f"Batch updating {len(updates)} products")
+            result = self.wcapi.batch("products", update=updates)
+            for product in result["updated"]:
+                self._remember(product)
+            return result
+        except Exception as e:
+            api_logger.error(f"Error batch updating products: {str(e)}")
+            raise
+            
+    def update_prices(self, prices: Dict[int, str], is_sale: bool = False) -> Dict:
+        """עדכון מחירים למוצרים רבים בבת אחת: {product_id: price}"""
+        field = "sale_price" if is_sale else "regular_price"
+        return self.batch_update_products([{"id": product_id, field: price} for product_id, price in prices.items()])
+            
     def remove_discount(self, product_id: int) -> Dict:
         """הסרת מבצע/הנחה ממוצר"""
         try:
             response = self.wcapi.put(f"products/{product_id}", {"sale_price": ""})
             if response.status_code != 200:
                 raise Exception(f"Failed to remove discount: {response.text}")
+            product = response.json()
+            self._remember(product)
+            return product
+        except Exception as e:
+            logger.error(f"Error removing discount: {str(e)}")
+            raise 
+
+class AsyncProductHandler:
+    """גרסה אסינכרונית של ProductHandler שאינה חוסמת את לולאת האירועים"""
+    
+    def __init__(self, wp_url: str, transport: Optional[AsyncWooTransport] = None,
+                 cache: Optional[ProductCache] = None, index: Optional[ProductIndex] = None,
+                 mirror: Optional[StoreMirror] = None):
+        """אתחול המחלקה עם כתובת האתר והרשאות"""
+        self.wp_url = wp_url
+        self.wcapi = transport or AsyncWooTransport.from_env(wp_url)
+        self.cache = cache if cache is not None else ProductCache.from_env()
+        self.cache.attach(self.wcapi)
+        self.index = index if index is not None else ProductIndex()
+        self.index.attach(self.wcapi)
+        self._index_lock = asyncio.Lock()
+        self.mirror = mirror if mirror is not None else StoreMirror()
+        self.mirror.attach(self.wcapi)
+        
+    def _remember(self, product: Dict) -> None:
+        """עדכון המטמון והאינדקס במוצר שהוחזר מפעולת כתיבה"""
+        self.cache.put(product)
+        self.index.upsert(product)
+        self.mirror.put("products", product)
+        
+    async def refresh_index(self) -> None:
+        """בניית אינדקס השמות מחדש מכל הקטלוג"""
+        async with self._index_lock:
+            if self.index.needs_refresh():
+                # אחרי הפעלה מחדש האינדקס נבנה מהמראה המקומית, אם היא טרייה
+                products = self.mirror.list_all("products", INDEX_FIELDS)
+                if products is None:
+                    products = await self.list_all_products(fields=INDEX_FIELDS)
+                self.index.build(products)
+        
+    async def find_products(self, name: str, limit: int = 5) -> List[Dict]:
+        """זיהוי מוצרים לפי שם מהאינדקס המקומי, מדורגים מהמתאים ביותר"""
+        try:
+            if self.index.needs_refresh():
+                await self.refresh_index()
+            matches = self.index.search(name, limit)
+            if matches and matches[0]["score"] >= self.index.strict_score:
+                return matches
+            
+            # ייתכן שהמוצר נוסף מחוץ לבוט מאז בניית האינדקס - חיפוש בחנות
+            products = await self.search_products(name, fields=INDEX_FIELDS)
+            return merge_search_results(self.index, name, products, limit)
+        except Exception as e:
+            logger.error(f"Error finding products: {str(e)}")
+            raise
+            
+    async def resolve_product(self, name: str, limit: int = 5) -> Tuple[Optional[Dict], List[Dict]]:
+        """זיהוי מוצר לפעולה שמשנה אותו: (מוצר ודאי או None, מועמדים לאישור)"""
+        candidates = await self.find_products(name, limit)
+        return self.index.confident_match(name, candidates), candidates
+        
+    async def list_products(self, per_page: int = 10, fields: Optional[Iterable[str]] = None) -> List[Dict]:
+        """קבלת רשימת המוצרים בחנות"""
+        try:
+            api_logger.info(f"Fetching products list (per_page={per_page})")
+            response = await self.wcapi.get("products", params=with_fields({"per_page": per_page}, fields))
+            api_logger.info(f"Products list response: {response.status_code}")
+            
+            if response.status_code != 200:
+                api_logger.error(f"Failed to fetch products: {response.text}")
+                raise Exception(f"Failed to fetch products: {response.text}")
+            products = response.json()
+            self.cache.put_many(products, fields)
+            return products
+        except Exception as e:
+            api_logger.error(f"Error listing products: {str(e)}")
+            raise
+            
+    async def list_all_products(self, fields: Optional[Iterable[str]] = None, **params) -> List[Dict]:
+        """קבלת כל המוצרים בחנות מכל העמודים (שליפה מקבילית)"""
+        try:
+            api_logger.info(f"Fetching all products (params={params})")
+            products = await self.wcapi.get_all("products", params=with_fields(params, fields))
+            self.cache.put_many(products, fields)
+            if not params:
+                # כל הקטלוג - סנכרון מלא של המראה
+                self.mirror.replace_all("products", products, fields)
+            return products
+        except Exception as e:
+            api_logger.error(f"Error listing all products: {str(e)}")
+            raise
+            
+    async def create_product(self, name: str, description: str, regular_price: str, stock_quantity: Optional[int] = None) -> Dict:
+        """יצירת מוצר חדש"""
+        try:
+            if not name or not regular_price:
+                api_logger.error("Missing required fields")
+                raise ValueError("נדרש לפחות שם מוצר ומחיר")
+            
+            product_data = {
+                "name": name,
+                "type": "simple",
+                "regular_price": str(regular_price),
+                "description": description,
+                "manage_stock": True if stock_quantity is not None else False,
+                "stock_quantity": stock_quantity if stock_quantity is not None else None,
+                "status": "publish"
+            }
+            
+            api_logger.info(f"Creating product: {product_data}")
+            response = await self.wcapi.post("products", product_data)
+            api_logger.info(f"Create Product Response Code: {response.status_code}")
+            
+            if response.status_code != 201:
+                api_logger.error(f"Failed to create product: {response.text}")
+                raise Exception(f"Failed to create product: {response.text}")
+            product = response.json()
+            self._remember(product)
+            return product
+        except Exception as e:
+            api_logger.error(f"Error creating product: {str(e)}")
+            raise
+            
+    async def update_product(self, product_id: int, **kwargs) -> Dict:
+        """עדכון פרטי מוצר"""
+        try:
+            response = await self.wcapi.put(f"products/{product_id}", kwargs)
+            if response.status_code != 200:
+                raise Exception(f"Failed to update product: {response.text}")
+            product = response.json()
+            self._remember(product)
+            return product
+        except Exception as e:
+            logger.error(f"Error updating product: {str(e)}")
+            raise
+            
+    async def delete_product(self, product_id: int) -> Dict:
+        """מחיקת מוצר"""
+        try:
+            response = await self.wcapi.delete(f"products/{product_id}", params={"force": True})
+            if response.status_code != 200:
+                raise Exception(f"Failed to delete product: {response.text}")
             return response.json()
+        except Exception as e:
+            logger.error(f"Error deleting product: {str(e)}")
+            raise
+            
+    async def get_product_details(self, product_id: int, fields: Optional[Iterable[str]] = None) -> Dict:
+        """קבלת פרטים מלאים על מוצר"""
+        try:
+            cached = self.cache.get(product_id, fields)
+            if cached is not None:
+                return cached
+            
+            mirrored = self.mirror.get("products", product_id, fields)
+            if mirrored is not None:
+                self.cache.put(mirrored, fields)
+                return mirrored
+            
+            response = await self.wcapi.get(f"products/{product_id}", params=with_fields(fields=fields))
+            if response.status_code != 200:
+                raise Exception(f"Failed to get product: {response.text}")
+            product = response.json()
+            self.cache.put(product, fields)
+            self.mirror.put("products", product, fields)
+            return product
+        except Exception as e:
+            logger.error(f"Error getting product details: {str(e)}")
+            raise
+            
+    async def search_products(self, search_term: str, fields: Optional[Iterable[str]] = None) -> List[Dict]:
+        """חיפוש מוצרים לפי טקסט"""
+        try:
+            cached = self.cache.search(search_term, fields)
+            if cached is not None:
+                return cached
+            
+            response = await self.wcapi.get("products", params=with_fields({"search": search_term}, fields))
+            if response.status_code != 200:
+                raise Exception(f"Failed to search products: {response.text}")
+            products = response.json()
+            self.cache.put_search(search_term, products, fields)
+            return products
+        except Exception as e:
+            logger.error(f"Error searching products: {str(e)}")
+            raise
+            
+    async def update_price(self, product_id: int, price: str, is_sale: bool = False) -> Dict:
+        """עדכון מחיר מוצר"""
+        try:
+            update_data = {"sale_price" if is_sale else "regular_price": price}
+            response = await self.wcapi.put(f"products/{product_id}", update_data)
+            if response.status_code != 200:
+                raise Exception(f"Failed to update price: {response.text}")
+            product = response.json()
+            self._remember(product)
+            return product
+        except Exception as e:
+            logger.error(f"Error updating price: {str(e)}")
+            raise
+            
+    async def batch_update_products(self, updates: List[Dict]) -> Dict:
+        """עדכון מוצרים רבים דרך products/batch (כל פריט חייב לכלול id)"""
+        try:
+            api_logger.info(f"Batch updating {len(updates)} products")
+            result = await self.wcapi.batch("products", update=updates)
+            for product in result["updated"]:
+                self._remember(product)
+            return result
+        except Exception as e:
+            api_logger.error(f"Error batch updating products: {str(e)}")
+            raise
+            
+    async def update_prices(self, prices: Dict[int, str], is_sale: bool = False) -> Dict:
+        """עדכון מחירים למוצרים רבים בבת אחת: {product_id: price}"""
+        field = "sale_price" if is_sale else "regular_price"
+        return await self.batch_update_products([{"id": product_id, field: price} for product_id, price in prices.items()])
+            
+    async def remove_discount(self, product_id: int) -> Dict:
+        """הסרת מבצע/הנחה ממוצר"""
+        try:
+            response = await self.wcapi.put(f"products/{product_id}", {"sale_price": ""})
+            if response.status_code != 200:
+                raise Exception(f"Failed to remove discount: {response.text}")
+            product = response.json()
+            self._remember(product)
+            return product
         except Exception as e:
             logger.error(f"Error removing discount: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
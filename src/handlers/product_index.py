@@ -0,0 +1,199 @@
+import re
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# השדות שנשלפים מהחנות לבניית האינדקס
+INDEX_FIELDS = ("id", "name")
+
+# ניקוד וטעמים (U+0591-U+05C7), למעט מקף עברי שהופך לרווח
+_NIQQUD = re.compile(r"[\u0591-\u05BD\u05BF-\u05C7]")
+# גרש, גרשיים ומירכאות נמחקים (צ'יפס, מ"ל) במקום להפריד מילים
+_QUOTES = re.compile(r"[\'\"`\u05F3\u05F4]")
+_FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+_NON_WORD = re.compile(r"[^\w]+|_")
+
+
+def normalize_name(text: str) -> str:
+    """נרמול שם לחיפוש: הסרת ניקוד, איחוד אותיות סופיות, אותיות קטנות וצמצום סימנים ורווחים"""
+    text = _QUOTES.sub("", _NIQQUD.sub("", str(text or "")))
+    text = text.translate(_FINAL_LETTERS).lower()
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """קבוצת שלשות התווים של מחרוזת מנורמלת (עם ריפוד בקצוות)"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductIndex:
+    """אינדקס מקומי לשמות מוצרים (מילים + שלשות תווים) עם דירוג תוצאות
+
+    נבנה פעם אחת מכל הקטלוג ומתעדכן בכל יצירה, עדכון או מחיקה של מוצר,
+    כך שזיהוי מוצר לפי שם לא דורש פנייה לחנות. החיפוש סלחני לשגיאות כתיב,
+    לניקוד ולאותיות סופיות, ומחזיר את המוצרים המתאימים ביותר קודם.
+
+    סלחנות כזו מספיקה להצגת מוצר, אבל לא לשינוי שלו: "חולצה ירוקה" שלא קיימת
+    מקבלת ציון סביר מול "חולצה כחולה". confident_match מחזיר מוצר רק כשהשם
+    זהה אחרי נרמול, או כשיש מועמד יחיד מעל strict_score.
+    """
+
+    def __init__(self, ttl: float = 600, min_score: float = 0.5, strict_score: float = 0.85):
+        """
+        Args:
+            ttl: כל כמה שניות לבנות את האינדקס מחדש מהקטלוג המלא
+            min_score: ציון מינימלי (0-1) להחזרת מוצר
+            strict_score: ציון מינימלי לזיהוי ודאי (פעולות שמשנות את המוצר)
+        """
+        self.ttl = ttl
+        self.min_score = min_score
+        self.strict_score = strict_score
+        self._lock = threading.RLock()
+        self._names: Dict[int, str] = {}  # id -> שם מקורי
+        self._normalized: Dict[int, str] = {}  # id -> שם מנורמל
+        self._grams: Dict[int, Set[str]] = {}
+        self._token_postings: Dict[str, Set[int]] = defaultdict(set)
+        self._gram_postings: Dict[str, Set[int]] = defaultdict(set)
+        self._built_at: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "ProductIndex":
+        """יצירת אינדקס מתוך מילון ההגדרות של load_config"""
+        return cls(ttl=config['PRODUCT_INDEX_TTL'], strict_score=config['PRODUCT_MATCH_STRICT_SCORE'])
+
+    def attach(self, transport) -> None:
+        """הסרת מוצרים שנמחקו דרך שכבת התקשורת"""
+        transport.add_mutation_listener(self.on_mutation)
+
+    def needs_refresh(self) -> bool:
+        """האם צריך לבנות את האינדקס (לא נבנה עדיין או שפג תוקפו)"""
+        return self._built_at is None or time.monotonic() - self._built_at > self.ttl
+
+    def build(self, products: Iterable[Dict]) -> None:
+        """בניית האינדקס מחדש מכל המוצרים בקטלוג"""
+        started = time.perf_counter()
+        with self._lock:
+            self._names.clear()
+            self._normalized.clear()
+            self._grams.clear()
+            self._token_postings.clear()
+            self._gram_postings.clear()
+            for product in products:
+                self._add(product)
+            self._built_at = time.monotonic()
+        logger.debug(f"Built product index: {len(self._names)} products in {time.perf_counter() - started:.3f}s")
+
+    def upsert(self, product: Dict) -> None:
+        """הוספה או עדכון של מוצר באינדקס"""
+        if not isinstance(product, dict) or "id" not in product or not product.get("name"):
+            return
+        with self._lock:
+            self._remove(product["id"])
+            self._add(product)
+
+    def remove(self, product_id: int) -> None:
+        """הסרת מוצר מהאינדקס"""
+        with self._lock:
+            self._remove(product_id)
+
+    def on_mutation(self, method: str, endpoint: str, data=None) -> None:
+        parts = endpoint.strip("/").split("/")
+        if parts[0] != "products" or len(parts) < 2:
+            return
+        if method == "DELETE" and parts[1].isdigit() and len(parts) == 2:
+            self.remove(int(parts[1]))
+        elif parts[1] == "batch":
+            for product_id in (data or {}).get("delete", []):
+                self.remove(product_id)
+
+    def search(self, query: str, limit: int = 5) -> List[Dict]:
+        """חיפוש מוצרים לפי שם, מדורגים מהמתאים ביותר: [{"id", "name", "score"}]"""
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        query_tokens = set(normalized.split())
+        query_grams = trigrams(normalized)
+
+        with self._lock:
+            overlap = Counter()
+            for gram in query_grams:
+                overlap.update(self._gram_postings.get(gram, ()))
+
+            # מדרגים רק את המועמדים עם הכי הרבה שלשות משותפות
+            results = []
+            for product_id, shared in overlap.most_common(max(limit * 10, 50)):
+                name = self._normalized[product_id]
+                if name == normalized:
+                    score = 1.0
+                else:
+                    dice = 2 * shared / (len(query_grams) + len(self._grams[product_id]))
+                    token_hits = sum(1 for token in query_tokens if product_id in self._token_postings.get(token, ()))
+                    score = max(dice, (dice + token_hits / len(query_tokens)) / 2)
+                    if normalized in name:
+                        # כל השאילתה מופיעה בשם - עדיפות לשמות קצרים (התאמה מדויקת יותר)
+                        score = max(score, 0.8 + 0.19 * len(normalized) / len(name))
+                if score >= self.min_score:
+                    results.append({"id": product_id, "name": self._names[product_id], "score": round(score, 3)})
+
+        results.sort(key=lambda r: (-r["score"], len(r["name"])))
+        return results[:limit]
+
+    def confident_match(self, query: str, candidates: List[Dict]) -> Optional[Dict]:
+        """המועמד שאפשר לפעול עליו בלי אישור, או None אם צריך לשאול את המשתמש
+
+        שם זהה אחרי נרמול מנצח תמיד (אלא אם יש כמה מוצרים באותו שם); אחרת רק
+        מועמד יחיד שהציון שלו לפחות strict_score. מועמדים מחיפוש בחנות (בלי
+        ציון) נחשבים רק בהתאמה מדויקת.
+        """
+        normalized = normalize_name(query)
+        exact = [c for c in candidates if normalize_name(c.get("name")) == normalized]
+        if exact:
+            return exact[0] if len(exact) == 1 else None
+        strong = [c for c in candidates if c.get("score", 0) >= self.strict_score]
+        return strong[0] if len(strong) == 1 else None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def ids(self) -> Set[int]:
+        """המזהים של כל המוצרים שבאינדקס"""
+        with self._lock:
+            return set(self._names)
+
+    def _add(self, product: Dict) -> None:
+        product_id = product.get("id")
+        name = product.get("name")
+        if product_id is None or not name:
+            return
+        normalized = normalize_name(name)
+        grams = trigrams(normalized)
+        self._names[product_id] = name
+        self._normalized[product_id] = normalized
+        self._grams[product_id] = grams
+        for token in normalized.split():
+            self._token_postings[token].add(product_id)
+        for gram in grams:
+            self._gram_postings[gram].add(product_id)
+
+    def _remove(self, product_id: int) -> None:
+        normalized = self._normalized.pop(product_id, None)
+        if normalized is None:
+            return
+        self._names.pop(product_id, None)
+        for token in normalized.split():
+            self._discard(self._token_postings, token, product_id)
+        for gram in self._grams.pop(product_id, ()):
+            self._discard(self._gram_postings, gram, product_id)
+
+    @staticmethod
+    def _discard(postings: Dict[str, Set[int]], key: str, product_id: int) -> None:
+        ids = postings.get(key)
+        if ids is not None:
+            ids.discard(product_id)
+            if not ids:
+                del postings[key]
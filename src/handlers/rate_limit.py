@@ -0,0 +1,150 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# מתודות שבטוח לשלוח שוב (RFC 9110) - POST (יצירה, batch) לא נשלח שוב לעולם
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# תשובות שמצדיקות ניסיון נוסף
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# תשובות שמסמנות שהחנות מבקשת להאט
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """פענוח הכותרת Retry-After (שניות או תאריך HTTP) למספר שניות"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """מגביל קצב משותף לחנות (token bucket) שמסתגל לתגובות החנות
+
+    כל בקשה צורכת אסימון; האסימונים מתמלאים בקצב rate לשנייה עד burst.
+    כשהחנות מחזירה 429/503 הקצב יורד בחצי (עד min_rate), וכל תשובה תקינה
+    מעלה אותו בהדרגה חזרה ל-max_rate. ההמתנה מחושבת מראש (הזמנת אסימון),
+    כך שאותו מגביל משמש גם תהליכונים (sleep) וגם את לולאת האירועים
+    (asyncio.sleep) בלי לחסום אותה. rate=0 מבטל את ההגבלה.
+    """
+
+    def __init__(self, rate: float = 10, burst: Optional[float] = None, min_rate: float = 0.5):
+        """
+        Args:
+            rate: בקשות לשנייה (מקסימום)
+            burst: כמה בקשות אפשר לשלוח ברצף אחרי זמן שקט (ברירת מחדל: rate)
+            min_rate: הקצב הנמוך ביותר אחרי האטות חוזרות
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.min_rate = min(min_rate, rate) if rate > 0 else 0
+        self.throttled = 0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """יצירת מגביל לפי משתני הסביבה WC_RATE_LIMIT / WC_RATE_BURST"""
+        return cls(rate=float(os.getenv('WC_RATE_LIMIT', '10')),
+                   burst=float(os.getenv('WC_RATE_BURST', '0')) or None)
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "RateLimiter":
+        """יצירת מגביל מתוך מילון ההגדרות של load_config"""
+        return cls(rate=config['WC_RATE_LIMIT'], burst=config['WC_RATE_BURST'])
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_rate > 0
+
+    def reserve(self) -> float:
+        """הזמנת אסימון; מחזיר כמה שניות להמתין לפני שליחת הבקשה"""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        """תשובה תקינה - העלאה הדרגתית של הקצב חזרה למקסימום"""
+        if self.enabled and self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.02)
+
+    def on_throttled(self) -> None:
+        """החנות ביקשה להאט - הורדת הקצב בחצי"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0)
+        logger.warning(f"Store throttled requests, rate lowered to {self.rate:.2f}/s")
+
+
+class RetryPolicy:
+    """מדיניות ניסיונות חוזרים: רק למתודות אידמפוטנטיות, עם backoff אקראי ו-Retry-After"""
+
+    def __init__(self, max_retries: int = 3, backoff: float = 0.5, max_backoff: float = 30):
+        """
+        Args:
+            max_retries: מספר ניסיונות נוספים מקסימלי
+            backoff: בסיס ההמתנה בשניות (מוכפל בכל ניסיון)
+            max_backoff: המתנה מקסימלית בין ניסיונות
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(max_retries=int(os.getenv('WC_MAX_RETRIES', '3')),
+                   backoff=float(os.getenv('WC_RETRY_BACKOFF', '0.5')))
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "RetryPolicy":
+        return cls(max_retries=config['WC_MAX_RETRIES'], backoff=config['WC_RETRY_BACKOFF'])
+
+    def can_retry(self, method: str, attempt: int) -> bool:
+        return method.upper() in IDEMPOTENT_METHODS and attempt < self.max_retries
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """זמן ההמתנה לפני ניסיון מספר attempt+1: full jitter, ולא פחות ממה שהחנות ביקשה"""
+        jittered = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        requested = parse_retry_after(retry_after)
+        if requested is not None:
+            return min(max(requested, jittered), self.max_backoff * 4)
+        return jittered
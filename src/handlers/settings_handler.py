@@ -2,32 +2,20 @@ import os
 import logging
 import requests
 from typing import Dict, List, Optional
-from woocommerce import API
+from .transport import WooTransport, AsyncWooTransport
 
 logger = logging.getLogger(__name__)
 
 class SettingsHandler:
     """מחלקה לניהול הגדרות החנות WooCommerce"""
     
-    def __init__(self, wp_url: str):
+    def __init__(self, wp_url: str, transport: Optional[WooTransport] = None):
         """אתחול המחלקה עם כתובת האתר והרשאות"""
         self.wp_url = wp_url
         
-        # Initialize WooCommerce API
-        wc_key = os.getenv('WC_CONSUMER_KEY')
-        wc_secret = os.getenv('WC_CONSUMER_SECRET')
-        
-        if not wc_key or not wc_secret:
-            raise ValueError("WooCommerce API keys not found in environment")
-            
+        # Shared WooCommerce transport (pooled keep-alive connections)
         logger.debug(f"Initializing WooCommerce API for settings with URL: {wp_url}")
-        self.wcapi = API(
-            url=wp_url,
-            consumer_key=wc_key,
-            consumer_secret=wc_secret,
-            version="wc/v3",
-            timeout=30
-        )
+        self.wcapi = transport or WooTransport.from_env(wp_url)
         
     def get_store_info(self) -> Dict:
         """קבלת מידע בסיסי על החנות"""
@@ -122,4 +110,107 @@ class SettingsHandler:
             return response.json()
         except Exception as e:
             logger.error(f"Error updating currency: {str(e)}")
-            raise 
\ No newline at end of file
+            raise 
+
+class AsyncSettingsHandler:
+    """גרסה אסינכרונית של SettingsHandler שאינה חוסמת את לולאת האירועים"""
+    
+    def __init__(self, wp_url: str, transport: Optional[AsyncWooTransport] = None):
+        """אתחול המחלקה עם כתובת האתר והרשאות"""
+        self.wp_url = wp_url
+        self.wcapi = transport or AsyncWooTransport.from_env(wp_url)
+        
+    async def get_store_info(self) -> Dict:
+        """קבלת מידע בסיסי על החנות"""
+        try:
+            response = await self.wcapi.get("system_status")
+            if response.status_code != 200:
+                raise Exception(f"Failed to get store info: {response.text}")
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error getting store info: {str(e)}")
+            raise
+            
+    async def get_payment_gateways(self) -> List[Dict]:
+        """קבלת רשימת שערי התשלום המוגדרים"""
+        try:
+            response = await self.wcapi.get("payment_gateways")
+            if response.status_code != 200:
+                raise Exception(f"Failed to get payment gateways: {response.text}")
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error getting payment gateways: {str(e)}")
+            raise
+            
+    async def update_payment_gateway(self, gateway_id: str, **settings) -> Dict:
+        """עדכון הגדרות שער תשלום"""
+        try:
+            response = await self.wcapi.put(f"payment_gateways/{gateway_id}", settings)
+            if response.status_code != 200:
+                raise Exception(f"Failed to update payment gateway: {response.text}")
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error updating payment gateway: {str(e)}")
+            raise
+            
+    async def get_tax_rates(self) -> List[Dict]:
+        """קבלת רשימת שיעורי המס המוגדרים"""
+        try:
+            response = await self.wcapi.get("taxes")
+            if response.status_code != 200:
+                raise Exception(f"Failed to get tax rates: {response.text}")
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error getting tax rates: {str(e)}")
+            raise
+            
+    async def create_tax_rate(self, country: str, state: str = "", rate: str = "", name: str = "") -> Dict:
+        """יצירת שיעור מס חדש"""
+        try:
+            tax_data = {
+                "country": country,
+                "state": state,
+                "rate": rate,
+                "name": name
+            }
+            
+            response = await self.wcapi.post("taxes", tax_data)
+            if response.status_code != 201:
+                raise Exception(f"Failed to create tax rate: {response.text}")
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error creating tax rate: {str(e)}")
+            raise
+            
+    async def delete_tax_rate(self, rate_id: int) -> Dict:
+        """מחיקת שיעור מס"""
+        try:
+            response = await self.wcapi.delete(f"taxes/{rate_id}", params={"force": True})
+            if response.status_code != 200:
+                raise Exception(f"Failed to delete tax rate: {response.text}")
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error deleting tax rate: {str(e)}")
+            raise
+            
+    async def get_currency_settings(self) -> Dict:
+        """קבלת הגדרות מטבע החנות"""
+        try:
+            response = await self.wcapi.get("settings/general/woocommerce_currency")
+            if response.status_code != 200:
+                raise Exception(f"Failed to get currency settings: {response.text}")
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error getting currency settings: {str(e)}")
+            raise
+            
+    async def update_currency_settings(self, currency: str) -> Dict:
+        """עדכון מטבע החנות"""
+        try:
+            response = await self.wcapi.put("settings/general/woocommerce_currency", {"value": currency})
+            if response.status_code != 200:
+                raise Exception(f"Failed to update currency: {response.text}")
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error updating currency: {str(e)}")
+            raise
@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# המשאבים שנשמרים במראה; נקודת הקצה של כל משאב ב-WooCommerce
+MIRROR_RESOURCES = {
+    "products": "products",
+    "categories": "products/categories",
+    "customers": "customers",
+    "coupons": "coupons",
+    "orders": "orders",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    resource TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    fields TEXT,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (resource, id)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    resource TEXT PRIMARY KEY,
+    synced_at REAL,
+    fields TEXT,
+    cursor TEXT
+);
+"""
+
+
+def resource_of(endpoint: str) -> tuple:
+    """פירוק נקודת קצה למשאב במראה ולשאר הנתיב: "products/categories/5" -> ("categories", ["5"])"""
+    parts = endpoint.strip("/").split("/")
+    if parts[:2] == ["products", "categories"]:
+        return "categories", parts[2:]
+    if parts[0] in MIRROR_RESOURCES:
+        return parts[0], parts[1:]
+    return None, parts
+
+
+def _covers(stored_fields: Optional[List[str]], fields: Optional[Iterable[str]]) -> bool:
+    if stored_fields is None:
+        return True
+    if not fields:
+        return False
+    return set(fields) <= set(stored_fields)
+
+
+def _project(item: Dict, fields: Optional[Iterable[str]]) -> Dict:
+    if not fields:
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+class StoreMirror:
+    """מראה מקומית (SQLite במצב WAL) של נתוני החנות, לשימוש מיד אחרי הפעלה מחדש
+
+    כל רשומה נשמרת כ-JSON עם השדות שנשלפו (None = הרשומה המלאה) וזמן
+    השמירה; לכל משאב נשמר גם מתי סונכרן במלואו. ההנדלרים קוראים דרך
+    המראה: רשומה שנשמרה לפני פחות מ-max_age שניות ומכילה את השדות
+    המבוקשים מוגשת בלי פנייה לחנות. שינויים שעוברים בשכבת התקשורת מוחקים
+    את הרשומות שהשתנו. בלי path המראה כבויה וכל הפעולות לא עושות כלום.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age: float = 900, orders_days: int = 30):
+        """
+        Args:
+            path: קובץ מסד הנתונים (None = מראה כבויה)
+            max_age: כמה שניות רשומה או סנכרון מלא נחשבים טריים
+            orders_days: רק הזמנות מהימים האחרונים נשמרות
+        """
+        self.path = path
+        self.max_age = max_age
+        self.orders_days = orders_days
+        self._lock = threading.Lock()
+        self._transports = set()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self.prune()
+            logger.info(f"Store mirror opened at {path}")
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "StoreMirror":
+        """יצירת מראה מתוך מילון ההגדרות של load_config"""
+        return cls(path=config['STORE_MIRROR_PATH'], max_age=config['STORE_MIRROR_MAX_AGE'])
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def attach(self, transport) -> None:
+        """רישום המראה לשינויים שעוברים בשכבת התקשורת (פעם אחת לכל שכבה)"""
+        if not self.enabled or id(transport) in self._transports:
+            return
+        self._transports.add(id(transport))
+        transport.add_mutation_listener(self.on_mutation)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    # ---- קריאה ----
+
+    def get(self, resource: str, item_id: int, fields: Optional[Iterable[str]] = None) -> Optional[Dict]:
+        """רשומה טרייה שמכילה את השדות המבוקשים, או None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, fields FROM records WHERE resource = ? AND id = ? AND stored_at >= ?",
+                (resource, item_id, time.time() - self.max_age),
+            ).fetchone()
+        if row is None:
+            return None
+        stored_fields = json.loads(row[1]) if row[1] else None
+        if not _covers(stored_fields, fields):
+            return None
+        return _project(json.loads(row[0]), fields)
+
+    def list_all(self, resource: str, fields: Optional[Iterable[str]] = None) -> Optional[List[Dict]]:
+        """כל הרשומות של משאב, רק אם הוא סונכרן במלואו לאחרונה עם השדות המבוקשים"""
+        state = self.sync_state(resource)
+        if state is None or state["synced_at"] is None:
+            return None
+        if time.time() - state["synced_at"] > self.max_age or not _covers(state["fields"], fields):
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM records WHERE resource = ? ORDER BY id", (resource,)
+            ).fetchall()
+        return [_project(json.loads(row[0]), fields) for row in rows]
+
+    def ids(self, resource: str) -> Set[int]:
+        """המזהים של כל הרשומות השמורות של משאב"""
+        if not self.enabled:
+            return set()
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM records WHERE resource = ?", (resource,)).fetchall()
+        return {row[0] for row in rows}
+
+    def sync_state(self, resource: str) -> Optional[Dict]:
+        """{"synced_at", "fields", "cursor"} של משאב, או None אם לא סונכרן מעולם"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_at, fields, cursor FROM sync_state WHERE resource = ?", (resource,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"synced_at": row[0], "fields": json.loads(row[1]) if row[1] else None, "cursor": row[2]}
+
+    # ---- כתיבה ----
+
+    def put(self, resource: str, item: Dict, fields: Optional[Iterable[str]] = None) -> None:
+        """שמירת רשומה (מלאה, או רק השדות שנשלפו)"""
+        self.put_many(resource, [item], fields)
+
+    def put_many(self, resource: str, items: Iterable[Dict], fields: Optional[Iterable[str]] = None) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._upsert(resource, items, fields)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def replace_all(self, resource: str, items: List[Dict], fields: Optional[Iterable[str]] = None,
+                    cursor: Optional[str] = None) -> None:
+        """החלפת כל הרשומות של משאב בתוצאה של שליפה מלאה, וסימון זמן הסנכרון"""
+        if not self.enabled:
+            return
+        fields_json = json.dumps(sorted(fields)) if fields else None
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                ids = [item["id"] for item in items if "id" in item]
+                self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_ids (id INTEGER PRIMARY KEY)")
+                self._conn.execute("DELETE FROM keep_ids")
+                self._conn.executemany("INSERT OR IGNORE INTO keep_ids VALUES (?)", [(i,) for i in ids])
+                self._conn.execute(
+                    "DELETE FROM records WHERE resource = ? AND id NOT IN (SELECT id FROM keep_ids)", (resource,)
+                )
+                self._upsert(resource, items, fields)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (resource, synced_at, fields, cursor) VALUES (?, ?, ?, ?)",
+                    (resource, time.time(), fields_json, cursor),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.debug(f"Mirrored {len(items)} {resource}")
+
+    def delete(self, resource: str, item_ids: Iterable[int]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM records WHERE resource = ? AND id = ?", [(resource, int(i)) for i in item_ids]
+            )
+
+    def set_cursor(self, resource: str, cursor: str) -> None:
+        """שמירת סמן הסנכרון המצטבר של משאב (date_modified_gmt האחרון שהוחל)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sync_state (resource, cursor) VALUES (?, ?) "
+                "ON CONFLICT(resource) DO UPDATE SET cursor = excluded.cursor",
+                (resource, cursor),
+            )
+
+    def mark_unsynced(self, resource: str) -> None:
+        """המשאב כבר לא מסונכרן במלואו (למשל נוצרה רשומה שלא במראה)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conn.execute("UPDATE sync_state SET synced_at = NULL WHERE resource = ?", (resource,))
+
+    def prune(self) -> None:
+        """מחיקת הזמנות ישנות מ-orders_days ימים"""
+        if not self.enabled:
+            return
+        cutoff = (datetime.now() - timedelta(days=self.orders_days)).isoformat()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM records WHERE resource = 'orders' AND json_extract(data, '$.date_created') < ?",
+                (cutoff,),
+            )
+
+    def on_mutation(self, method: str, endpoint: str, data=None) -> None:
+        """מחיקת רשומות ששונו; הרשומה המעודכנת נשמרת מחדש מהתשובה דרך ההנדלר"""
+        resource, rest = resource_of(endpoint)
+        if resource is None:
+            return
+        if not rest:
+            if method == "POST":
+                self.mark_unsynced(resource)
+        elif rest[0] == "batch":
+            data = data or {}
+            changed = [item["id"] for item in data.get("update", []) if isinstance(item, dict) and "id" in item]
+            self.delete(resource, changed + list(data.get("delete", [])))
+            if data.get("create"):
+                self.mark_unsynced(resource)
+        elif rest[0].isdigit():
+            # כולל תתי-משאבים (וריאציות של מוצר, הערות להזמנה)
+            self.delete(resource, [int(rest[0])])
+
+    # ---- עזר ----
+
+    def _upsert(self, resource: str, items: Iterable[Dict], fields: Optional[Iterable[str]]) -> None:
+        now = time.time()
+        field_list = sorted(fields) if fields else None
+        order_cutoff = (datetime.now() - timedelta(days=self.orders_days)).isoformat()
+        rows = []
+        for item in items:
+            if not isinstance(item, dict) or "id" not in item:
+                continue
+            if resource == "orders" and item.get("date_created") and item["date_created"] < order_cutoff:
+                continue
+            stored_at = now
+            item_fields = field_list
+            if field_list is not None:
+                # מיזוג שדות חלקיים לרשומה קיימת במקום לדרוס רשומה מלאה בחלקית
+                existing = self._conn.execute(
+                    "SELECT data, fields, stored_at FROM records WHERE resource = ? AND id = ?",
+                    (resource, item["id"]),
+                ).fetchone()
+                if existing is not None and existing[2] >= now - self.max_age:
+                    item = {**json.loads(existing[0]), **item}
+                    existing_fields = json.loads(existing[1]) if existing[1] else None
+                    item_fields = None if existing_fields is None else sorted(set(existing_fields) | set(field_list))
+                    # השדות הישנים לא רועננו - הרשומה טרייה רק כמו החלק הישן שבה
+                    stored_at = existing[2]
+            rows.append((resource, item["id"], json.dumps(item, ensure_ascii=False),
+                         json.dumps(item_fields) if item_fields is not None else None, stored_at))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO records (resource, id, data, fields, stored_at) VALUES (?, ?, ?, ?, ?)", rows
+        )
@@ -0,0 +1,245 @@
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# המשאבים שנסרקים לפי modified_after (נקודת הקצה של customers לא תומכת בסינון לפי זמן שינוי)
+SYNC_RESOURCES = ("products", "orders", "coupons")
+
+# סטטוסים שמשמעותם שהרשומה כבר לא קיימת בחנות
+_REMOVED_STATUSES = ("trash",)
+
+# בלי status החנות מחזירה "any" - כל הסטטוסים חוץ מסל המחזור. status של מוצרים מקבל
+# ערך יחיד ("any,trash" נדחה), ולכן רשומות שהועברו לסל נשלפות בבקשה נפרדת
+_TRASH_PARAMS = {"status": "trash"}
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+class SyncWorker:
+    """עדכון המטמונים המקומיים ברקע לפי שינויים בחנות (modified_after)
+
+    כל interval שניות נשלפות מכל משאב רק הרשומות ששונו מאז הסמן האחרון
+    (date_modified_gmt המאוחר ביותר שנראה), והן מוחלות על המטמונים:
+    מטמון המוצרים, אינדקס השמות, סיכומי הלקוחות והמראה המקומית. כך העלות
+    פרופורציונלית לקצב השינויים ולא לגודל הקטלוג. הסמנים נשמרים במראה
+    (אם היא פעילה) וממשיכים מאותה נקודה אחרי הפעלה מחדש.
+
+    רשומה שנמחקה לצמיתות (force=true) לא מופיעה באף שליפה לפי זמן שינוי,
+    ולכן כל reconcile_interval שניות נשלפים רק המזהים של כל הרשומות
+    (_fields=id) ורשומה מקומית שכבר לא קיימת בחנות מוסרת מהמטמונים.
+
+    metrics() מחזיר לכל משאב את זמן הסנכרון האחרון, הפיגור, מספר השינויים
+    שהוחלו, מספר הרשומות שנמחקו לצמיתות ומספר השגיאות.
+    """
+
+    def __init__(self, wcapi, interval: float = 60, cache=None, index=None,
+                 customer_stats=None, mirror=None, reconcile_interval: float = 3600):
+        """
+        Args:
+            wcapi: שכבת התקשורת הסינכרונית (WooTransport)
+            interval: שניות בין סבבי סנכרון
+            cache: ProductCache לעדכון
+            index: ProductIndex לעדכון
+            customer_stats: CustomerSpendAggregator לעדכון
+            mirror: StoreMirror לעדכון ולשמירת הסמנים
+            reconcile_interval: שניות בין השוואות מזהים לזיהוי מחיקות לצמיתות (0 - כבוי)
+        """
+        self.wcapi = wcapi
+        self.interval = interval
+        self.cache = cache
+        self.index = index
+        self.customer_stats = customer_stats
+        self.mirror = mirror
+        self.reconcile_interval = reconcile_interval
+        self._cursors: Dict[str, str] = {}
+        self._reconciled_at: Dict[str, float] = {}
+        self._metrics: Dict[str, Dict] = {
+            resource: {"last_sync": None, "duration": None, "lag": None, "cursor_lag": None,
+                       "changes": 0, "total_changes": 0, "last_reconcile": None, "hard_deletes": 0,
+                       "errors": 0, "last_error": None}
+            for resource in SYNC_RESOURCES
+        }
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config: Dict, wcapi, **kwargs) -> "SyncWorker":
+        """יצירת עובד סנכרון מתוך מילון ההגדרות של load_config"""
+        return cls(wcapi, interval=config['SYNC_INTERVAL'],
+                   reconcile_interval=config['SYNC_RECONCILE_INTERVAL'], **kwargs)
+
+    # ---- הפעלה ----
+
+    def start(self) -> None:
+        """הפעלת הסנכרון בתהליכון רקע (interval=0 משאיר אותו כבוי)"""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="wc-sync", daemon=True)
+        self._thread.start()
+        logger.info(f"Sync worker started (every {self.interval:g}s)")
+
+    def stop(self, timeout: Optional[float] = 5) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def run_once(self) -> Dict[str, int]:
+        """סבב סנכרון אחד על כל המשאבים; מחזיר כמה שינויים הוחלו בכל משאב"""
+        applied = {}
+        for resource in SYNC_RESOURCES:
+            if self._stop.is_set():
+                break
+            applied[resource] = self.sync(resource)
+            if self._reconcile_due(resource):
+                self.reconcile(resource)
+        return applied
+
+    # ---- סנכרון ----
+
+    def sync(self, resource: str) -> int:
+        """שליפת השינויים במשאב מאז הסמן והחלתם על המטמונים"""
+        metrics = self._metrics[resource]
+        started = time.perf_counter()
+        cursor = self.cursor(resource)
+        # שנייה של חפיפה - רשומה ששונתה באותה שנייה של הסמן לא תפוספס
+        since = datetime.fromisoformat(cursor) - timedelta(seconds=1)
+        params = {"modified_after": since.isoformat(), "dates_are_gmt": "true"}
+        try:
+            changed = self.wcapi.get_all(resource, params=params)
+            changed += self.wcapi.get_all(resource, params={**params, **_TRASH_PARAMS})
+            self.apply(resource, changed)
+        except Exception as e:
+            metrics["errors"] += 1
+            metrics["last_error"] = str(e)
+            logger.error(f"Error syncing {resource}: {e}")
+            return 0
+
+        latest = max((item.get("date_modified_gmt") or "" for item in changed), default="")
+        if latest > cursor:
+            self._set_cursor(resource, latest)
+        now = _utc_now()
+        metrics.update({
+            "last_sync": time.time(),
+            "duration": round(time.perf_counter() - started, 3),
+            "changes": len(changed),
+            "total_changes": metrics["total_changes"] + len(changed),
+            "cursor_lag": (now - datetime.fromisoformat(self.cursor(resource))).total_seconds(),
+        })
+        if changed:
+            logger.debug(f"Synced {len(changed)} changed {resource} in {metrics['duration']}s")
+        return len(changed)
+
+    def reconcile(self, resource: str) -> int:
+        """הסרת רשומות מקומיות שנמחקו מהחנות לצמיתות; מחזיר כמה הוסרו"""
+        metrics = self._metrics[resource]
+        # המזהים המקומיים לפני השליפה - רשומה שנוצרת בזמן השליפה לא תוסר בטעות
+        known = self._known_ids(resource)
+        try:
+            live = {item["id"] for item in self.wcapi.get_all(resource, params={"_fields": "id"}) if "id" in item}
+        except Exception as e:
+            metrics["errors"] += 1
+            metrics["last_error"] = str(e)
+            logger.error(f"Error reconciling {resource}: {e}")
+            return 0
+        self._reconciled_at[resource] = time.monotonic()
+        metrics["last_reconcile"] = time.time()
+        deleted = sorted(known - live)
+        self.remove(resource, deleted)
+        metrics["hard_deletes"] += len(deleted)
+        if deleted:
+            logger.info(f"Removed {len(deleted)} {resource} deleted from the store: {deleted[:20]}")
+        return len(deleted)
+
+    def cursor(self, resource: str) -> str:
+        """הסמן הנוכחי (date_modified_gmt); בפעם הראשונה - זמן הסנכרון המלא במראה, או עכשיו"""
+        cursor = self._cursors.get(resource)
+        if cursor is None:
+            state = self.mirror.sync_state(resource) if self.mirror is not None else None
+            if state and state["cursor"]:
+                cursor = state["cursor"]
+            elif state and state["synced_at"]:
+                cursor = datetime.fromtimestamp(int(state["synced_at"]), timezone.utc).replace(tzinfo=None).isoformat()
+            else:
+                cursor = _utc_now().isoformat()
+            self._cursors[resource] = cursor
+        return cursor
+
+    def metrics(self) -> Dict[str, Dict]:
+        """מדדי הסנכרון לכל משאב; lag = שניות מאז הסנכרון המוצלח האחרון"""
+        now = time.time()
+        result = {}
+        for resource, metrics in self._metrics.items():
+            result[resource] = dict(metrics)
+            if metrics["last_sync"] is not None:
+                result[resource]["lag"] = round(now - metrics["last_sync"], 1)
+        return result
+
+    def _reconcile_due(self, resource: str) -> bool:
+        if self.reconcile_interval <= 0 or self._stop.is_set():
+            return False
+        reconciled_at = self._reconciled_at.get(resource)
+        return reconciled_at is None or time.monotonic() - reconciled_at >= self.reconcile_interval
+
+    def _known_ids(self, resource: str) -> Set[int]:
+        """המזהים של כל הרשומות שהמטמונים המקומיים מחזיקים במשאב"""
+        known = self.mirror.ids(resource) if self.mirror is not None else set()
+        if resource == "products":
+            if self.cache is not None:
+                known |= self.cache.ids()
+            if self.index is not None:
+                known |= self.index.ids()
+        return known
+
+    def _set_cursor(self, resource: str, cursor: str) -> None:
+        self._cursors[resource] = cursor
+        if self.mirror is not None:
+            self.mirror.set_cursor(resource, cursor)
+
+    # ---- החלת שינויים (גם מ-webhooks) ----
+
+    def apply(self, resource: str, items: List[Dict]) -> None:
+        """החלת רשומות ששונו (במלואן) על המטמונים; רשומה בסל המחזור מוסרת"""
+        if not items:
+            return
+        removed = [item["id"] for item in items if item.get("status") in _REMOVED_STATUSES]
+        current = [item for item in items if item.get("status") not in _REMOVED_STATUSES]
+        self.remove(resource, removed)
+
+        if resource == "products":
+            for product in current:
+                if self.cache is not None:
+                    self.cache.put(product)
+                if self.index is not None:
+                    self.index.upsert(product)
+        elif resource == "orders" and self.customer_stats is not None:
+            self.customer_stats.apply_changes(current)
+
+        if self.mirror is not None:
+            self.mirror.put_many(resource, current)
+
+    def remove(self, resource: str, item_ids: List[int]) -> None:
+        """הסרת רשומות שנמחקו מכל המטמונים"""
+        if not item_ids:
+            return
+        if resource == "products":
+            for product_id in item_ids:
+                if self.cache is not None:
+                    self.cache.invalidate(product_id)
+                if self.index is not None:
+                    self.index.remove(product_id)
+        elif resource == "orders" and self.customer_stats is not None:
+            self.customer_stats.remove_orders(item_ids)
+        if self.mirror is not None:
+            self.mirror.delete(resource, item_ids)
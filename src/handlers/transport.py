@@ -0,0 +1,642 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from woocommerce.oauth import OAuth
+
+from .pagination import Paginator, AsyncPaginator
+from .batch import BatchWriter, AsyncBatchWriter
+from .rate_limit import RateLimiter, RetryPolicy, RETRY_STATUSES, THROTTLE_STATUSES
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, circuit_key
+from .json_codec import JsonBackend
+
+logger = logging.getLogger(__name__)
+
+# זמני תגובה ברירת מחדל לפי נקודת קצה (בשניות). ההתאמה לפי הקידומת הארוכה ביותר
+DEFAULT_ENDPOINT_TIMEOUTS = {
+    "": 30,
+    "products": 30,
+    "products/categories": 20,
+    "orders": 30,
+    "customers": 20,
+    "coupons": 20,
+    "system_status": 60,
+    "wp/v2/media": 120,
+}
+
+# בקשות שמשנות נתונים בחנות - מדווחות למאזיני השינויים (למשל מטמון המוצרים)
+MUTATING_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+DEFAULT_HEADERS = {
+    "user-agent": "EcomStoreAgent/WooTransport",
+    "accept": "application/json",
+}
+
+
+def parse_endpoint_timeouts(raw: Optional[str]) -> Dict[str, float]:
+    """פענוח מחרוזת זמני תגובה בפורמט endpoint=seconds,endpoint=seconds"""
+    timeouts = {}
+    if not raw:
+        return timeouts
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        endpoint, seconds = item.split("=", 1)
+        try:
+            timeouts[endpoint.strip().strip("/")] = float(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring invalid endpoint timeout: {item}")
+    return timeouts
+
+
+def flight_key(endpoint: str, params: Optional[Dict]) -> str:
+    """מפתח לזיהוי בקשות GET זהות (אותה נקודת קצה ואותם פרמטרים, בלי תלות בסדר)"""
+    return f"{endpoint.strip('/')}?{json.dumps(params or {}, sort_keys=True, default=str)}"
+
+
+class _Flight:
+    """בקשת GET אחת שמתבצעת כרגע, שכמה קוראים ממתינים לתוצאה שלה"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+def with_fields(params: Optional[Dict] = None, fields: Optional[Iterable[str]] = None) -> Dict:
+    """הוספת _fields לפרמטרים כדי שהחנות תחזיר רק את השדות הנדרשים"""
+    params = dict(params or {})
+    if fields:
+        params["_fields"] = ",".join(fields)
+    return params
+
+
+class _BaseTransport:
+    """לוגיקה משותפת לשכבות התקשורת: בניית כתובות, הרשאות וזמני תגובה"""
+
+    def __init__(self, url: str, consumer_key: str, consumer_secret: str,
+                 version: str = "wc/v3", pool_size: int = 10, timeout: float = 30,
+                 endpoint_timeouts: Optional[Dict[str, float]] = None,
+                 verify_ssl: bool = True, query_string_auth: bool = False,
+                 page_workers: int = 4, coalesce_gets: bool = True,
+                 rate_limiter: Optional[RateLimiter] = None, retry: Optional[RetryPolicy] = None,
+                 max_concurrency: int = 0, breaker: Optional[CircuitBreaker] = None,
+                 json_backend: str = "auto"):
+        if not consumer_key or not consumer_secret:
+            raise ValueError("WooCommerce API keys not found in environment")
+
+        self.url = url if url.endswith("/") else f"{url}/"
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.version = version
+        self.is_ssl = self.url.startswith("https")
+        self.verify_ssl = verify_ssl
+        self.query_string_auth = query_string_auth
+        self.pool_size = pool_size
+        self.page_workers = page_workers
+        self.json_backend = JsonBackend(json_backend)
+        
+        # הגבלת קצב (משותפת לכל שכבות התקשורת של אותה חנות) וניסיונות חוזרים
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter(rate=0)
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.max_concurrency = max_concurrency
+        self.retries = 0
+        
+        # מפסק זרם לכל נקודת קצה, ותשובות ה-GET התקינות האחרונות כתשובה חלופית כשהמעגל פתוח
+        self.breaker = breaker if breaker is not None else CircuitBreaker(failure_threshold=0)
+        self.fallbacks_served = 0
+        self._fallbacks: "OrderedDict[str, tuple]" = OrderedDict()  # flight_key -> (circuit, response)
+        self._fallbacks_lock = threading.Lock()
+        
+        # איחוד בקשות GET זהות שרצות במקביל לבקשה אחת לחנות
+        self.coalesce_gets = coalesce_gets
+        self.coalesced = 0
+        self._inflight: Dict[str, object] = {}
+        self._inflight_lock = threading.Lock()
+
+        self.timeouts = dict(DEFAULT_ENDPOINT_TIMEOUTS)
+        self.timeouts[""] = timeout
+        self.timeouts.update(endpoint_timeouts or {})
+        self._mutation_listeners: List[Callable[[str, str, object], None]] = []
+        self._request_listeners: List[Callable[[str, str, Optional[int], float], None]] = []
+
+    @classmethod
+    def from_env(cls, url: str, rate_limiter: Optional[RateLimiter] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        """יצירת שכבת תקשורת מתוך משתני הסביבה"""
+        return cls(
+            url=url,
+            consumer_key=os.getenv('WC_CONSUMER_KEY'),
+            consumer_secret=os.getenv('WC_CONSUMER_SECRET'),
+            pool_size=int(os.getenv('WC_POOL_SIZE', '10')),
+            timeout=float(os.getenv('WC_TIMEOUT', '30')),
+            endpoint_timeouts=parse_endpoint_timeouts(os.getenv('WC_ENDPOINT_TIMEOUTS')),
+            verify_ssl=os.getenv('WC_VERIFY_SSL', 'true').lower() != 'false',
+            page_workers=int(os.getenv('WC_PAGE_WORKERS', '4')),
+            coalesce_gets=os.getenv('WC_COALESCE_GETS', 'true').lower() != 'false',
+            rate_limiter=rate_limiter if rate_limiter is not None else RateLimiter.from_env(),
+            retry=RetryPolicy.from_env(),
+            max_concurrency=int(os.getenv('WC_MAX_CONCURRENCY', '0')),
+            breaker=breaker if breaker is not None else CircuitBreaker.from_env(),
+            json_backend=os.getenv('WC_JSON_BACKEND', 'auto'),
+        )
+
+    @classmethod
+    def from_config(cls, config: Dict, rate_limiter: Optional[RateLimiter] = None,
+                    breaker: Optional[CircuitBreaker] = None):
+        """יצירת שכבת תקשורת מתוך מילון ההגדרות של load_config"""
+        return cls(
+            url=config['WP_URL'],
+            consumer_key=config['WC_CONSUMER_KEY'],
+            consumer_secret=config['WC_CONSUMER_SECRET'],
+            pool_size=config['WC_POOL_SIZE'],
+            timeout=config['WC_TIMEOUT'],
+            endpoint_timeouts=parse_endpoint_timeouts(config['WC_ENDPOINT_TIMEOUTS']),
+            verify_ssl=config['WC_VERIFY_SSL'],
+            page_workers=config['WC_PAGE_WORKERS'],
+            coalesce_gets=config['WC_COALESCE_GETS'],
+            rate_limiter=rate_limiter if rate_limiter is not None else RateLimiter.from_config(config),
+            retry=RetryPolicy.from_config(config),
+            max_concurrency=config['WC_MAX_CONCURRENCY'],
+            breaker=breaker if breaker is not None else CircuitBreaker.from_config(config),
+            json_backend=config['WC_JSON_BACKEND'],
+        )
+
+    def add_mutation_listener(self, callback: Callable[[str, str, object], None]) -> None:
+        """רישום פונקציה שתיקרא אחרי כל בקשת שינוי: callback(method, endpoint, data)"""
+        if callback not in self._mutation_listeners:
+            self._mutation_listeners.append(callback)
+
+    def add_request_listener(self, callback: Callable[[str, str, Optional[int], float], None]) -> None:
+        """רישום פונקציה שתיקרא אחרי כל ניסיון שליחה לחנות: callback(method, url, status, seconds)
+
+        status הוא None כשלא התקבלה תשובה (timeout, שגיאת חיבור). נקראת בתהליכון
+        או במשימה ששלחו את הבקשה - כך אפשר לשייך את הבקשה לכלי שרץ (למשל למדדים).
+        """
+        if callback not in self._request_listeners:
+            self._request_listeners.append(callback)
+
+    def _notify_request(self, method: str, url: str, status: Optional[int], seconds: float) -> None:
+        for callback in self._request_listeners:
+            try:
+                callback(method, url, status, seconds)
+            except Exception as e:
+                logger.error(f"Error in request listener for {method} {url}: {e}")
+
+    def _notify_mutation(self, method: str, endpoint: str, data) -> None:
+        if method not in MUTATING_METHODS:
+            return
+        # בקשות GET שכבר רצות עלולות להחזיר מצב שלפני השינוי - קוראים חדשים לא יצטרפו אליהן
+        with self._inflight_lock:
+            self._inflight.clear()
+        circuit = circuit_key(endpoint)
+        with self._fallbacks_lock:
+            for key in [key for key, (c, _) in self._fallbacks.items() if c == circuit]:
+                del self._fallbacks[key]
+        for callback in self._mutation_listeners:
+            try:
+                callback(method, endpoint, data)
+            except Exception as e:
+                logger.error(f"Error in mutation listener for {method} {endpoint}: {e}")
+
+    def get_timeout(self, endpoint: str) -> float:
+        """בחירת זמן התגובה לפי הקידומת הארוכה ביותר שמתאימה לנקודת הקצה"""
+        path = endpoint.strip("/")
+        best = ""
+        for prefix in self.timeouts:
+            if prefix and (path == prefix or path.startswith(f"{prefix}/")) and len(prefix) > len(best):
+                best = prefix
+        return self.timeouts[best]
+
+    def _retry_delay(self, method: str, url: str, attempt: int, response=None,
+                     error: Optional[Exception] = None) -> Optional[float]:
+        """עדכון המגביל לפי התוצאה; מחזיר כמה להמתין לפני ניסיון נוסף, או None אם לא מנסים שוב"""
+        status = response.status_code if response is not None else None
+        if status in THROTTLE_STATUSES:
+            self.rate_limiter.on_throttled()
+        elif status is not None and status < 400:
+            self.rate_limiter.on_success()
+
+        if (error is None and status not in RETRY_STATUSES) or not self.retry.can_retry(method, attempt):
+            return None
+        delay = self.retry.delay(attempt, response.headers.get("Retry-After") if response is not None else None)
+        self.retries += 1
+        reason = f"status {status}" if error is None else type(error).__name__
+        logger.warning(f"{method} {url} failed ({reason}), retry {attempt + 1}/{self.retry.max_retries} in {delay:.2f}s")
+        return delay
+
+    def _record_outcome(self, circuit: str, response, fallback_key: Optional[str]) -> None:
+        """עדכון המפסק לפי התשובה, ושמירת תשובת GET תקינה כתשובה חלופית"""
+        if response.status_code >= 500:
+            self.breaker.record_failure(circuit)
+            return
+        if response.status_code in THROTTLE_STATUSES:
+            # החנות עונה ומבקשת להאט - זה תפקיד מגביל הקצב, לא של המפסק
+            return
+        self.breaker.record_success(circuit)
+        if fallback_key is not None and response.status_code == 200 and self.breaker.enabled:
+            with self._fallbacks_lock:
+                self._fallbacks[fallback_key] = (circuit, response)
+                self._fallbacks.move_to_end(fallback_key)
+                while len(self._fallbacks) > self.breaker.fallback_size:
+                    self._fallbacks.popitem(last=False)
+
+    def _circuit_open(self, circuit: str, fallback_key: Optional[str]):
+        """המעגל פתוח: התשובה התקינה האחרונה לאותה בקשת GET, או כשלון מיידי"""
+        if fallback_key is not None:
+            with self._fallbacks_lock:
+                entry = self._fallbacks.get(fallback_key)
+            if entry is not None:
+                self.fallbacks_served += 1
+                logger.warning(f"Store unavailable for {circuit}, serving the last good response for {fallback_key}")
+                return entry[1]
+        raise CircuitOpenError(circuit, self.breaker.retry_in(circuit))
+
+    def _fallback_key(self, method: str, endpoint: str, params: Optional[Dict], kwargs: Dict) -> Optional[str]:
+        if method != "GET" or set(kwargs) - {"oauth_timestamp"}:
+            return None
+        return flight_key(endpoint, params)
+
+    def _decoded(self, response, stream: bool = False):
+        """התשובה, כש-json() שלה מפוענח ב-backend של שכבת התקשורת (orjson אם זמין)"""
+        if self.json_backend.fast and not stream:
+            response.json = partial(self.json_backend.loads, response.content)
+        return response
+
+    def _can_coalesce(self, kwargs: Dict) -> bool:
+        # בקשה עם אפשרויות מיוחדות (timeout, headers...) נשלחת לבד
+        return self.coalesce_gets and not (set(kwargs) - {"params"})
+
+    def _get_url(self, endpoint: str) -> str:
+        return f"{self.url}wp-json/{self.version}/{endpoint}"
+
+    def _wp_url(self, path: str) -> str:
+        return f"{self.url}wp-json/{path.strip('/')}"
+
+    def _prepare(self, method: str, endpoint: str, data=None, params: Optional[Dict] = None,
+                 oauth_timestamp: Optional[int] = None) -> Tuple[str, Dict, Optional[bytes], Dict, Optional[Tuple[str, str]]]:
+        """הכנת כתובת, פרמטרים, גוף וכותרות לבקשה (כמו woocommerce.API)"""
+        params = dict(params or {})
+        url = self._get_url(endpoint)
+        auth = None
+        headers = {}
+
+        if self.is_ssl and not self.query_string_auth:
+            auth = (self.consumer_key, self.consumer_secret)
+        elif self.is_ssl:
+            params.update({
+                "consumer_key": self.consumer_key,
+                "consumer_secret": self.consumer_secret,
+            })
+        else:
+            # חנות ללא SSL דורשת חתימת OAuth 1.0a על כל הפרמטרים
+            url = OAuth(
+                url=f"{url}?{urlencode(params)}",
+                consumer_key=self.consumer_key,
+                consumer_secret=self.consumer_secret,
+                version=self.version,
+                method=method,
+                oauth_timestamp=oauth_timestamp or int(time.time()),
+            ).get_oauth_url()
+            params = {}
+
+        body = None
+        if data is not None:
+            body = self.json_backend.dumps(data)
+            headers["content-type"] = "application/json;charset=utf-8"
+
+        return url, params, body, headers, auth
+
+
+class WooTransport(_BaseTransport):
+    """שכבת תקשורת משותפת ל-WooCommerce עם חיבורים קבועים (keep-alive)
+
+    מחליפה את woocommerce.API ואת קריאות requests הישירות. כל ההנדלרים
+    מקבלים את אותו מופע ולכן חולקים מאגר חיבורים אחד לחנות.
+    הממשק זהה ל-woocommerce.API (get/post/put/delete/options).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        logger.debug(f"Initializing shared WooCommerce transport for {self.url} (pool size: {self.pool_size})")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(DEFAULT_HEADERS)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency) if self.max_concurrency else nullcontext()
+
+    def _timed(self, method: str, url: str, send):
+        """send שמדווח למאזיני הבקשות כמה זמן לקח כל ניסיון"""
+        if not self._request_listeners:
+            return send
+
+        def timed_send():
+            started = time.perf_counter()
+            status = None
+            try:
+                response = send()
+                status = response.status_code
+                return response
+            finally:
+                self._notify_request(method, url, status, time.perf_counter() - started)
+        return timed_send
+
+    def _call(self, method: str, url: str, send, fallback_key: Optional[str] = None) -> requests.Response:
+        """שליחה דרך המפסק ומגביל הקצב, עם ניסיונות חוזרים לפי מדיניות ה-retry"""
+        circuit = circuit_key(url)
+        send = self._timed(method, url, send)
+        attempt = 0
+        while True:
+            if not self.breaker.allow(circuit):
+                return self._circuit_open(circuit, fallback_key)
+            with self._slots:
+                self.rate_limiter.acquire()
+                try:
+                    response = send()
+                except requests.ReadTimeout:
+                    # החנות לא ענתה בזמן - ניסיון נוסף רק היה מכפיל את ההמתנה
+                    self.breaker.record_failure(circuit)
+                    raise
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    self.breaker.record_failure(circuit)
+                    delay = self._retry_delay(method, url, attempt, error=e)
+                    if delay is None:
+                        raise
+                else:
+                    self._record_outcome(circuit, response, fallback_key)
+                    delay = self._retry_delay(method, url, attempt, response=response)
+                    if delay is None:
+                        return response
+                    response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _request(self, method: str, endpoint: str, data=None, params: Optional[Dict] = None,
+                 **kwargs) -> requests.Response:
+        return self._call(method, endpoint, lambda: self._send(method, endpoint, data, params, dict(kwargs)),
+                          self._fallback_key(method, endpoint, params, kwargs))
+
+    def _send(self, method: str, endpoint: str, data, params: Optional[Dict], kwargs: Dict) -> requests.Response:
+        url, params, body, headers, auth = self._prepare(
+            method, endpoint, data, params, kwargs.pop("oauth_timestamp", None)
+        )
+        kwargs.setdefault("timeout", self.get_timeout(endpoint))
+        try:
+            return self._decoded(self.session.request(
+                method=method,
+                url=url,
+                params=params,
+                data=body,
+                auth=auth,
+                headers=headers,
+                verify=self.verify_ssl,
+                **kwargs
+            ), kwargs.get("stream", False))
+        finally:
+            # גם בקשה שנכשלה עשויה להיות מיושמת חלקית - מבטלים בכל מקרה
+            self._notify_mutation(method, endpoint, data)
+
+    def get(self, endpoint: str, **kwargs) -> requests.Response:
+        """GET; קריאות זהות שמתבצעות במקביל חולקות בקשה אחת ואת אותה תשובה"""
+        if not self._can_coalesce(kwargs):
+            return self._request("GET", endpoint, None, **kwargs)
+
+        key = flight_key(endpoint, kwargs.get("params"))
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            logger.debug(f"Joining in-flight GET {endpoint}")
+            return flight.wait()
+
+        try:
+            flight.response = self._request("GET", endpoint, None, **kwargs)
+            return flight.response
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.done.set()
+
+    def post(self, endpoint: str, data, **kwargs) -> requests.Response:
+        return self._request("POST", endpoint, data, **kwargs)
+
+    def put(self, endpoint: str, data, **kwargs) -> requests.Response:
+        return self._request("PUT", endpoint, data, **kwargs)
+
+    def delete(self, endpoint: str, **kwargs) -> requests.Response:
+        return self._request("DELETE", endpoint, None, **kwargs)
+
+    def options(self, endpoint: str, **kwargs) -> requests.Response:
+        return self._request("OPTIONS", endpoint, None, **kwargs)
+
+    def paginate(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> Paginator:
+        """מעבר על כל העמודים של נקודת קצה של רשימה (ראו Paginator)"""
+        return Paginator(self, endpoint, params, **kwargs)
+
+    def get_all(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> List[Dict]:
+        """שליפת כל הפריטים מכל העמודים של נקודת קצה"""
+        return self.paginate(endpoint, params, **kwargs).collect()
+
+    def iter_all(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> Iterator[Dict]:
+        """כל הפריטים מכל העמודים, מפוענחים בהדרגה תוך כדי ההורדה (ראו Paginator.stream)"""
+        return self.paginate(endpoint, params, **kwargs).stream()
+
+    def batch(self, endpoint: str, create: Optional[List[Dict]] = None,
+              update: Optional[List[Dict]] = None, delete: Optional[List[int]] = None,
+              **kwargs) -> Dict[str, List]:
+        """פעולות מרובות דרך {endpoint}/batch בחלקים של עד 100 פריטים (ראו BatchWriter)"""
+        return BatchWriter(self, endpoint, **kwargs).run(create, update, delete)
+
+    def wp_request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """קריאה ישירה ל-REST API של וורדפרס (למשל wp/v2/media) על אותו מאגר חיבורים"""
+        kwargs.setdefault("timeout", self.get_timeout(path))
+        kwargs.setdefault("verify", self.verify_ssl)
+        return self._call(method, path, lambda: self._decoded(self.session.request(method, self._wp_url(path), **kwargs)))
+
+    def close(self) -> None:
+        """סגירת כל החיבורים הפתוחים"""
+        self.session.close()
+
+
+class AsyncWooTransport(_BaseTransport):
+    """גרסה אסינכרונית של שכבת התקשורת, מבוססת httpx.AsyncClient
+
+    משמשת את ההנדלרים האסינכרוניים כדי שקריאה איטית לחנות לא תעצור את
+    לולאת האירועים של הבוט. יש ליצור את המופע בתוך הלולאה שבה ישמש.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        logger.debug(f"Initializing async WooCommerce transport for {self.url} (pool size: {self.pool_size})")
+        self.client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            verify=self.verify_ssl,
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size
+            )
+        )
+        self._slots = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else nullcontext()
+
+    def _timed(self, method: str, url: str, send):
+        """send שמדווח למאזיני הבקשות כמה זמן לקח כל ניסיון"""
+        if not self._request_listeners:
+            return send
+
+        async def timed_send():
+            started = time.perf_counter()
+            status = None
+            try:
+                response = await send()
+                status = response.status_code
+                return response
+            finally:
+                self._notify_request(method, url, status, time.perf_counter() - started)
+        return timed_send
+
+    async def _call(self, method: str, url: str, send, fallback_key: Optional[str] = None) -> httpx.Response:
+        """שליחה דרך המפסק ומגביל הקצב, עם ניסיונות חוזרים לפי מדיניות ה-retry (בלי לחסום את הלולאה)"""
+        circuit = circuit_key(url)
+        send = self._timed(method, url, send)
+        attempt = 0
+        while True:
+            if not self.breaker.allow(circuit):
+                return self._circuit_open(circuit, fallback_key)
+            async with self._slots:
+                await self.rate_limiter.acquire_async()
+                try:
+                    response = await send()
+                except httpx.ReadTimeout:
+                    self.breaker.record_failure(circuit)
+                    raise
+                except httpx.TransportError as e:
+                    self.breaker.record_failure(circuit)
+                    delay = self._retry_delay(method, url, attempt, error=e)
+                    if delay is None:
+                        raise
+                else:
+                    self._record_outcome(circuit, response, fallback_key)
+                    delay = self._retry_delay(method, url, attempt, response=response)
+                    if delay is None:
+                        return response
+                    await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _request(self, method: str, endpoint: str, data=None, params: Optional[Dict] = None,
+                       **kwargs) -> httpx.Response:
+        return await self._call(method, endpoint, lambda: self._send(method, endpoint, data, params, dict(kwargs)),
+                                self._fallback_key(method, endpoint, params, kwargs))
+
+    async def _send(self, method: str, endpoint: str, data, params: Optional[Dict], kwargs: Dict) -> httpx.Response:
+        url, params, body, headers, auth = self._prepare(
+            method, endpoint, data, params, kwargs.pop("oauth_timestamp", None)
+        )
+        kwargs.setdefault("timeout", self.get_timeout(endpoint))
+        stream = kwargs.pop("stream", False)
+        try:
+            # httpx מחליף את מחרוזת השאילתה של הכתובת כשמועבר מילון ריק (כמו בחתימת OAuth)
+            request = self.client.build_request(
+                method=method,
+                url=url,
+                params=params or None,
+                content=body,
+                headers=headers,
+                **kwargs
+            )
+            return self._decoded(await self.client.send(request, auth=auth, stream=stream), stream)
+        finally:
+            self._notify_mutation(method, endpoint, data)
+
+    async def get(self, endpoint: str, **kwargs) -> httpx.Response:
+        """GET; קריאות זהות שמתבצעות במקביל חולקות בקשה אחת ואת אותה תשובה"""
+        if not self._can_coalesce(kwargs):
+            return await self._request("GET", endpoint, None, **kwargs)
+
+        key = flight_key(endpoint, kwargs.get("params"))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request("GET", endpoint, None, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._end_flight(key, done))
+        else:
+            self.coalesced += 1
+            logger.debug(f"Joining in-flight GET {endpoint}")
+        # ביטול של קורא אחד לא מבטל את הבקשה עבור שאר הממתינים
+        return await asyncio.shield(task)
+
+    def _end_flight(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # מסמן שהשגיאה נקראה גם אם כל הממתינים בוטלו
+
+    async def post(self, endpoint: str, data, **kwargs) -> httpx.Response:
+        return await self._request("POST", endpoint, data, **kwargs)
+
+    async def put(self, endpoint: str, data, **kwargs) -> httpx.Response:
+        return await self._request("PUT", endpoint, data, **kwargs)
+
+    async def delete(self, endpoint: str, **kwargs) -> httpx.Response:
+        return await self._request("DELETE", endpoint, None, **kwargs)
+
+    async def options(self, endpoint: str, **kwargs) -> httpx.Response:
+        return await self._request("OPTIONS", endpoint, None, **kwargs)
+
+    def paginate(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> AsyncPaginator:
+        """מעבר על כל העמודים של נקודת קצה של רשימה (ראו AsyncPaginator)"""
+        return AsyncPaginator(self, endpoint, params, **kwargs)
+
+    async def get_all(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> List[Dict]:
+        """שליפת כל הפריטים מכל העמודים של נקודת קצה"""
+        return await self.paginate(endpoint, params, **kwargs).collect()
+
+    def iter_all(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> AsyncIterator[Dict]:
+        """כל הפריטים מכל העמודים, מפוענחים בהדרגה תוך כדי ההורדה (ראו AsyncPaginator.stream)"""
+        return self.paginate(endpoint, params, **kwargs).stream()
+
+    async def batch(self, endpoint: str, create: Optional[List[Dict]] = None,
+                    update: Optional[List[Dict]] = None, delete: Optional[List[int]] = None,
+                    **kwargs) -> Dict[str, List]:
+        """פעולות מרובות דרך {endpoint}/batch בחלקים של עד 100 פריטים (ראו AsyncBatchWriter)"""
+        return await AsyncBatchWriter(self, endpoint, **kwargs).run(create, update, delete)
+
+    async def _request_wp(self, method: str, path: str, kwargs: Dict) -> httpx.Response:
+        return self._decoded(await self.client.request(method, self._wp_url(path), **kwargs))
+
+    async def wp_request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """קריאה ישירה ל-REST API של וורדפרס (למשל wp/v2/media) על אותו מאגר חיבורים"""
+        kwargs.setdefault("timeout", self.get_timeout(path))
+        return await self._call(method, path, lambda: self._request_wp(method, path, kwargs))
+
+    async def close(self) -> None:
+        """סגירת כל החיבורים הפתוחים"""
+        await self.client.aclose()
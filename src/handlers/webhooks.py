@@ -0,0 +1,191 @@
+import hmac
+import json
+import base64
+import hashlib
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# משאב ב-webhook (החלק הראשון של ה-topic) -> המשאב במטמונים
+WEBHOOK_RESOURCES = {
+    "product": "products",
+    "order": "orders",
+    "customer": "customers",
+    "coupon": "coupons",
+}
+
+MAX_BODY_SIZE = 5 * 1024 * 1024
+
+
+def sign_payload(body: bytes, secret: str) -> str:
+    """חתימת WooCommerce: base64 של HMAC-SHA256 על גוף הבקשה"""
+    digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def verify_signature(body: bytes, signature: Optional[str], secret: str) -> bool:
+    """בדיקת הכותרת X-WC-Webhook-Signature מול הסוד המשותף"""
+    if not signature:
+        return False
+    return hmac.compare_digest(sign_payload(body, secret), signature.strip())
+
+
+def send_webhook(url: str, topic: str, payload: Dict, secret: str, timeout: float = 10) -> requests.Response:
+    """שליחת webhook חתום כמו ש-WooCommerce שולח (לבדיקות ולהרצה חוזרת של אירועים שמורים)"""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    resource, _, event = topic.partition(".")
+    return requests.post(url, data=body, timeout=timeout, headers={
+        "Content-Type": "application/json",
+        "X-WC-Webhook-Topic": topic,
+        "X-WC-Webhook-Resource": resource,
+        "X-WC-Webhook-Event": event,
+        "X-WC-Webhook-Signature": sign_payload(body, secret),
+    })
+
+
+def replay_webhooks(url: str, path: str, secret: str) -> Dict[str, int]:
+    """הרצה חוזרת של webhooks שמורים מקובץ JSONL (שורה לכל אירוע: {"topic", "payload"})"""
+    statuses: Dict[str, int] = {}
+    with open(path, encoding="utf-8") as events:
+        for line in events:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            status = send_webhook(url, event["topic"], event["payload"], secret).status_code
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return statuses
+
+
+class WebhookReceiver:
+    """שרת HTTP מקומי שמקבל webhooks של WooCommerce ומעדכן את המטמונים
+
+    כל בקשה נבדקת מול החתימה (HMAC-SHA256 עם הסוד שהוגדר ב-webhook בחנות).
+    אירועי created/updated/restored מוחלים על המטמונים עם הרשומה המלאה
+    שבגוף הבקשה, ואירועי deleted מסירים את הרשומה. ההחלה עצמה נעשית דרך
+    SyncWorker, כך ששינוי שמגיע ב-webhook ושינוי שנמשך בסנכרון מטופלים זהה.
+    """
+
+    def __init__(self, applier, secret: str, host: str = "127.0.0.1", port: int = 8085,
+                 path: str = "/woocommerce/webhook"):
+        """
+        Args:
+            applier: מי שמחיל את השינויים (SyncWorker: apply / remove)
+            secret: הסוד המשותף של ה-webhook
+            host, port: כתובת ההאזנה (port=0 בוחר פורט פנוי)
+            path: הנתיב שאליו WooCommerce שולח
+        """
+        if not secret:
+            raise ValueError("Webhook secret is required")
+        self.applier = applier
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.path = path
+        self.received = 0
+        self.rejected = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config: Dict, applier) -> "WebhookReceiver":
+        """יצירת שרת מתוך מילון ההגדרות של load_config"""
+        return cls(applier, secret=config['WEBHOOK_SECRET'], host=config['WEBHOOK_HOST'],
+                   port=config['WEBHOOK_PORT'], path=config['WEBHOOK_PATH'])
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}{self.path}"
+
+    def start(self) -> None:
+        """הפעלת השרת בתהליכון רקע"""
+        if self._server is not None:
+            return
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="wc-webhooks", daemon=True)
+        self._thread.start()
+        logger.info(f"Webhook receiver listening on {self.url}")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+
+    def handle(self, topic: str, body: bytes, signature: Optional[str]) -> int:
+        """טיפול בבקשה אחת; מחזיר את קוד התשובה"""
+        if not topic and body.startswith(b"webhook_id="):
+            # בקשת ping ש-WooCommerce שולח (בלי חתימה) ביצירת ה-webhook
+            return 200
+        if not verify_signature(body, signature, self.secret):
+            self.rejected += 1
+            logger.warning(f"Rejected webhook with invalid signature (topic={topic})")
+            return 401
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            logger.warning(f"Webhook {topic} has an invalid JSON body")
+            return 400
+
+        self.received += 1
+        resource_name, _, event = topic.partition(".")
+        resource = WEBHOOK_RESOURCES.get(resource_name)
+        if resource is None or not isinstance(payload, dict) or "id" not in payload:
+            logger.debug(f"Ignoring webhook {topic}")
+            return 200
+        try:
+            if event == "deleted":
+                self.applier.remove(resource, [payload["id"]])
+            else:
+                self.applier.apply(resource, [payload])
+        except Exception as e:
+            logger.error(f"Error applying webhook {topic}: {e}")
+            return 500
+        logger.debug(f"Applied webhook {topic} for {resource} {payload['id']}")
+        return 200
+
+    def _make_handler(self):
+        receiver = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split("?")[0] != receiver.path:
+                    self._reply(404)
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_BODY_SIZE:
+                    self._reply(413)
+                    return
+                body = self.rfile.read(length)
+                self._reply(receiver.handle(
+                    self.headers.get("X-WC-Webhook-Topic", ""), body,
+                    self.headers.get("X-WC-Webhook-Signature"),
+                ))
+
+            def _reply(self, status: int):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug("Webhook request: " + format % args)
+
+        return _Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay saved WooCommerce webhooks against a receiver")
+    parser.add_argument("events", help="JSONL file, one {\"topic\", \"payload\"} object per line")
+    parser.add_argument("--url", default="http://127.0.0.1:8085/woocommerce/webhook")
+    parser.add_argument("--secret", required=True)
+    args = parser.parse_args()
+    print(replay_webhooks(args.url, args.events, args.secret))
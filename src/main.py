@@ -1,7 +1,6 @@
 import os
 import json
 import logging
-import requests
 import pytz
 import asyncio
 import warnings
@@ -16,17 +15,55 @@ from handlers import (
     CustomerHandler,
     InventoryHandler,
     ProductHandler,
-    SettingsHandler
+    SettingsHandler,
+    WooTransport,
+    ProductCache,
+    ProductIndex,
+    CustomerSpendAggregator,
+    CategoryTree,
+    StoreMirror,
+    SyncWorker,
+    WebhookReceiver,
+    RateLimiter,
+    CircuitBreaker,
+    AsyncMediaHandler,
+    AsyncCouponHandler,
+    AsyncOrderHandler,
+    AsyncCategoryHandler,
+    AsyncCustomerHandler,
+    AsyncInventoryHandler,
+    AsyncProductHandler,
+    AsyncSettingsHandler,
+    AsyncWooTransport
 )
-from utils import setup_logger, load_config
+from handlers.customer_stats import summarize_orders
+from utils import (
+    setup_logger,
+    load_config,
+    ChatAgentRunner,
+    ChatMemoryStore,
+    IntentRouter,
+    TelegramMessageStreamer,
+    TokenBudget,
+    ToolRetriever,
+    PlanCache,
+    MetricsRegistry,
+    AgentMetricsCallback
+)
+from utils.agent_metrics import record_http_request
+from utils.message_streamer import split_message
+from utils import tool_schemas
+from utils.tool_schemas import AttributeStock, OrderItem
 from openai import OpenAI
 from langchain_openai import ChatOpenAI
-from langchain.agents import AgentType, Tool, initialize_agent
+from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain.tools import StructuredTool
 from langchain.memory import ConversationBufferWindowMemory
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.schema import SystemMessage
-import re
 from langchain.callbacks.base import BaseCallbackHandler
-from typing import List, Dict, Optional
+from pydantic import ValidationError
+from typing import List, Dict, Optional, Tuple
 
 # השתקת אזהרות
 warnings.filterwarnings("ignore")
@@ -59,19 +96,79 @@ file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelnam
 # Initialize handlers
 def init_handlers():
     """אתחול כל ההנדלרים של המערכת"""
-    global media_handler, coupon_handler, order_handler, category_handler, customer_handler, inventory_handler, product_handler, settings_handler
+    global rate_limiter, circuit_breaker, wc_transport, store_mirror, sync_worker, webhook_receiver, product_cache, product_index, customer_stats, category_tree, media_handler, coupon_handler, order_handler, category_handler, customer_handler, inventory_handler, product_handler, settings_handler
+    
+    # מגביל קצב אחד לחנות, משותף לשכבת התקשורת הסינכרונית והאסינכרונית
+    rate_limiter = RateLimiter.from_config(config)
+    # מפסק זרם משותף - כשהחנות לא עונה, שתי השכבות נכשלות מיד באותן נקודות קצה
+    circuit_breaker = CircuitBreaker.from_config(config)
+    
+    # שכבת תקשורת אחת עם מאגר חיבורים משותף לכל ההנדלרים
+    wc_transport = WooTransport.from_config(config, rate_limiter=rate_limiter, breaker=circuit_breaker)
+    # כל בקשה לחנות נספרת במדדים של ההודעה ושל הכלי שביקשו אותה
+    wc_transport.add_request_listener(record_http_request)
+    
+    # מראה מקומית של החנות (SQLite) - כבויה אם STORE_MIRROR_PATH לא הוגדר
+    store_mirror = StoreMirror.from_config(config)
+    
+    # מטמון מוצרים משותף להנדלר הסינכרוני והאסינכרוני
+    product_cache = ProductCache.from_config(config)
+    product_index = ProductIndex.from_config(config)
+    # סיכומי רכישות הלקוחות (מסריקת הזמנות אחת) משותפים לשני ההנדלרים
+    customer_stats = CustomerSpendAggregator.from_config(config)
+    category_tree = CategoryTree.from_config(config)
     
-    media_handler = MediaHandler(config['WP_URL'], config['WP_USER'], config['WP_PASSWORD'])
-    coupon_handler = CouponHandler(config['WP_URL'])
-    order_handler = OrderHandler(config['WP_URL'])
-    category_handler = CategoryHandler(config['WP_URL'])
-    customer_handler = CustomerHandler(config['WP_URL'])
-    inventory_handler = InventoryHandler(config['WP_URL'])
-    product_handler = ProductHandler(config['WP_URL'])
-    settings_handler = SettingsHandler(config['WP_URL'])
+    media_handler = MediaHandler(config['WP_URL'], config['WP_USER'], config['WP_PASSWORD'], transport=wc_transport)
+    coupon_handler = CouponHandler(config['WP_URL'], transport=wc_transport, mirror=store_mirror)
+    order_handler = OrderHandler(config['WP_URL'], transport=wc_transport, mirror=store_mirror)
+    category_handler = CategoryHandler(config['WP_URL'], transport=wc_transport, tree=category_tree, mirror=store_mirror)
+    customer_handler = CustomerHandler(config['WP_URL'], transport=wc_transport, stats=customer_stats, mirror=store_mirror)
+    inventory_handler = InventoryHandler(config['WP_URL'], transport=wc_transport)
+    product_handler = ProductHandler(config['WP_URL'], transport=wc_transport, cache=product_cache, index=product_index, mirror=store_mirror)
+    settings_handler = SettingsHandler(config['WP_URL'], transport=wc_transport)
+    
+    # סנכרון ברקע של שינויים מהחנות (modified_after) אל המטמונים המקומיים
+    sync_worker = SyncWorker.from_config(config, wc_transport, cache=product_cache, index=product_index,
+                                         customer_stats=customer_stats, mirror=store_mirror)
+    sync_worker.start()
+    
+    # קבלת webhooks מהחנות לעדכון מיידי של המטמונים (רק אם הוגדר סוד)
+    webhook_receiver = None
+    if config['WEBHOOK_SECRET']:
+        webhook_receiver = WebhookReceiver.from_config(config, sync_worker)
+        webhook_receiver.start()
     
     bot_logger.info("All handlers initialized successfully")
 
+async def init_async_handlers(application: Application) -> None:
+    """אתחול ההנדלרים האסינכרוניים בתוך לולאת האירועים של הבוט"""
+    global async_transport, async_media_handler, async_coupon_handler, async_order_handler, async_category_handler, async_customer_handler, async_inventory_handler, async_product_handler, async_settings_handler
+    
+    # הלקוח האסינכרוני נקשר ללולאה שבה הוא נוצר, ולכן נוצר כאן ולא ב-init_handlers
+    async_transport = AsyncWooTransport.from_config(config, rate_limiter=rate_limiter, breaker=circuit_breaker)
+    async_transport.add_request_listener(record_http_request)
+    
+    async_media_handler = AsyncMediaHandler(config['WP_URL'], config['WP_USER'], config['WP_PASSWORD'], transport=async_transport)
+    async_coupon_handler = AsyncCouponHandler(config['WP_URL'], transport=async_transport, mirror=store_mirror)
+    async_order_handler = AsyncOrderHandler(config['WP_URL'], transport=async_transport, mirror=store_mirror)
+    async_category_handler = AsyncCategoryHandler(config['WP_URL'], transport=async_transport, tree=category_tree, mirror=store_mirror)
+    async_customer_handler = AsyncCustomerHandler(config['WP_URL'], transport=async_transport, stats=customer_stats, mirror=store_mirror)
+    async_inventory_handler = AsyncInventoryHandler(config['WP_URL'], transport=async_transport)
+    async_product_handler = AsyncProductHandler(config['WP_URL'], transport=async_transport, cache=product_cache, index=product_index, mirror=store_mirror)
+    async_settings_handler = AsyncSettingsHandler(config['WP_URL'], transport=async_transport)
+    
+    bot_logger.info("All async handlers initialized successfully")
+
+async def close_async_handlers(application: Application) -> None:
+    """סגירת החיבורים של ההנדלרים האסינכרוניים בעת כיבוי הבוט"""
+    await async_transport.close()
+    agent_runner.shutdown(wait=False)
+    metrics_logger.info(json.dumps({"snapshot": agent_metrics.snapshot()}, ensure_ascii=False))
+    sync_worker.stop()
+    if webhook_receiver is not None:
+        webhook_receiver.stop()
+    store_mirror.close()
+
 # Set timezone
 timezone = pytz.timezone('Asia/Jerusalem')
 
@@ -81,75 +178,92 @@ product_creation_state = {}
 # Conversation states
 CHOOSING_PRODUCT = 1
 
-def list_products(_: str = "") -> str:
+# השדות שכל כלי צריך מהחנות - נשלחים כ-_fields כדי לצמצם את גודל התשובות
+PRODUCT_LOOKUP_FIELDS = ("id", "name", "price")
+PRODUCT_LIST_FIELDS = ("id", "name", "price", "manage_stock", "stock_quantity", "stock_status")
+LOW_STOCK_FIELDS = ("id", "name", "manage_stock", "stock_quantity", "low_stock_amount")
+ORDER_LIST_FIELDS = ("id", "status", "total", "date_created", "billing")
+CUSTOMER_LIST_FIELDS = ("id", "first_name", "last_name", "email", "billing")
+CUSTOMER_ORDER_FIELDS = ("id", "status", "total", "date_created")
+COUPON_LIST_FIELDS = ("id", "code", "amount", "discount_type", "date_expires")
+CATEGORY_FIELDS = ("id", "name", "parent", "count")
+
+# stock_status של WooCommerce -> תצוגה
+STOCK_STATUS_LABELS = {
+    "instock": "במלאי",
+    "outofstock": "אזל מהמלאי",
+    "onbackorder": "בהזמנה מראש",
+}
+
+def stock_status_label(product: Dict) -> str:
+    """מצב המלאי של מוצר שלא מנהל כמויות, לפי stock_status"""
+    status = product.get('stock_status')
+    return STOCK_STATUS_LABELS.get(status, status or "לא ידוע")
+
+def format_product_lines(products: List[Dict]) -> List[str]:
+    """עיצוב שורת תצוגה לכל מוצר, כולל מצב המלאי"""
+    products_text = []
+    for p in products:
+        product_line = f"- {p['name']}: ₪{p.get('price', 'לא זמין')}"
+        
+        # Add stock information
+        if p.get('manage_stock'):
+            stock = p.get('stock_quantity', 0)
+            status = "במלאי" if stock > 0 else "אזל מהמלאי"
+            product_line += f" | {status} ({stock} יחידות)"
+        else:
+            product_line += f" | {stock_status_label(p)}"
+            
+        products_text.append(product_line)
+    return products_text
+
+def format_product_list(products: List[Dict]) -> str:
+    """עיצוב רשימת המוצרים כפי שמוצגת למשתמש"""
+    if not products:
+        return "לא נמצאו מוצרים בחנות"
+    return f"המוצרים בחנות:\n" + "\n".join(format_product_lines(products))
+
+def unresolved_product_message(product_name: str, candidates: List[Dict]) -> str:
+    """תשובה כשאין מוצר ודאי לשינוי: לא נמצא, או המועמדים הקרובים לאישור המשתמש"""
+    if not candidates:
+        return f"לא נמצא מוצר בשם {product_name}"
+    names = "\n".join(f"- {candidate['name']}" for candidate in candidates)
+    return (f"לא נמצא מוצר בשם המדויק '{product_name}'. האם התכוונת לאחד מאלה?\n{names}\n"
+            "יש לציין את השם המדויק כדי לבצע את הפעולה")
+
+def list_products() -> str:
     """Get list of products from WordPress"""
     try:
-        products = product_handler.list_products(10)
-        
-        if not products:
-            return "לא נמצאו מוצרים בחנות"
-            
-        products_text = []
-        for p in products:
-            product_line = f"- {p['name']}: ₪{p.get('price', 'לא זמין')}"
-            
-            # Add stock information
-            if p.get('manage_stock'):
-                stock = p.get('stock_quantity', 0)
-                status = "במלאי" if stock > 0 else "אזל מהמלאי"
-                product_line += f" | {status} ({stock} יחידות)"
-            else:
-                status = "במלאי" if p.get('in_stock', True) else "אזל מהמלאי"
-                product_line += f" | {status}"
-                
-            products_text.append(product_line)
-            
-        return f"המוצרים בחנות:\n" + "\n".join(products_text)
+        return format_product_list(product_handler.list_all_products(fields=PRODUCT_LIST_FIELDS))
         
     except Exception as e:
         logger.error(f"Error listing products: {e}")
         return f"שגיאה בהצגת המוצרים: {str(e)}"
 
-def update_price(product_info: str) -> str:
-    """Update product price in WordPress"""
+def update_price(product_name: str, new_price: Optional[float] = None, discount_percent: Optional[float] = None) -> str:
+    """Update product price in WordPress - either a new price or a percentage discount"""
     try:
-        # Parse product info - can be either "product_name new_price" or "product_name -X%"
-        parts = product_info.strip().split()
-        if len(parts) < 2:
-            return "נדרש שם מוצר ומחיר חדש או אחוז שינוי"
+        if new_price is None and discount_percent is None:
+            return "נדרש מחיר חדש או אחוז שינוי"
             
-        # Get product name (everything except the last part)
-        product_name = " ".join(parts[:-1])
-        price_info = parts[-1]
-        
         # Search for product
-        products = product_handler.search_products(product_name)
+        product, candidates = product_handler.resolve_product(product_name)
         
-        if not products:
-            return f"לא נמצא מוצר בשם {product_name}"
+        if product is None:
+            return unresolved_product_message(product_name, candidates)
             
-        product = products[0]
         product_id = product["id"]
-        current_price = float(product.get("price", 0))
-        
-        # Check if it's a percentage change
-        percentage_match = re.match(r'^-?(\d+)%$', price_info)
         
         # Calculate new price
-        if percentage_match:
-            percentage = float(percentage_match.group(1))
-            new_price = current_price * (1 - percentage/100)
-        else:
-            # Try to extract direct price
-            price_match = re.search(r'(\d+)(?:\s*שקלים|\s*ש"ח|\s*₪)?$', price_info)
-            if not price_match:
-                return "לא צוין מחיר תקין"
-            new_price = float(price_match.group(1))
-        
+        if new_price is None:
+            details = product_handler.get_product_details(product_id, fields=PRODUCT_LOOKUP_FIELDS)
+            current_price = float(details.get("price") or 0)
+            new_price = current_price * (1 - abs(discount_percent)/100)
+            
         # Update product price
         product_handler.update_price(product_id, str(new_price))
         
-        return f"המחיר של {product_name} עודכן בהצלחה ל-₪{new_price:.2f}"
+        return f"המחיר של {product['name']} עודכן בהצלחה ל-₪{new_price:.2f}"
         
     except Exception as e:
         logger.error(f"Error updating price: {e}")
@@ -159,168 +273,73 @@ def remove_discount(product_name: str) -> str:
     """Remove discount from a product"""
     try:
         # Search for product
-        products = product_handler.search_products(product_name)
+        product, candidates = product_handler.resolve_product(product_name)
         
-        if not products:
-            return f"לא נמצא מוצר בשם {product_name}"
+        if product is None:
+            return unresolved_product_message(product_name, candidates)
             
-        product = products[0]
         product_id = product["id"]
         
         # Remove discount
         product_handler.remove_discount(product_id)
         
-        return f"ההנחה הוסרה בהצלחה מהמוצר {product_name}"
+        return f"ההנחה הוסרה בהצלחה מהמוצר {product['name']}"
         
     except Exception as e:
         logger.error(f"Error removing discount: {e}")
         return f"שגיאה בהסרת ההנחה: {str(e)}"
 
-def create_product(product_info: str) -> str:
+def create_product(name: str, regular_price: float, description: str = "", stock_quantity: Optional[int] = None) -> str:
     """Create a new product in WordPress"""
     try:
-        # Parse product info
-        logger.info(f"Creating product with info: {product_info}")
-        
-        # Extract product details using flexible regex patterns
-        # חיפוש שם מוצר - מחפש אחרי מילים כמו "מוצר חדש", "ליצור", "להוסיף" וכו'
-        name_patterns = [
-            r'(?:מוצר חדש|ליצור|להוסיף|חדש|יצירת)\s*:?\s*(.+?)(?=\s*(?:,|\.|ב?מחיר|ב?כמות|עם תיאור|$))',
-            r'(?:שם|בשם)\s*:?\s*(.+?)(?=\s*(?:,|\.|ב?מחיר|ב?כמות|עם תיאור|$))',
-            r'^(.+?)(?=\s*(?:,|\.|ב?מחיר|ב?כמות|עם תיאור|$))'  # fallback - לוקח את המילים הראשונות
-        ]
-        
-        name = None
-        for pattern in name_patterns:
-            name_match = re.search(pattern, product_info, re.MULTILINE)
-            if name_match:
-                name = name_match.group(1).strip()
-                break
-                
-        if not name:
-            logger.error("Could not identify product name")
-            return "לא הצלחתי לזהות את שם המוצר. אנא ציין את שם המוצר בצורה ברורה"
-            
-        # חיפוש מחיר - מחפש מספר שמופיע אחרי מילים שקשורות למחיר
-        price_patterns = [
-            r'(?:ב?מחיר|עולה|שעולה|שמחירו|במחיר של|בסכום של?|בעלות של?)\s*:?\s*(?:₪|ש"ח|שקלים|שקל|ש״ח)?\s*(\d+)(?:\s*(?:₪|ש"ח|שקלים|שקל|ש״ח))?',
-            r'(\d+)\s*(?:₪|ש"ח|שקלים|שקל|ש״ח)',  # fallback - מחפש מספר עם סימן שקל
-        ]
+        logger.info(f"Creating product - Name: {name}, Price: {regular_price}, Description: {description}, Stock: {stock_quantity}")
         
-        price = None
-        for pattern in price_patterns:
-            price_match = re.search(pattern, product_info)
-            if price_match:
-                price = price_match.group(1).strip()
-                break
-                
-        if not price:
-            logger.error("Could not identify product price")
-            return "לא הצלחתי לזהות את מחיר המוצר. אנא ציין את המחיר בצורה ברורה (לדוגמה: מחיר 100 שקלים)"
-            
-        # חיפוש כמות - מחפש מספר שמופיע אחרי מילים שקשורות לכמות
-        stock_patterns = [
-            r'(?:ב?כמות|יחידות|מלאי|להוסיף|כמות של)\s*:?\s*(\d+)(?:\s*(?:יחידות|פריטים|במלאי))?',
-            r'(\d+)\s*(?:יחידות|פריטים|במלאי)'  # fallback - מחפש מספר עם מילת יחידה
-        ]
-        
-        stock = None
-        for pattern in stock_patterns:
-            stock_match = re.search(pattern, product_info)
-            if stock_match:
-                stock = int(stock_match.group(1))
-                break
-                
-        # חיפוש תיאור - מחפש טקסט שמופיע אחרי מילים שקשורות לתיאור
-        description_patterns = [
-            r'(?:תיאור|פירוט|הסבר|מידע)\s*:?\s*(.+?)(?=\s*(?:,|\.|ב?מחיר|ב?כמות|$))',
-            r'עם\s+(.+?)(?=\s*(?:,|\.|ב?מחיר|ב?כמות|$))'
-        ]
-        
-        description = ""
-        for pattern in description_patterns:
-            desc_match = re.search(pattern, product_info)
-            if desc_match:
-                description = desc_match.group(1).strip()
-                break
-        
-        logger.info(f"Parsed product details - Name: {name}, Price: {price}, Description: {description}, Stock: {stock}")
-        
-        # Validate price format
-        try:
-            float(price)
-        except ValueError:
-            logger.error(f"Invalid price format: {price}")
-            return "מחיר לא תקין. יש להזין מספר בלבד"
-        
-        # Create product with basic data
-        logger.info("Attempting to create product with basic data")
         new_product = product_handler.create_product(
             name=name,
             description=description,
-            regular_price=str(price),
-            stock_quantity=stock
+            regular_price=str(regular_price),
+            stock_quantity=stock_quantity
         )
         
         if not new_product or 'id' not in new_product:
             logger.error(f"Product creation failed - Response: {new_product}")
             return "שגיאה ביצירת המוצר. אנא בדוק את הפרטים ונסה שוב"
-        
+            
         logger.info(f"Product created successfully with ID: {new_product['id']}")
         return f"המוצר {new_product['name']} נוצר בהצלחה (מזהה: {new_product['id']})"
         
-    except ValueError as ve:
-        error_msg = f"שגיאה בעיבוד הנתונים: {str(ve)}"
-        logger.error(f"Value error in product creation: {ve}")
-        return error_msg
     except Exception as e:
         error_msg = f"שגיאה ביצירת המוצר: {str(e)}"
         logger.error(f"Error creating product: {e}", exc_info=True)
         return error_msg
 
-def edit_product(product_info: str) -> str:
+def edit_product(product_name: str, name: Optional[str] = None, description: Optional[str] = None,
+                 regular_price: Optional[float] = None, stock_quantity: Optional[int] = None) -> str:
     """Edit an existing product in WordPress"""
     try:
-        # Parse product info
-        lines = product_info.strip().split('\n')
-        if len(lines) < 2:
-            return "נדרש שם מוצר ולפחות שדה אחד לעדכון"
+        # Collect the fields to update
+        update_data = {}
+        if name:
+            update_data['name'] = name
+        if description is not None:
+            update_data['description'] = description
+        if regular_price is not None:
+            update_data['regular_price'] = str(regular_price)
+        if stock_quantity is not None:
+            update_data['stock_quantity'] = stock_quantity
+            update_data['manage_stock'] = True
+            
+        if not update_data:
+            return "לא נמצאו שדות תקינים לעדכון"
             
-        # Get product name from first line
-        product_name = lines[0]
-        
         # Search for product
-        products = product_handler.search_products(product_name)
+        product, candidates = product_handler.resolve_product(product_name)
         
-        if not products:
-            return f"לא נמצא מוצר בשם {product_name}"
+        if product is None:
+            return unresolved_product_message(product_name, candidates)
             
-        product = products[0]
         product_id = product["id"]
         
-        # Parse update fields
-        update_data = {}
-        for line in lines[1:]:
-            if ':' not in line:
-                continue
-                
-            field, value = line.split(':', 1)
-            field = field.strip()
-            value = value.strip()
-            
-            if field == 'שם':
-                update_data['name'] = value
-            elif field == 'תיאור':
-                update_data['description'] = value
-            elif field == 'מחיר':
-                update_data['regular_price'] = value
-            elif field == 'מלאי' and value.isdigit():
-                update_data['stock_quantity'] = int(value)
-                update_data['manage_stock'] = True
-                
-        if not update_data:
-            return "לא נמצאו שדות תקינים לעדכון"
-            
         # Update product
         updated_product = product_handler.update_product(product_id, **update_data)
         
@@ -334,18 +353,17 @@ def delete_product(product_name: str) -> str:
     """Delete a product from WordPress"""
     try:
         # Search for product
-        products = product_handler.search_products(product_name)
+        product, candidates = product_handler.resolve_product(product_name)
         
-        if not products:
-            return f"לא נמצא מוצר בשם {product_name}"
+        if product is None:
+            return unresolved_product_message(product_name, candidates)
             
-        product = products[0]
         product_id = product["id"]
         
         # Delete product
         product_handler.delete_product(product_id)
         
-        return f"המוצר {product_name} נמחק בהצלחה"
+        return f"המוצר {product['name']} נמחק בהצלחה"
         
     except Exception as e:
         logger.error(f"Error deleting product: {e}")
@@ -354,8 +372,8 @@ def delete_product(product_name: str) -> str:
 def get_product_details(product_name: str) -> str:
     """Get detailed information about a product"""
     try:
-        # Search for product
-        products = product_handler.search_products(product_name)
+        # Find product in the local name index
+        products = product_handler.find_products(product_name)
         
         if not products:
             return f"לא נמצא מוצר בשם {product_name}"
@@ -378,8 +396,7 @@ def get_product_details(product_name: str) -> str:
             status = "במלאי" if stock > 0 else "אזל מהמלאי"
             response.append(f"מלאי: {status} ({stock} יחידות)")
         else:
-            status = "במלאי" if details.get('in_stock', True) else "אזל מהמלאי"
-            response.append(f"מלאי: {status}")
+            response.append(f"מלאי: {stock_status_label(details)}")
             
         if details.get('sale_price'):
             response.append(f"מחיר מבצע: ₪{details['sale_price']}")
@@ -405,10 +422,22 @@ def get_sales() -> str:
 
 # Initialize LangChain components
 llm = ChatOpenAI(api_key=config['OPENAI_API_KEY'], model="gpt-4-0125-preview")
-memory = ConversationBufferWindowMemory(
-    memory_key="chat_history",
-    k=5,
-    return_messages=True
+
+def create_memory() -> ConversationBufferWindowMemory:
+    """יצירת זיכרון שיחה חדש לצ'אט"""
+    return ConversationBufferWindowMemory(
+        memory_key="chat_history",
+        k=5,
+        return_messages=True,
+        output_key="output"
+    )
+
+# זיכרון נפרד לכל צ'אט, עם תקרת שיחות חיות ותפוגה לפי חוסר פעילות
+memory_store = ChatMemoryStore(
+    create_memory,
+    max_chats=config['MEMORY_MAX_CHATS'],
+    idle_ttl=config['MEMORY_IDLE_TTL'],
+    spill_dir=config['MEMORY_SPILL_DIR']
 )
 
 
@@ -441,36 +470,19 @@ def delete_product_image(product_id: int, image_number: int) -> str:
         logger.error(f"Error deleting product image: {e}")
         return f"שגיאה במחיקת התמונה: {str(e)}"
 
-def create_coupon(coupon_info: str) -> str:
+def create_coupon(code: str, discount_type: str, amount: float, description: Optional[str] = None,
+                  expiry_date: Optional[str] = None, min_amount: Optional[float] = None,
+                  max_amount: Optional[float] = None) -> str:
     """Create a new coupon in WooCommerce"""
     try:
-        # Parse coupon info from string format
-        # Expected format: code | type | amount | [description] | [expiry_date] | [min_amount] | [max_amount]
-        parts = coupon_info.strip().split("|")
-        logger.debug(f"Received coupon info: {coupon_info}")
-        logger.debug(f"Split into parts: {parts}")
-        
-        if len(parts) < 3:
-            return "נדרש לפחות: קוד קופון | סוג הנחה | סכום הנחה"
-            
-        code = parts[0].strip()
-        discount_type = parts[1].strip().lower()
-        amount = float(parts[2].strip())
-        
-        # Optional parameters with detailed logging
-        description = parts[3].strip() if len(parts) > 3 else None
-        expiry_date = parts[4].strip() if len(parts) > 4 else None
-        min_amount = float(parts[5].strip()) if len(parts) > 5 else None
-        max_amount = float(parts[6].strip()) if len(parts) > 6 else None
-        
-        logger.debug(f"Parsed values: code={code}, type={discount_type}, amount={amount}")
+        logger.debug(f"Creating coupon: code={code}, type={discount_type}, amount={amount}")
         logger.debug(f"Optional values: description={description}, expiry={expiry_date}, min={min_amount}, max={max_amount}")
         
         # Validate discount type
         if discount_type not in ['percent', 'fixed_cart']:
             logger.error(f"Invalid discount type: {discount_type}")
             return "סוג ההנחה חייב להיות 'percent' (אחוזים) או 'fixed_cart' (סכום קבוע)"
-        
+            
         try:
             # Create coupon
             coupon = coupon_handler.create_coupon(
@@ -491,18 +503,15 @@ def create_coupon(coupon_info: str) -> str:
             if "already exists" in error_msg.lower():
                 return f"קופון עם הקוד {code} כבר קיים במערכת"
             return f"שגיאה ביצירת הקופון: {error_msg}"
-        
-    except ValueError as ve:
-        logger.error(f"Value error in create_coupon: {str(ve)}")
-        return f"שגיאה בערכים שהוזנו: {str(ve)}"
+            
     except Exception as e:
         logger.error(f"Error creating coupon: {str(e)}")
         return f"שגיאה ביצירת הקופון: {str(e)}"
 
-def list_coupons(_: str = "") -> str:
+def list_coupons() -> str:
     """Get list of all coupons"""
     try:
-        coupons = coupon_handler.list_coupons()
+        coupons = coupon_handler.list_coupons(fields=COUPON_LIST_FIELDS)
         
         if not coupons:
             return "אין קופונים פעילים בחנות"
@@ -519,19 +528,27 @@ def list_coupons(_: str = "") -> str:
         logger.error(f"Error listing coupons: {e}")
         return f"שגיאה בהצגת הקופונים: {str(e)}"
 
-def edit_coupon(coupon_info: str) -> str:
-    """Edit an existing coupon"""
+def edit_coupon(code: str, new_code: Optional[str] = None, discount_type: Optional[str] = None,
+                amount: Optional[float] = None, description: Optional[str] = None,
+                expiry_date: Optional[str] = None, min_amount: Optional[float] = None,
+                max_amount: Optional[float] = None) -> str:
+    """Edit an existing coupon - only the fields that were given are updated"""
     try:
-        # Parse coupon info from string format
-        # Expected format: code | field | new_value
-        parts = coupon_info.strip().split("|")
-        if len(parts) != 3:
-            return "נדרש: קוד קופון | שדה לעריכה | ערך חדש"
-            
-        code = parts[0].strip()
-        field = parts[1].strip()
-        new_value = parts[2].strip()
+        # Map arguments to API fields
+        update_data = {
+            "code": new_code,
+            "discount_type": discount_type,
+            "amount": amount,
+            "description": description,
+            "date_expires": f"{expiry_date}T23:59:59" if expiry_date else None,
+            "minimum_amount": min_amount,
+            "maximum_amount": max_amount
+        }
+        update_data = {field: value for field, value in update_data.items() if value is not None}
         
+        if not update_data:
+            return "לא צוינו שדות לעדכון. אפשרויות: קוד, סוג, סכום, תיאור, תפוגה, מינימום, מקסימום"
+            
         # Search for coupon by code
         coupons = coupon_handler.search_coupons(code)
         if not coupons:
@@ -539,31 +556,6 @@ def edit_coupon(coupon_info: str) -> str:
             
         coupon_id = coupons[0]["id"]
         
-        # Map field names to API fields
-        field_mapping = {
-            "קוד": "code",
-            "סוג": "discount_type",
-            "סכום": "amount",
-            "תיאור": "description",
-            "תפוגה": "date_expires",
-            "מינימום": "minimum_amount",
-            "מקסימום": "maximum_amount"
-        }
-        
-        if field not in field_mapping:
-            return f"שדה לא חוקי. אפשרויות: {', '.join(field_mapping.keys())}"
-            
-        # Prepare update data
-        update_data = {
-            field_mapping[field]: new_value
-        }
-        
-        # Handle special cases
-        if field == "תפוגה":
-            update_data["date_expires"] = f"{new_value}T23:59:59"
-        elif field in ["מינימום", "מקסימום", "סכום"]:
-            update_data[field_mapping[field]] = float(new_value)
-        
         # Update coupon
         coupon_handler.edit_coupon(coupon_id, **update_data)
         
@@ -595,7 +587,7 @@ def delete_coupon(code: str) -> str:
 def list_orders(status: str = "") -> str:
     """Get list of orders with optional status filter"""
     try:
-        orders = order_handler.list_orders(status=status if status else None)
+        orders = order_handler.list_orders(status=status if status else None, fields=ORDER_LIST_FIELDS)
         
         if not orders:
             return "אין הזמנות במערכת"
@@ -629,10 +621,10 @@ def list_orders(status: str = "") -> str:
         logger.error(f"Error listing orders: {e}")
         return f"שגיאה בהצגת ההזמנות: {str(e)}"
 
-def get_order_details(order_id: str) -> str:
+def get_order_details(order_id: int) -> str:
     """Get detailed information about a specific order"""
     try:
-        # Convert order_id to int
+        # The intent router passes the id as text
         order_id = int(order_id)
         order = order_handler.get_order_details(order_id)
         
@@ -658,7 +650,7 @@ def get_order_details(order_id: str) -> str:
         details.append("\nפריטים:")
         for item in order.get('line_items', []):
             details.append(f"- {item.get('name', '')}: {item.get('quantity', 0)} יח' × ₪{item.get('price', '0')}")
-        
+            
         # Add notes if any
         notes = order_handler.get_order_notes(order_id)
         if notes:
@@ -666,23 +658,17 @@ def get_order_details(order_id: str) -> str:
             for note in notes:
                 if not note.get('customer_note', False):  # Show only admin notes
                     details.append(f"- {note.get('note', '')}")
-        
+                    
         return "\n".join(details)
         
     except Exception as e:
         logger.error(f"Error getting order details: {e}")
         return f"שגיאה בהצגת פרטי ההזמנה: {str(e)}"
 
-def update_order_status(order_info: str) -> str:
+def update_order_status(order_id: int, status: str) -> str:
     """Update order status"""
     try:
-        # Parse order info - format: "order_id status"
-        parts = order_info.strip().split()
-        if len(parts) < 2:
-            return "נדרש מזהה הזמנה וסטטוס חדש"
-            
-        order_id = int(parts[0])
-        status = parts[1].lower()
+        status = status.lower()
         
         # Update status
         order = order_handler.update_order_status(order_id, status)
@@ -706,36 +692,23 @@ def update_order_status(order_info: str) -> str:
         logger.error(f"Error updating order status: {e}")
         return f"שגיאה בעדכון סטטוס ההזמנה: {str(e)}"
 
-def search_orders(search_info: str) -> str:
-    """Search orders by various parameters"""
+def search_orders(search_term: Optional[str] = None, customer_id: Optional[int] = None, status: Optional[str] = None,
+                  date_from: Optional[str] = None, date_to: Optional[str] = None) -> str:
+    """Search orders by free text, customer, status or date range"""
     try:
-        # Parse search info - format: "field:value"
-        if ':' not in search_info:
-            # Treat as general search term
-            orders = order_handler.search_orders(search_term=search_info)
-        else:
-            field, value = search_info.split(':', 1)
-            field = field.strip().lower()
-            value = value.strip()
-            
-            # Prepare search parameters
-            search_params = {}
-            if field == 'לקוח':
-                search_params['customer_id'] = int(value)
-            elif field == 'סטטוס':
-                search_params['status'] = value.lower()
-            elif field == 'תאריך':
-                if '-' in value:
-                    date_from, date_to = value.split('-')
-                    search_params['date_from'] = date_from.strip()
-                    search_params['date_to'] = date_to.strip()
-                else:
-                    search_params['date_from'] = value
-                    search_params['date_to'] = value
-            else:
-                return "שדה חיפוש לא חוקי. אפשרויות: לקוח, סטטוס, תאריך"
+        # Prepare search parameters
+        search_params = {
+            "search_term": search_term,
+            "customer_id": customer_id,
+            "status": status.lower() if status else None,
+            "date_from": date_from,
+            "date_to": date_to or date_from
+        }
+        search_params = {field: value for field, value in search_params.items() if value is not None}
+        if not search_params:
+            return "נדרש לפחות פרמטר חיפוש אחד: טקסט, לקוח, סטטוס או תאריך"
             
-            orders = order_handler.search_orders(**search_params)
+        orders = order_handler.search_orders(**search_params, fields=ORDER_LIST_FIELDS)
         
         if not orders:
             return "לא נמצאו הזמנות מתאימות"
@@ -765,75 +738,54 @@ def search_orders(search_info: str) -> str:
         logger.error(f"Error searching orders: {e}")
         return f"שגיאה בחיפוש הזמנות: {str(e)}"
 
-def create_order(order_info: str) -> str:
+def create_order(first_name: str, last_name: str, email: str, phone: str, address: str, city: str, postcode: str,
+                 items: List[OrderItem], shipping_method: Optional[str] = None) -> str:
     """Create a new order"""
     try:
-        # Parse order info from string format
-        # Expected format: first_name | last_name | email | phone | address | city | postcode | product_id:quantity,product_id:quantity
-        parts = order_info.strip().split("|")
-        if len(parts) < 8:
-            return "נדרשים כל הפרטים: שם פרטי | שם משפחה | אימייל | טלפון | כתובת | עיר | מיקוד | מוצרים"
-            
-        # Parse customer data
         customer_data = {
-            "first_name": parts[0].strip(),
-            "last_name": parts[1].strip(),
-            "email": parts[2].strip(),
-            "phone": parts[3].strip(),
-            "address_1": parts[4].strip(),
-            "city": parts[5].strip(),
-            "postcode": parts[6].strip()
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": email,
+            "phone": phone,
+            "address_1": address,
+            "city": city,
+            "postcode": postcode
         }
         
-        # Parse items
-        items_str = parts[7].strip()
-        items = []
-        for item in items_str.split(","):
-            if ":" not in item:
-                return "פורמט מוצרים לא תקין. נדרש: מזהה_מוצר:כמות,מזהה_מוצר:כמות"
-            product_id, quantity = item.split(":")
-            items.append({
-                "product_id": int(product_id),
-                "quantity": int(quantity)
-            })
-        
-        # Add shipping method if specified
-        shipping_method = parts[8].strip() if len(parts) > 8 else None
-        
+        if not items:
+            return "נדרש לפחות מוצר אחד בהזמנה"
+            
         # Create order
-        order = order_handler.create_order(customer_data, items, shipping_method)
+        order = order_handler.create_order(customer_data, [item.model_dump() for item in items], shipping_method)
         
         return f"ההזמנה נוצרה בהצלחה! מספר הזמנה: #{order['id']}"
         
-    except ValueError as ve:
-        logger.error(f"Invalid value in create_order: {str(ve)}")
-        return f"ערך לא תקין: {str(ve)}"
     except Exception as e:
         logger.error(f"Error creating order: {str(e)}")
         return f"שגיאה ביצירת ההזמנה: {str(e)}"
 
-def list_categories(_: str = "") -> str:
+def list_categories() -> str:
     """הצגת רשימת הקטגוריות בחנות"""
     try:
-        categories = category_handler.list_categories()
+        tree = category_handler.get_tree()
         
-        if not categories:
+        if not len(tree):
             return "אין קטגוריות בחנות"
             
         categories_text = []
-        for cat in categories:
+        # מעבר על העץ לפי הסדר - כל קטגוריה מוצגת מתחת לקטגוריית האב שלה
+        for cat, depth in tree.walk():
             # הוספת שם הקטגוריה ומזהה
-            cat_line = f"- {cat['name']} (ID: {cat['id']})"
+            cat_line = "  " * depth + f"- {cat['name']} (ID: {cat['id']})"
             
             # הוספת מספר המוצרים בקטגוריה
             cat_line += f" | {cat['count']} מוצרים"
             
             # אם יש קטגוריית אב, הוספת המידע
-            if cat.get('parent'):
-                parent = next((c['name'] for c in categories if c['id'] == cat['parent']), None)
-                if parent:
-                    cat_line += f" | קטגוריית אב: {parent}"
-                    
+            parent = tree.parent_of(cat)
+            if parent:
+                cat_line += f" | קטגוריית אב: {parent['name']}"
+                
             categories_text.append(cat_line)
             
         return "הקטגוריות בחנות:\n" + "\n".join(categories_text)
@@ -842,29 +794,18 @@ def list_categories(_: str = "") -> str:
         logger.error(f"Error listing categories: {e}")
         return f"שגיאה בהצגת הקטגוריות: {str(e)}"
 
-def create_category(category_info: str) -> str:
+def create_category(name: str, description: str = "", parent_name: Optional[str] = None) -> str:
     """יצירת קטגוריה חדשה"""
     try:
-        # Parse category info from string format
-        # Expected format: name | description | [parent_category_name]
-        parts = category_info.strip().split("|")
-        if len(parts) < 1:
-            return "נדרש לפחות שם לקטגוריה"
-            
-        name = parts[0].strip()
-        description = parts[1].strip() if len(parts) > 1 else ""
-        parent_name = parts[2].strip() if len(parts) > 2 else None
-        
         # אם צוינה קטגוריית אב, מציאת המזהה שלה
         parent_id = None
         if parent_name:
-            categories = category_handler.list_categories()
-            parent = next((cat for cat in categories if cat['name'].lower() == parent_name.lower()), None)
+            parent = category_handler.find_category(parent_name)
             if parent:
                 parent_id = parent['id']
             else:
                 return f"לא נמצאה קטגוריית אב בשם {parent_name}"
-        
+                
         # יצירת הקטגוריה
         category = category_handler.create_category(name, description, parent_id)
         
@@ -874,44 +815,32 @@ def create_category(category_info: str) -> str:
         logger.error(f"Error creating category: {e}")
         return f"שגיאה ביצירת הקטגוריה: {str(e)}"
 
-def update_category(category_info: str) -> str:
-    """עדכון פרטי קטגוריה"""
+def update_category(category_name: str, new_name: Optional[str] = None, description: Optional[str] = None,
+                    parent_name: Optional[str] = None) -> str:
+    """עדכון פרטי קטגוריה - רק השדות שצוינו מתעדכנים"""
     try:
-        # Parse category info from string format
-        # Expected format: category_name | field | new_value
-        parts = category_info.strip().split("|")
-        if len(parts) != 3:
-            return "נדרש: שם קטגוריה | שדה לעדכון | ערך חדש"
-            
-        category_name = parts[0].strip()
-        field = parts[1].strip()
-        new_value = parts[2].strip()
-        
         # חיפוש הקטגוריה לפי שם
-        categories = category_handler.list_categories()
-        category = next((cat for cat in categories if cat['name'].lower() == category_name.lower()), None)
+        category = category_handler.find_category(category_name)
         if not category:
             return f"לא נמצאה קטגוריה בשם {category_name}"
             
-        # מיפוי שמות השדות בעברית לאנגלית
-        field_mapping = {
-            "שם": "name",
-            "תיאור": "description",
-            "אב": "parent"
-        }
-        
-        if field not in field_mapping:
-            return f"שדה לא חוקי. אפשרויות: {', '.join(field_mapping.keys())}"
+        update_data = {}
+        if new_name:
+            update_data["name"] = new_name
+        if description is not None:
+            update_data["description"] = description
             
         # אם מעדכנים קטגוריית אב, צריך למצוא את המזהה שלה
-        if field == "אב":
-            parent = next((cat for cat in categories if cat['name'].lower() == new_value.lower()), None)
+        if parent_name:
+            parent = category_handler.find_category(parent_name)
             if not parent:
-                return f"לא נמצאה קטגוריית אב בשם {new_value}"
-            new_value = parent['id']
-        
+                return f"לא נמצאה קטגוריית אב בשם {parent_name}"
+            update_data["parent"] = parent['id']
+            
+        if not update_data:
+            return "לא צוינו שדות לעדכון. אפשרויות: שם, תיאור, אב"
+            
         # עדכון הקטגוריה
-        update_data = {field_mapping[field]: new_value}
         category_handler.update_category(category['id'], **update_data)
         
         return f"הקטגוריה {category_name} עודכנה בהצלחה"
@@ -924,12 +853,12 @@ def delete_category(category_name: str) -> str:
     """מחיקת קטגוריה"""
     try:
         # חיפוש הקטגוריה לפי שם
-        categories = category_handler.list_categories()
-        category = next((cat for cat in categories if cat['name'].lower() == category_name.lower()), None)
+        category = category_handler.find_category(category_name)
         if not category:
             return f"לא נמצאה קטגוריה בשם {category_name}"
             
-        # בדיקה אם יש מוצרים בקטגוריה
+        # בדיקה אם יש מוצרים בקטגוריה (מספר עדכני מהחנות, לא מהעץ השמור)
+        category = category_handler.get_category(category['id'], fields=CATEGORY_FIELDS)
         if category['count'] > 0:
             return f"לא ניתן למחוק את הקטגוריה {category_name} כי יש בה {category['count']} מוצרים"
             
@@ -942,33 +871,27 @@ def delete_category(category_name: str) -> str:
         logger.error(f"Error deleting category: {e}")
         return f"שגיאה במחיקת הקטגוריה: {str(e)}"
 
-def assign_product_to_categories(product_info: str) -> str:
+def assign_product_to_categories(product_name: str, category_names: List[str]) -> str:
     """שיוך מוצר לקטגוריות"""
     try:
-        # Parse product info from string format
-        # Expected format: product_name | category_name1,category_name2,...
-        parts = product_info.strip().split("|")
-        if len(parts) != 2:
-            return "נדרש: שם מוצר | שמות קטגוריות (מופרדים בפסיקים)"
+        category_names = [name.strip() for name in category_names if name.strip()]
+        if not category_names:
+            return "נדרשת לפחות קטגוריה אחת"
             
-        product_name = parts[0].strip()
-        category_names = [name.strip() for name in parts[1].split(",")]
-        
         # חיפוש המוצר
-        products = product_handler.search_products(product_name)
+        product, candidates = product_handler.resolve_product(product_name)
         
-        if not products:
-            return f"לא נמצא מוצר בשם {product_name}"
+        if product is None:
+            return unresolved_product_message(product_name, candidates)
             
-        product_id = products[0]["id"]
+        product_id = product["id"]
         
         # חיפוש הקטגוריות
-        categories = category_handler.list_categories()
         category_ids = []
         not_found = []
         
         for name in category_names:
-            category = next((cat for cat in categories if cat['name'].lower() == name.lower()), None)
+            category = category_handler.find_category(name)
             if category:
                 category_ids.append(category['id'])
             else:
@@ -980,31 +903,36 @@ def assign_product_to_categories(product_info: str) -> str:
         # שיוך המוצר לקטגוריות
         category_handler.assign_product_to_category(product_id, category_ids)
         
-        return f"המוצר {product_name} שויך בהצלחה לקטגוריות: {', '.join(category_names)}"
+        return f"המוצר {product['name']} שויך בהצלחה לקטגוריות: {', '.join(category_names)}"
         
     except Exception as e:
         logger.error(f"Error assigning product to categories: {e}")
         return f"שגיאה בשיוך המוצר לקטגוריות: {str(e)}"
 
-def list_customers(_: str = "") -> str:
+def list_customers() -> str:
     """הצגת רשימת הלקוחות בחנות"""
     try:
-        customers = customer_handler.list_customers(per_page=20)
+        customers = customer_handler.list_customers(per_page=20, fields=CUSTOMER_LIST_FIELDS)
         
         if not customers:
             return "אין לקוחות בחנות"
             
+        # סיכומי הרכישות של כל הלקוחות מסריקה אחת של ההזמנות (במקום בקשה לכל לקוח)
+        summaries = customer_handler.get_customers_summary([customer['id'] for customer in customers])
+        
         customers_text = []
         for customer in customers:
-            # חישוב סך הרכישות של הלקוח
-            total_spent = customer_handler.get_customer_total_spent(customer['id'])
+            summary = summaries[customer['id']]
             
             customer_line = [
                 f"- {customer['first_name']} {customer['last_name']}",
                 f"אימייל: {customer.get('email', 'לא צוין')}",
                 f"טלפון: {customer.get('billing', {}).get('phone', 'לא צוין')}",
-                f"סה\"כ רכישות: ₪{total_spent:.2f}"
+                f"סה\"כ רכישות: ₪{summary['total_spent']:.2f}",
+                f"הזמנות: {summary['orders_count']}"
             ]
+            if summary['last_order_date']:
+                customer_line.append(f"הזמנה אחרונה: {summary['last_order_date'][:10]}")
             customers_text.append(" | ".join(customer_line))
             
         return "הלקוחות בחנות:\n" + "\n".join(customers_text)
@@ -1017,14 +945,15 @@ def get_customer_details(customer_info: str) -> str:
     """הצגת פרטים מלאים על לקוח ספציפי"""
     try:
         # חיפוש לקוח לפי שם או אימייל
-        customers = customer_handler.search_customers(customer_info)
+        customers = customer_handler.search_customers(customer_info, fields=CUSTOMER_LIST_FIELDS)
         
         if not customers:
             return f"לא נמצא לקוח התואם ל-'{customer_info}'"
             
         customer = customers[0]
-        total_spent = customer_handler.get_customer_total_spent(customer['id'])
-        orders = customer_handler.get_customer_orders(customer['id'])
+        orders = customer_handler.get_customer_orders(customer['id'], fields=CUSTOMER_ORDER_FIELDS)
+        # הסכום מחושב מההזמנות שכבר נשלפו, בלי סריקה נוספת
+        total_spent = summarize_orders(orders)['total_spent']
         
         details = [
             f"פרטי הלקוח {customer['first_name']} {customer['last_name']}:",
@@ -1049,50 +978,35 @@ def get_customer_details(customer_info: str) -> str:
         logger.error(f"Error getting customer details: {e}")
         return f"שגיאה בקבלת פרטי הלקוח: {str(e)}"
 
-def update_customer(customer_info: str) -> str:
-    """עדכון פרטי לקוח"""
+def update_customer(customer: str, first_name: Optional[str] = None, last_name: Optional[str] = None,
+                    email: Optional[str] = None, phone: Optional[str] = None, address: Optional[str] = None,
+                    city: Optional[str] = None, postcode: Optional[str] = None) -> str:
+    """עדכון פרטי לקוח - רק השדות שצוינו מתעדכנים"""
     try:
-        # Parse customer info from string format
-        # Expected format: customer_id/email | field | new_value
-        parts = customer_info.strip().split("|")
-        if len(parts) != 3:
-            return "נדרש: מזהה/אימייל לקוח | שדה לעדכון | ערך חדש"
+        # בניית אובייקט העדכון
+        update_data = {
+            key: value for key, value in
+            (("first_name", first_name), ("last_name", last_name), ("email", email))
+            if value is not None
+        }
+        billing = {
+            key: value for key, value in
+            (("phone", phone), ("address_1", address), ("city", city), ("postcode", postcode))
+            if value is not None
+        }
+        if billing:
+            update_data["billing"] = billing
+            
+        if not update_data:
+            return "לא צוינו שדות לעדכון. אפשרויות: שם פרטי, שם משפחה, אימייל, טלפון, כתובת, עיר, מיקוד"
             
-        customer_identifier = parts[0].strip()
-        field = parts[1].strip()
-        new_value = parts[2].strip()
-        
         # חיפוש הלקוח
-        customers = customer_handler.search_customers(customer_identifier)
+        customers = customer_handler.search_customers(customer, fields=("id",))
         if not customers:
-            return f"לא נמצא לקוח התואם ל-'{customer_identifier}'"
+            return f"לא נמצא לקוח התואם ל-'{customer}'"
             
         customer_id = customers[0]['id']
         
-        # מיפוי שמות השדות בעברית לאנגלית
-        field_mapping = {
-            "שם פרטי": "first_name",
-            "שם משפחה": "last_name",
-            "אימייל": "email",
-            "טלפון": "billing.phone",
-            "כתובת": "billing.address_1",
-            "עיר": "billing.city",
-            "מיקוד": "billing.postcode"
-        }
-        
-        if field not in field_mapping:
-            return f"שדה לא חוקי. אפשרויות: {', '.join(field_mapping.keys())}"
-            
-        # בניית אובייקט העדכון
-        update_data = {}
-        if "." in field_mapping[field]:
-            parent, child = field_mapping[field].split(".")
-            if parent not in update_data:
-                update_data[parent] = {}
-            update_data[parent][child] = new_value
-        else:
-            update_data[field_mapping[field]] = new_value
-        
         # עדכון הלקוח
         customer_handler.update_customer(customer_id, **update_data)
         
@@ -1105,7 +1019,7 @@ def update_customer(customer_info: str) -> str:
 def search_customers(search_query: str) -> str:
     """חיפוש לקוחות"""
     try:
-        customers = customer_handler.search_customers(search_query)
+        customers = customer_handler.search_customers(search_query, fields=CUSTOMER_LIST_FIELDS)
         
         if not customers:
             return f"לא נמצאו לקוחות התואמים לחיפוש '{search_query}'"
@@ -1125,72 +1039,30 @@ def search_customers(search_query: str) -> str:
         logger.error(f"Error searching customers: {e}")
         return f"שגיאה בחיפוש לקוחות: {str(e)}"
 
-def create_customer(customer_info: str) -> str:
+def create_customer(first_name: str, last_name: str, email: str, phone: Optional[str] = None,
+                    address: Optional[str] = None, city: Optional[str] = None, postcode: Optional[str] = None) -> str:
     """יצירת לקוח חדש"""
     try:
-        # ניקוי והכנת הטקסט
-        customer_info = customer_info.replace('שם פרטי', '').replace('שם משפחה', '')
-        customer_info = customer_info.replace('אימייל', '').replace('מייל', '')
-        customer_info = customer_info.replace('טלפון', '').replace('כתובת', '')
-        customer_info = customer_info.replace('עיר', '').replace('מיקוד', '')
-        customer_info = customer_info.replace(':', '')  # הסרת נקודתיים
-        
-        # חיפוש אימייל בטקסט
-        import re
-        email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', customer_info)
-        if not email_match:
-            return "לא מצאתי כתובת אימייל תקינה בבקשה. אנא ספק אימייל בפורמט user@domain.com"
-        
-        email = email_match.group()
-        # הסרת האימייל מהטקסט לעיבוד שאר הפרטים
-        customer_info = customer_info.replace(email, '')
-        
-        # פיצול הטקסט לחלקים
-        parts = [p.strip() for p in re.split(r'[|,\n]|(?:ו(?:ה)?(?:שם|מייל|טלפון|כתובת|עיר|מיקוד))|(?:הוא|היא|שלו|שלה)', customer_info) if p.strip()]
-        
-        # חיפוש שם פרטי ושם משפחה
-        names = [p for p in parts if p and p not in [email]]
-        if len(names) < 2:
-            return "לא הצלחתי לזהות שם פרטי ושם משפחה. אנא ספק את הפרטים בצורה ברורה יותר"
-        
-        first_name = names[0].strip()
-        last_name = names[1].strip()
-        
         logger.info(f"Creating customer with name: {first_name} {last_name}, email: {email}")
         
-        # יצירת מילון עם הפרטים הבסיסיים
-        customer_data = {
-            "first_name": first_name,
-            "last_name": last_name,
-            "email": email,
-            "username": email  # משתמש באימייל כשם משתמש
+        # פרטי חיוב - רק מה שצוין
+        billing = {
+            f"billing_{key}": value for key, value in
+            (("phone", phone), ("address_1", address), ("city", city), ("postcode", postcode))
+            if value
         }
         
-        # חיפוש מספר טלפון
-        phone_match = re.search(r'0\d{8,9}', customer_info)
-        if phone_match:
-            customer_data["billing_phone"] = phone_match.group()
-        
-        # חיפוש כתובת (אם יש)
-        address_parts = [p for p in parts[2:] if p and p not in [first_name, last_name, email]]
-        if len(address_parts) >= 1:
-            customer_data["billing_address_1"] = address_parts[0]
-        if len(address_parts) >= 2:
-            customer_data["billing_city"] = address_parts[1]
-        if len(address_parts) >= 3:
-            customer_data["billing_postcode"] = address_parts[2]
-        
         # יצירת הלקוח
-        customer = customer_handler.create_customer(**customer_data)
+        customer = customer_handler.create_customer(first_name, last_name, email, **billing)
         
         success_msg = f"לקוח חדש נוצר בהצלחה!\n"
         success_msg += f"מזהה: {customer['id']}\n"
         success_msg += f"שם: {customer['first_name']} {customer['last_name']}\n"
         success_msg += f"אימייל: {customer['email']}"
         
-        if 'billing' in customer and 'phone' in customer['billing']:
+        if 'billing' in customer and customer['billing'].get('phone'):
             success_msg += f"\nטלפון: {customer['billing']['phone']}"
-        
+            
         return success_msg
         
     except Exception as e:
@@ -1200,7 +1072,7 @@ def create_customer(customer_info: str) -> str:
             return f"כתובת האימייל {email} כבר קיימת במערכת. אנא נסה כתובת אימייל אחרת."
         return f"שגיאה ביצירת הלקוח: {error_msg}"
 
-def get_low_stock_products(_: str = "") -> str:
+def get_low_stock_products() -> str:
     """הצגת מוצרים במלאי נמוך
     
     דוגמאות:
@@ -1209,7 +1081,7 @@ def get_low_stock_products(_: str = "") -> str:
     - מה המצב של המלאי
     """
     try:
-        products = inventory_handler.get_low_stock_products()
+        products = inventory_handler.get_low_stock_products(fields=LOW_STOCK_FIELDS)
         
         if not products:
             return "לא נמצאו מוצרים במלאי נמוך"
@@ -1228,40 +1100,22 @@ def get_low_stock_products(_: str = "") -> str:
         logger.error(f"Error getting low stock products: {e}")
         return f"שגיאה בקבלת מוצרים במלאי נמוך: {str(e)}"
 
-def update_product_stock(product_info: str) -> str:
+def update_product_stock(product_name: str, operation: str, quantity: int) -> str:
     """עדכון כמות מלאי למוצר
     
-    דוגמאות:
-    - חולצה כחולה | set | 50
-    - מכנסיים שחורים | add | 20
-    - נעלי ספורט | subtract | 5
-    
-    פורמט: שם מוצר | פעולה | כמות
     פעולות אפשריות:
     - set: קביעת כמות מדויקת
     - add: הוספת כמות למלאי הקיים
     - subtract: הורדת כמות מהמלאי הקיים
     """
     try:
-        # Parse product info: product_name | operation | quantity
-        parts = [p.strip() for p in product_info.split("|")]
-        if len(parts) != 3:
-            return "נדרש: שם מוצר | פעולה (set/add/subtract) | כמות"
-            
-        product_name, operation, quantity = parts
-        
-        try:
-            quantity = int(quantity)
-        except ValueError:
-            return "הכמות חייבת להיות מספר שלם"
-            
         # Find product using product handler
-        products = product_handler.search_products(product_name)
+        product, candidates = product_handler.resolve_product(product_name)
         
-        if not products:
-            return f"לא נמצא מוצר בשם {product_name}"
+        if product is None:
+            return unresolved_product_message(product_name, candidates)
             
-        product_id = products[0]["id"]
+        product_id = product["id"]
         
         # Update stock
         result = inventory_handler.update_stock_quantity(product_id, quantity, operation)
@@ -1273,7 +1127,7 @@ def update_product_stock(product_info: str) -> str:
             'subtract': 'הורדו'
         }.get(operation, 'עודכן ל')
         
-        return f"המלאי של {product_name} {operation_text} {quantity} יחידות (מלאי נוכחי: {new_stock})"
+        return f"המלאי של {product['name']} {operation_text} {quantity} יחידות (מלאי נוכחי: {new_stock})"
         
     except Exception as e:
         logger.error(f"Error updating stock: {e}")
@@ -1289,7 +1143,7 @@ def get_product_stock_status(product_name: str) -> str:
     """
     try:
         # Find product using product handler
-        products = product_handler.search_products(product_name)
+        products = product_handler.find_products(product_name)
         
         if not products:
             return f"לא נמצא מוצר בשם {product_name}"
@@ -1314,312 +1168,219 @@ def get_product_stock_status(product_name: str) -> str:
         logger.error(f"Error getting stock status: {e}")
         return f"שגיאה בקבלת סטטוס מלאי: {str(e)}"
 
-def manage_product_stock_by_attributes(product_info: str) -> str:
+def manage_product_stock_by_attributes(product_name: str, stock: List[AttributeStock]) -> str:
     """ניהול מלאי לפי מאפיינים
     
-    דוגמאות:
-    חולצה כחולה
-    צבע: כחול | 20
-    מידה: M | 15
-    מידה: L | 25
-    
-    מכנסיים שחורים
-    צבע: שחור | 30
-    מידה: 32 | 10
-    מידה: 34 | 15
-    מידה: 36 | 20
+    דוגמה: חולצה כחולה, צבע כחול - 20, מידה M - 15, מידה L - 25
     """
     try:
-        lines = product_info.strip().split("\n")
-        if len(lines) < 2:
-            return "נדרש: שם מוצר בשורה ראשונה, ואחריו שורות של מאפיין: ערך | כמות"
-            
-        product_name = lines[0].strip()
-        
-        # Find product
-        auth_params = {
-            'consumer_key': os.getenv('WC_CONSUMER_KEY'),
-            'consumer_secret': os.getenv('WC_CONSUMER_SECRET')
-        }
-        
-        search_response = requests.get(
-            f"{config['WP_URL']}/wp-json/wc/v3/products",
-            params={**auth_params, "search": product_name},
-            verify=False
-        )
-        search_response.raise_for_status()
-        products = search_response.json()
-        
-        if not products:
-            return f"לא נמצא מוצר בשם {product_name}"
-            
-        product_id = products[0]["id"]
-        
-        # Parse attributes and quantities
+        # מאפיין -> ערך -> כמות, כפי ש-manage_stock_by_attributes מצפה
         attributes = {}
-        for line in lines[1:]:
-            if ":" not in line or "|" not in line:
-                continue
-                
-            attr_part, quantity_part = line.split("|")
-            attr_name, attr_value = [x.strip() for x in attr_part.split(":")]
+        for entry in stock:
+            attributes.setdefault(entry.attribute.strip(), {})[entry.value.strip()] = entry.quantity
             
-            try:
-                quantity = int(quantity_part.strip())
-            except ValueError:
-                return f"הכמות בשורה '{line}' חייבת להיות מספר שלם"
-                
-            if attr_name not in attributes:
-                attributes[attr_name] = {}
-            attributes[attr_name][attr_value] = quantity
-        
         if not attributes:
             return "לא נמצאו מאפיינים תקינים"
             
+        # Find product
+        product, candidates = product_handler.resolve_product(product_name)
+        
+        if product is None:
+            return unresolved_product_message(product_name, candidates)
+            
+        product_id = product["id"]
+        
         # Update stock by attributes
         result = inventory_handler.manage_stock_by_attributes(product_id, attributes)
         
-        return f"המלאי עודכן בהצלחה עבור {result['variations_updated']} וריאציות"
+        message = f"המלאי של {product['name']} עודכן בהצלחה עבור {result['variations_updated']} וריאציות"
+        if result['errors']:
+            message += f"\n⚠️ {len(result['errors'])} וריאציות נכשלו"
+        return message
         
     except Exception as e:
         logger.error(f"Error managing stock by attributes: {e}")
         return f"שגיאה בניהול מלאי לפי מאפיינים: {str(e)}"
 
-def set_product_low_stock_threshold(product_info: str) -> str:
-    """הגדרת סף התראה למלאי נמוך
-    
-    דוגמאות:
-    - חולצה כחולה | 10
-    - מכנסיים שחורים | 15
-    - נעלי ספורט | 5
-    
-    פורמט: שם מוצר | סף התראה
-    """
+def set_product_low_stock_threshold(product_name: str, threshold: int) -> str:
+    """הגדרת סף התראה למלאי נמוך"""
     try:
-        # Parse product info: product_name | threshold
-        parts = [p.strip() for p in product_info.split("|")]
-        if len(parts) != 2:
-            return "נדרש: שם מוצר | סף התראה"
-            
-        product_name, threshold = parts
-        
-        try:
-            threshold = int(threshold)
-        except ValueError:
-            return "סף ההתראה חייב להיות מספר שלם"
-            
         # Find product
-        auth_params = {
-            'consumer_key': os.getenv('WC_CONSUMER_KEY'),
-            'consumer_secret': os.getenv('WC_CONSUMER_SECRET')
-        }
-        
-        search_response = requests.get(
-            f"{config['WP_URL']}/wp-json/wc/v3/products",
-            params={**auth_params, "search": product_name},
-            verify=False
-        )
-        search_response.raise_for_status()
-        products = search_response.json()
+        product, candidates = product_handler.resolve_product(product_name)
         
-        if not products:
-            return f"לא נמצא מוצר בשם {product_name}"
+        if product is None:
+            return unresolved_product_message(product_name, candidates)
             
-        product_id = products[0]["id"]
+        product_id = product["id"]
         
         # Set threshold
         inventory_handler.set_low_stock_threshold(product_id, threshold)
         
-        return f"סף ההתראה למלאי נמוך עבור {product_name} נקבע ל-{threshold} יחידות"
+        return f"סף ההתראה למלאי נמוך עבור {product['name']} נקבע ל-{threshold} יחידות"
         
     except Exception as e:
         logger.error(f"Error setting low stock threshold: {e}")
         return f"שגיאה בהגדרת סף התראה למלאי נמוך: {str(e)}"
 
+def tool_validation_error(error: ValidationError) -> str:
+    """ארגומנטים שלא תואמים לסכמה חוזרים למודל כתשובת הכלי, כדי שיתקן אותם בקריאה הבאה"""
+    problems = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+    return f"ארגומנטים לא תקינים לכלי: {problems}"
+
+def structured_tool(func, description: str, args_schema) -> StructuredTool:
+    """כלי עם ארגומנטים מוקלדים (JSON schema) שהמודל ממלא ישירות ב-function calling"""
+    return StructuredTool.from_function(
+        func=func,
+        name=func.__name__,
+        description=description,
+        args_schema=args_schema,
+        handle_validation_error=tool_validation_error
+    )
+
 # Define tools
 tools = [
-    Tool(
-        name="list_products",
-        func=list_products,
-        description="הצגת רשימת המוצרים בחנות"
-    ),
-    Tool(
-        name="create_product",
-        func=create_product,
-        description="יוצר מוצר חדש. פורמט: שם | תיאור | מחיר | [כמות במלאי]"
-    ),
-    Tool(
-        name="edit_product",
-        func=edit_product,
-        description="עורך פרטי מוצר. פורמט: שם מוצר | שדה לעריכה | ערך חדש. שדות אפשריים: שם, תיאור, מחיר, כמות"
-    ),
-    Tool(
-        name="delete_product",
-        func=delete_product,
-        description="מוחק מוצר מהחנות. מקבל את שם המוצר"
-    ),
-    Tool(
-        name="get_product_details",
-        func=get_product_details,
-        description="מציג את כל הפרטים של מוצר. מקבל את שם המוצר"
-    ),
-    Tool(
-        name="update_price",
-        func=update_price,
-        description="משנה את המחיר של מוצר. מקבל שם מוצר ומחיר חדש או אחוז שינוי (לדוגמה: 'מוצר א 100' או 'מוצר א -10%')"
-    ),
-    Tool(
-        name="remove_discount",
-        func=remove_discount,
-        description="מסיר מבצע/הנחה ממוצר. מקבל את שם המוצר"
-    ),
-    Tool(
-        name="get_sales",
-        func=get_sales,
-        description="מציג את נתוני המכירות בחנות"
-    ),
-    Tool(
-        name="create_coupon",
-        func=create_coupon,
-        description="יוצר קופון חדש. פורמט: קוד | סוג (percent/fixed_cart) | סכום | [תיאור] | [תפוגה YYYY-MM-DD] | [מינימום] | [מקסימום]"
-    ),
-    Tool(
-        name="list_coupons",
-        func=list_coupons,
-        description="מציג את רשימת הקופונים בחנות"
-    ),
-    Tool(
-        name="edit_coupon",
-        func=edit_coupon,
-        description="עורך קופון קיים. פורמט: קוד | שדה | ערך חדש. שדות: קוד, סוג, סכום, תיאור, תפוגה, מינימום, מקסימום"
-    ),
-    Tool(
-        name="delete_coupon",
-        func=delete_coupon,
-        description="מוחק קופון מהחנות. מקבל את קוד הקופון"
-    ),
-    Tool(
-        name="list_orders",
-        func=list_orders,
-        description="מציג את רשימת ההזמנות. ניתן לסנן לפי סטטוס"
+    structured_tool(list_products, "הצגת רשימת המוצרים בחנות", tool_schemas.NoArgs),
+    structured_tool(create_product, "יוצר מוצר חדש", tool_schemas.CreateProductArgs),
+    structured_tool(
+        edit_product,
+        "עורך פרטי מוצר. מעדכן רק את השדות שצוינו: שם, תיאור, מחיר, כמות",
+        tool_schemas.EditProductArgs
     ),
-    Tool(
-        name="get_order_details",
-        func=get_order_details,
-        description="מציג פרטים מלאים על הזמנה ספציפית. מקבל מזהה הזמנה"
+    structured_tool(delete_product, "מוחק מוצר מהחנות", tool_schemas.ProductNameArgs),
+    structured_tool(get_product_details, "מציג את כל הפרטים של מוצר", tool_schemas.ProductNameArgs),
+    structured_tool(
+        update_price,
+        "משנה את המחיר של מוצר: מחיר חדש, או הורדה באחוזים מהמחיר הנוכחי",
+        tool_schemas.UpdatePriceArgs
     ),
-    Tool(
-        name="update_order_status",
-        func=update_order_status,
-        description="מעדכן סטטוס הזמנה. פורמט: מזהה_הזמנה סטטוס_חדש"
+    structured_tool(remove_discount, "מסיר מבצע/הנחה ממוצר", tool_schemas.ProductNameArgs),
+    structured_tool(get_sales, "מציג את נתוני המכירות בחנות", tool_schemas.NoArgs),
+    structured_tool(create_coupon, "יוצר קופון חדש", tool_schemas.CreateCouponArgs),
+    structured_tool(list_coupons, "מציג את רשימת הקופונים בחנות", tool_schemas.NoArgs),
+    structured_tool(
+        edit_coupon,
+        "עורך קופון קיים. מעדכן רק את השדות שצוינו: קוד, סוג, סכום, תיאור, תפוגה, מינימום, מקסימום",
+        tool_schemas.EditCouponArgs
     ),
-    Tool(
-        name="search_orders",
-        func=search_orders,
-        description="מחפש הזמנות לפי פרמטרים שונים. פורמט: שדה:ערך (למשל: סטטוס:completed, לקוח:123, תאריך:2024-03-01)"
+    structured_tool(delete_coupon, "מוחק קופון מהחנות", tool_schemas.CouponCodeArgs),
+    structured_tool(list_orders, "מציג את רשימת ההזמנות. ניתן לסנן לפי סטטוס", tool_schemas.ListOrdersArgs),
+    structured_tool(get_order_details, "מציג פרטים מלאים על הזמנה ספציפית", tool_schemas.OrderIdArgs),
+    structured_tool(update_order_status, "מעדכן סטטוס הזמנה", tool_schemas.UpdateOrderStatusArgs),
+    structured_tool(
+        search_orders,
+        "מחפש הזמנות לפי טקסט חופשי, לקוח, סטטוס או טווח תאריכים",
+        tool_schemas.SearchOrdersArgs
     ),
-    Tool(
-        name="create_order",
-        func=create_order,
-        description="יוצר הזמנה חדשה. פורמט: שם_פרטי | שם_משפחה | אימייל | טלפון | כתובת | עיר | מיקוד | מזהה_מוצר:כמות,מזהה_מוצר:כמות | [שיטת_משלוח]"
+    structured_tool(create_order, "יוצר הזמנה חדשה", tool_schemas.CreateOrderArgs),
+    structured_tool(list_categories, "מציג את רשימת הקטגוריות בחנות", tool_schemas.NoArgs),
+    structured_tool(create_category, "יוצר קטגוריה חדשה", tool_schemas.CreateCategoryArgs),
+    structured_tool(
+        update_category,
+        "עורך פרטי קטגוריה. מעדכן רק את השדות שצוינו: שם, תיאור, קטגוריית אב",
+        tool_schemas.UpdateCategoryArgs
     ),
-    Tool(
-        name="list_categories",
-        func=list_categories,
-        description="מציג את רשימת הקטגוריות בחנות"
+    structured_tool(delete_category, "מוחק קטגוריה", tool_schemas.CategoryNameArgs),
+    structured_tool(assign_product_to_categories, "משייך מוצר לקטגוריות", tool_schemas.AssignCategoriesArgs),
+    structured_tool(
+        list_customers,
+        "הצגת רשימת הלקוחות בחנות (\"הצג את כל הלקוחות\", \"מי הלקוחות שלי?\")",
+        tool_schemas.NoArgs
     ),
-    Tool(
-        name="create_category",
-        func=create_category,
-        description="יוצר קטגוריה חדשה. פורמט: שם | תיאור | [קטגוריית אב]"
+    structured_tool(get_customer_details, "מציג פרטים מלאים על לקוח ספציפי", tool_schemas.CustomerQueryArgs),
+    structured_tool(
+        update_customer,
+        "עדכון פרטי לקוח. מעדכן רק את השדות שצוינו",
+        tool_schemas.UpdateCustomerArgs
     ),
-    Tool(
-        name="update_category",
-        func=update_category,
-        description="עורך פרטי קטגוריה. פורמט: שם קטגוריה | שדה | ערך חדש"
+    structured_tool(search_customers, "חיפוש לקוחות לפי טקסט חופשי", tool_schemas.SearchCustomersArgs),
+    structured_tool(
+        create_customer,
+        "יצירת לקוח חדש בחנות. נדרשים שם פרטי, שם משפחה ואימייל; טלפון וכתובת אופציונליים",
+        tool_schemas.CreateCustomerArgs
     ),
-    Tool(
-        name="delete_category",
-        func=delete_category,
-        description="מוחק קטגוריה. מקבל את שם הקטגוריה"
+    structured_tool(get_low_stock_products, "מציג את רשימת המוצרים במלאי נמוך", tool_schemas.NoArgs),
+    structured_tool(update_product_stock, "עדכון כמות מלאי למוצר", tool_schemas.UpdateStockArgs),
+    structured_tool(get_product_stock_status, "מציג את סטטוס מלאי מפורט למוצר", tool_schemas.ProductNameArgs),
+    structured_tool(
+        manage_product_stock_by_attributes,
+        "ניהול מלאי לפי מאפיינים (צבע, מידה וכו') של מוצר עם וריאציות",
+        tool_schemas.AttributeStockArgs
     ),
-    Tool(
-        name="assign_product_to_categories",
-        func=assign_product_to_categories,
-        description="משייך מוצר לקטגוריות. פורמט: שם מוצר | שמות קטגוריות (מופרדים בפסיקים)"
-    ),
-    Tool(
-        name="list_customers",
-        func=list_customers,
-        description="""
-        הצגת רשימת הלקוחות בחנות. אפשר לבקש בכל מיני דרכים:
-        - "הצג את כל הלקוחות"
-        - "מי הלקוחות שלי?"
-        - "תראה לי את רשימת הלקוחות"
-        - "אני רוצה לראות את כל הלקוחות במערכת"
-        """
-    ),
-    Tool(
-        name="get_customer_details",
-        func=get_customer_details,
-        description="מציג פרטים מלאים על לקוח ספציפי. מקבל שם או אימייל של הלקוח"
-    ),
-    Tool(
-        name="update_customer",
-        func=update_customer,
-        description="עדכון פרטי לקוח. פורמט: מזהה/אימייל | שדה | ערך חדש"
-    ),
-    Tool(
-        name="search_customers",
-        func=search_customers,
-        description="חיפוש לקוחות לפי טקסט חופשי"
-    ),
-    Tool(
-        name="create_customer",
-        func=create_customer,
-        description="""
-        יצירת לקוח חדש בחנות. הפקודה יכולה להתקבל במגוון צורות:
-        - "צור לקוח חדש: שם | שם משפחה | אימייל | טלפון | כתובת | עיר | מיקוד"
-        - "הוסף לקוח: שם | שם משפחה | אימייל"
-        - "רישום לקוח חדש עם השם X ושם משפחה Y והמייל Z"
-        - "תרשום בבקשה לקוח חדש - שם פרטי הוא X שם משפחה Y ואימייל Z"
-        - "אני רוצה להוסיף לקוח חדש למערכת. קוראים לו X X והמייל שלו הוא Y"
-        - כל וריאציה דומה בשפה טבעית שכוללת את פרטי הלקוח הבסיסיים
-        """
-    ),
-    Tool(
-        name="get_low_stock_products",
-        func=get_low_stock_products,
-        description="מציג את רשימת המוצרים במלאי נמוך"
-    ),
-    Tool(
-        name="update_product_stock",
-        func=update_product_stock,
-        description="עדכון כמות מלאי למוצר"
-    ),
-    Tool(
-        name="get_product_stock_status",
-        func=get_product_stock_status,
-        description="מציג את סטטוס מלאי מפורט למוצר"
-    ),
-    Tool(
-        name="manage_product_stock_by_attributes",
-        func=manage_product_stock_by_attributes,
-        description="ניהול מלאי לפי מאפיינים"
-    ),
-    Tool(
-        name="set_product_low_stock_threshold",
-        func=set_product_low_stock_threshold,
-        description="הגדרת סף התראה למלאי נמוך"
+    structured_tool(
+        set_product_low_stock_threshold,
+        "הגדרת סף התראה למלאי נמוך",
+        tool_schemas.LowStockThresholdArgs
     )
 ]
 
+# ניתוב פקודות נפוצות וחד-משמעיות ישירות לכלים, בלי סבבים של ה-LLM
+intent_router = IntentRouter({tool.name: tool.func for tool in tools}) if config['INTENT_ROUTER_ENABLED'] else None
+
+# תקציב טוקנים: פלט ארוך של כלי מקוצר עבור המודל, והגרסה המלאה נשלחת ישירות למשתמש
+token_budget = TokenBudget.from_config(config)
+agent_tools = token_budget.wrap_tools(tools)
+
+# רק הכלים הרלוונטיים להודעה נשלחים למודל (הגדרות הכלים הן רוב הפרומפט)
+tool_retriever = ToolRetriever(agent_tools, top_k=config['TOOL_RETRIEVER_TOP_K'])
+
+# כלים שרק קוראים נתונים - רק התוכניות שלהם נשמרות ומורצות מחדש בלי הסוכן
+READ_ONLY_TOOLS = {
+    "list_products", "get_product_details", "get_sales", "list_coupons", "list_orders",
+    "get_order_details", "search_orders", "list_categories", "list_customers",
+    "get_customer_details", "search_customers", "get_low_stock_products", "get_product_stock_status"
+}
+
+# שאלה שחוזרת על עצמה מריצה שוב את הכלים שהסוכן בחר בפעם הקודמת, בלי ה-LLM
+plan_cache = PlanCache(
+    tools,
+    READ_ONLY_TOOLS,
+    max_entries=config['PLAN_CACHE_SIZE'],
+    path=config['PLAN_CACHE_PATH']
+) if config['PLAN_CACHE_ENABLED'] else None
+tools_by_name = {tool.name: tool for tool in tools}
+
+def remember_exchange(chat_id: int, user_message: str, response: str) -> None:
+    """שמירת החלפה שלא עברה דרך הסוכן בזיכרון הצ'אט, כדי שהסוכן יכיר אותה בהמשך"""
+    # המשתמש מקבל את הפלט המלא; לזיכרון (וכך לכל פרומפט בהמשך) נכנסת הגרסה המקוצרת
+    memory = memory_store.get(chat_id)
+    memory.save_context({"input": user_message}, {"output": token_budget.truncate(response)[0]})
+    token_budget.trim_memory(memory)
+
+def run_routed_intent(chat_id: int, user_message: str, intent) -> str:
+    """הרצת הכלי שההודעה נותבה אליו ושמירת ההחלפה בזיכרון הצ'אט"""
+    with message_metrics("router").track():
+        response = intent_router.dispatch(intent)
+    remember_exchange(chat_id, user_message, response)
+    return response
+
+def run_cached_plan(chat_id: int, user_message: str, plan) -> str:
+    """הרצה חוזרת של תוכנית שמורה מול הכלים (תוצאות טריות) ושמירת ההחלפה בזיכרון הצ'אט"""
+    metrics = message_metrics("plan_cache")
+    with metrics.track():
+        response = "\n\n".join(str(tools_by_name[call.tool].invoke(call.args, config={"callbacks": [metrics]}))
+                                for call in plan)
+    remember_exchange(chat_id, user_message, response)
+    return response
+
 # הגדרת לוגר ייעודי ל-agent
 agent_logger = logging.getLogger('agent')
 agent_logger.setLevel(logging.INFO)
 agent_logger.addHandler(file_handler)
 agent_logger.propagate = False
 
+# מדדי ביצועים לכל הודעה: במאגר בתוך התהליך ושורת JSON אחת ב-logs/metrics.log
+agent_metrics = MetricsRegistry()
+metrics_logger = logging.getLogger('metrics')
+metrics_logger.setLevel(logging.INFO)
+metrics_file_handler = logging.FileHandler(os.path.join(log_dir, 'metrics.log'), encoding='utf-8')
+metrics_file_handler.setFormatter(logging.Formatter('{"time": "%(asctime)s", "metrics": %(message)s}'))
+metrics_logger.addHandler(metrics_file_handler)
+metrics_logger.propagate = False
+
+def message_metrics(path: str) -> AgentMetricsCallback:
+    """מדידה חדשה להודעה אחת (path: agent / router / plan_cache)"""
+    return AgentMetricsCallback(agent_metrics, path=path, log=metrics_logger)
+
 class AgentCallbackHandler(BaseCallbackHandler):
     """Handler for logging agent events to file."""
     
@@ -1651,16 +1412,7 @@ class AgentCallbackHandler(BaseCallbackHandler):
         """Log any text."""
         agent_logger.info(text)
 
-# Initialize agent with proper callback handler
-agent = initialize_agent(
-    tools,
-    llm,
-    agent=AgentType.CONVERSATIONAL_REACT_DESCRIPTION,
-    memory=memory,
-    verbose=False,
-    handle_parsing_errors=True,
-    callbacks=[AgentCallbackHandler()],
-    system_message=SystemMessage(content="""אתה עוזר וירטואלי שמנהל חנות וורדפרס. 
+SYSTEM_MESSAGE = SystemMessage(content="""אתה עוזר וירטואלי שמנהל חנות וורדפרס. 
     אתה יכול לעזור למשתמש בכל הקשור לניהול החנות - הצגת מוצרים, שינוי מחירים, הורדת מבצעים ובדיקת נתוני מכירות.
     אתה מבין עברית ויכול לבצע פעולות מורכבות כמו שינוי מחירים באחוזים.
     
@@ -1669,10 +1421,74 @@ agent = initialize_agent(
     - אם הוא מבקש להוריד/להעלות באחוזים - חשב את המחיר החדש לפי האחוז
     
     תמיד ענה בעברית ובצורה ידידותית.""")
-)
 
-# הסרת callback מיותר
-agent.callbacks = None
+# הכלים נקראים ב-function calling מובנה: המודל מחזיר את הארגומנטים כ-JSON לפי הסכמה,
+# כך שאין טקסט ReAct לפרק ופקודה רגילה מסתיימת בקריאה אחת או שתיים למודל
+AGENT_PROMPT = ChatPromptTemplate.from_messages([
+    SYSTEM_MESSAGE,
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("human", "{input}"),
+    MessagesPlaceholder(variable_name="agent_scratchpad")
+])
+
+def create_agent(memory: ConversationBufferWindowMemory, selected_tools: Optional[List[StructuredTool]] = None):
+    """יצירת סוכן עם הזיכרון של צ'אט ספציפי (ועם תת-קבוצה של הכלים, אם נבחרה)"""
+    selected_tools = selected_tools or agent_tools
+    agent = AgentExecutor(
+        agent=create_openai_tools_agent(llm, selected_tools, AGENT_PROMPT),
+        tools=selected_tools,
+        memory=memory,
+        verbose=False,
+        callbacks=[AgentCallbackHandler()],
+        trim_intermediate_steps=token_budget.trim_steps,
+        return_intermediate_steps=plan_cache is not None
+    )
+    
+    # הסרת callback מיותר
+    agent.callbacks = None
+    return agent
+
+# סוכן לכל צ'אט - משוחרר כשהזיכרון של הצ'אט מפונה מהמאגר
+chat_agents = {}
+memory_store.on_evict(lambda chat_id: chat_agents.pop(chat_id, None))
+
+def get_chat_agent(chat_id: int, user_message: str = ""):
+    """קבלת הסוכן של הצ'אט עם הכלים שנבחרו להודעה; יצירה מחדש אם הזיכרון או הכלים השתנו"""
+    memory = memory_store.get(chat_id)
+    selected_tools = tool_retriever.select(user_message) if user_message else agent_tools
+    cached = chat_agents.get(chat_id)
+    if (cached is None or cached.memory is not memory
+            or [tool.name for tool in cached.tools] != [tool.name for tool in selected_tools]):
+        cached = create_agent(memory, selected_tools)
+        chat_agents[chat_id] = cached
+    return cached
+
+def run_agent(agent: AgentExecutor, user_message: str,
+              callbacks: Optional[List[BaseCallbackHandler]] = None) -> Tuple[str, List[str]]:
+    """הרצת הסוכן על הודעה אחת (callbacks - למשל הזרמה לטלגרם)
+
+    Returns:
+        התשובה הסופית, והפלטים המלאים של כלים שהמודל קיבל מקוצרים
+    """
+    metrics = message_metrics("agent")
+    with metrics.track(), token_budget.collect() as full_outputs:
+        result = agent.invoke({"input": user_message}, config={"callbacks": [*(callbacks or []), metrics]})
+    token_budget.trim_memory(agent.memory)
+    if plan_cache is not None:
+        plan_cache.record(user_message, result.get("intermediate_steps", []), result["output"], full_outputs)
+    return result["output"], full_outputs
+
+async def send_full_outputs(bot, chat_id: int, full_outputs: List[str]) -> None:
+    """שליחת הפלטים המלאים של הכלים שהסוכן קיבל מקוצרים"""
+    for output in full_outputs:
+        for part in split_message(output):
+            await bot.send_message(chat_id=chat_id, text=part)
+
+# הרצת הסוכן במאגר תהליכונים - הודעות מאותו צ'אט לפי הסדר, צ'אטים שונים במקביל
+agent_runner = ChatAgentRunner(
+    max_workers=config['AGENT_MAX_WORKERS'],
+    max_concurrent=config['AGENT_MAX_CONCURRENT']
+)
 
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle incoming photos."""
@@ -1711,25 +1527,12 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             )
             
             # Get product list using product handler
-            products = product_handler.list_products(10)
+            products = await async_product_handler.list_products(10, fields=PRODUCT_LIST_FIELDS)
             if not products:
                 raise Exception("לא נמצאו מוצרים בחנות")
                 
             # Format product list
-            products_text = []
-            for p in products:
-                product_line = f"- {p['name']}: ₪{p.get('price', 'לא זמין')}"
-                
-                # Add stock information
-                if p.get('manage_stock'):
-                    stock = p.get('stock_quantity', 0)
-                    status = "במלאי" if stock > 0 else "אזל מהמלאי"
-                    product_line += f" | {status} ({stock} יחידות)"
-                else:
-                    status = "במלאי" if p.get('in_stock', True) else "אזל מהמלאי"
-                    product_line += f" | {status}"
-                    
-                products_text.append(product_line)
+            products_text = format_product_lines(products)
             
             # Show product list and ask which product this is for
             await update.message.reply_text(
@@ -1780,6 +1583,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         f"New message from {update.message.from_user.first_name} "
         f"(ID: {chat_id}): {user_message}"
     )
+    streamer = None
 
     try:
         # Check if we have a pending photo to attach
@@ -1793,59 +1597,28 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             logger.info("Sent processing message")
 
             try:
-                # First verify the product exists
-                auth_params = {
-                    'consumer_key': os.getenv('WC_CONSUMER_KEY'),
-                    'consumer_secret': os.getenv('WC_CONSUMER_SECRET')
-                }
-                
-                # Clean up and normalize the product name
-                clean_name = user_message.strip()
-                # Remove any extra whitespace
-                clean_name = ' '.join(clean_name.split())
-                logger.debug(f"Searching for product with normalized name: {clean_name}")
-                
-                # First try exact match
-                search_response = requests.get(
-                    f"{config['WP_URL']}/wp-json/wc/v3/products",
-                    params={**auth_params, "search": clean_name},
-                    verify=False
-                )
-                search_response.raise_for_status()
-                products = search_response.json()
-                
-                # If no exact match, try case-insensitive search
-                if not products:
-                    logger.debug("No exact match found, trying case-insensitive search")
-                    all_products_response = requests.get(
-                        f"{config['WP_URL']}/wp-json/wc/v3/products",
-                        params={**auth_params, "per_page": 100},
-                        verify=False
-                    )
-                    all_products_response.raise_for_status()
-                    all_products = all_products_response.json()
-                    
-                    # Try to find a case-insensitive match
-                    products = [p for p in all_products if p['name'].lower() == clean_name.lower()]
-                    
-                    if not products:
-                        # Try partial match
-                        products = [p for p in all_products if clean_name.lower() in p['name'].lower()]
+                # First verify the product exists (local fuzzy name index, Hebrew-aware)
+                logger.debug(f"Searching for product with name: {user_message.strip()}")
+                product, candidates = await async_product_handler.resolve_product(user_message)
                 
-                if not products:
+                if product is None:
                     await context.bot.delete_message(
                         chat_id=chat_id,
                         message_id=processing_message.message_id
                     )
+                    if candidates:
+                        # Only a close match - ask for the exact name instead of attaching to another product
+                        await update.message.reply_text(unresolved_product_message(user_message, candidates))
+                        return
                     await update.message.reply_text(
                         f"לא נמצא מוצר בשם '{user_message}'.\n"
                         "אנא בחר את השם המדויק מהרשימה:\n\n"
-                        f"{list_products()}"
+                        f"{format_product_list(await async_product_handler.list_all_products(fields=PRODUCT_LIST_FIELDS))}"
                     )
                     return
 
-                product_id = products[0]["id"]
-                product_name = products[0]["name"]
+                product_id = product["id"]
+                product_name = product["name"]
                 logger.debug(f"Found product ID: {product_id} for '{product_name}'")
                 
                 try:
@@ -1853,7 +1626,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                     logger.debug("Attaching photo to product")
                     
                     # Set the image directly using base64
-                    updated_product = media_handler.set_product_image(product_id, context.user_data['temp_photos'][-1])
+                    updated_product = await async_media_handler.set_product_image(product_id, context.user_data['temp_photos'][-1])
                     
                     # Clear the temporary photo storage
                     context.user_data.pop('temp_photos', None)
@@ -1930,6 +1703,27 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 context.user_data.pop('temp_photos', None)
                 return
 
+        # Common unambiguous commands go straight to their tool (no LLM round trips)
+        intent = intent_router.match(user_message) if intent_router is not None else None
+        if intent is not None:
+            user_logger.info(f"Routed message to {intent.tool} without the agent (intent: {intent.intent})")
+            await context.bot.send_chat_action(chat_id=chat_id, action="typing")
+            response = await agent_runner.run(chat_id, run_routed_intent, chat_id, user_message, intent)
+            # Full listings can exceed Telegram's message limit
+            for part in split_message(response):
+                await context.bot.send_message(chat_id=chat_id, text=part)
+            return
+
+        # Repeated read-only questions replay the tool plan the agent chose last time
+        plan = plan_cache.get(user_message) if plan_cache is not None else None
+        if plan is not None:
+            user_logger.info(f"Replaying cached plan {[call.tool for call in plan]} without the agent")
+            await context.bot.send_chat_action(chat_id=chat_id, action="typing")
+            response = await agent_runner.run(chat_id, run_cached_plan, chat_id, user_message, plan)
+            for part in split_message(response):
+                await context.bot.send_message(chat_id=chat_id, text=part)
+            return
+
         # Send intermediate message
         processing_message = await context.bot.send_message(
             chat_id=chat_id,
@@ -1940,9 +1734,26 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await context.bot.send_chat_action(chat_id=chat_id, action="typing")
         logger.debug("Sent typing action")
 
-        # Get response from agent
+        # Get response from agent (runs in the worker pool, not on the event loop)
         logger.debug("Getting response from agent")
-        response = agent.run(input=user_message)
+        agent = get_chat_agent(chat_id, user_message)
+        
+        if config['STREAM_RESPONSES']:
+            # Tokens and tool progress are written into the processing message as they arrive
+            streamer = TelegramMessageStreamer(
+                context.bot,
+                chat_id,
+                processing_message.message_id,
+                asyncio.get_running_loop(),
+                min_interval=config['STREAM_EDIT_INTERVAL']
+            )
+            response, full_outputs = await agent_runner.run(chat_id, run_agent, agent, user_message, [streamer])
+            logger.debug(f"Agent response: {response} ({streamer.edits} message edits)")
+            await streamer.finish(response)
+            await send_full_outputs(context.bot, chat_id, full_outputs)
+            return
+        
+        response, full_outputs = await agent_runner.run(chat_id, run_agent, agent, user_message)
         logger.debug(f"Agent response: {response}")
         
         # Delete processing message
@@ -1956,15 +1767,21 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             chat_id=chat_id,
             text=response
         )
+        await send_full_outputs(context.bot, chat_id, full_outputs)
             
     except Exception as e:
         error_logger.error(
             f"Error processing message: {str(e)}", 
             exc_info=True
         )
+        error_text = "מצטער, אירעה שגיאה בעיבוד הבקשה שלך. אנא נסה שוב."
+        if streamer is not None:
+            # Replace the partially streamed answer instead of leaving it under the error
+            await streamer.finish(error_text)
+            return
         await context.bot.send_message(
             chat_id=chat_id,
-            text="מצטער, אירעה שגיאה בעיבוד הבקשה שלך. אנא נסה שוב."
+            text=error_text
         )
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -2020,7 +1837,7 @@ async def test_image_upload(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
         # בדיקת חיבור ל-WooCommerce
         try:
-            test_product = media_handler.wcapi.get("products").json()
+            test_product = (await async_media_handler.wcapi.get("products")).json()
             await update.message.reply_text(f"חיבור ל-WooCommerce תקין, נמצאו {len(test_product)} מוצרים")
         except Exception as e:
             await update.message.reply_text(f"שגיאה בחיבור ל-WooCommerce: {str(e)}")
@@ -2057,24 +1874,16 @@ async def handle_product_choice(update: Update, context: ContextTypes.DEFAULT_TY
             return ConversationHandler.END
             
         # Search for the product
-        auth_params = {
-            'consumer_key': os.getenv('WC_CONSUMER_KEY'),
-            'consumer_secret': os.getenv('WC_CONSUMER_SECRET')
-        }
-        
-        search_response = requests.get(
-            f"{config['WP_URL']}/wp-json/wc/v3/products",
-            params={**auth_params, "search": product_name},
-            verify=False
-        )
-        search_response.raise_for_status()
-        products = search_response.json()
+        product, candidates = await async_product_handler.resolve_product(product_name)
         
-        if not products:
+        if product is None:
+            if candidates:
+                # Keep the photo and let the user answer with the exact name
+                await update.message.reply_text(unresolved_product_message(product_name, candidates))
+                return CHOOSING_PRODUCT
             await update.message.reply_text(f"לא נמצא מוצר בשם {product_name}")
             return ConversationHandler.END
             
-        product = products[0]
         product_id = product["id"]
         
         # Upload the image
@@ -2083,7 +1892,7 @@ async def handle_product_choice(update: Update, context: ContextTypes.DEFAULT_TY
                 product_id,
                 context.user_data['temp_photo_path']
             )
-            await update.message.reply_text(f"התמונה הועלתה בהצלחה למוצר {product_name}")
+            await update.message.reply_text(f"התמונה הועלתה בהצלחה למוצר {product['name']}")
         except Exception as e:
             logger.error(f"Error uploading image: {e}")
             await update.message.reply_text(f"שגיאה בהעלאת התמונה: {str(e)}")
@@ -2190,7 +1999,14 @@ def main() -> None:
         
         # Create the Application
         logger.info("Creating Telegram application...")
-        application = Application.builder().token(os.getenv('TELEGRAM_BOT_TOKEN')).build()
+        application = (
+            Application.builder()
+            .token(os.getenv('TELEGRAM_BOT_TOKEN'))
+            .post_init(init_async_handlers)
+            .post_shutdown(close_async_handlers)
+            .concurrent_updates(config['BOT_CONCURRENT_UPDATES'])
+            .build()
+        )
         
         # Add handlers
         logger.info("Adding message handlers...")
@@ -5,5 +5,15 @@ Contains utility functions and configuration management.
 
 from .logger import setup_logger
 from .config import load_config
+from .agent_runner import ChatAgentRunner
+from .memory_store import ChatMemoryStore
+from .intent_router import IntentRouter
+from .message_streamer import TelegramMessageStreamer
+from .token_budget import TokenBudget
+from .tool_retriever import ToolRetriever
+from .plan_cache import PlanCache
+from .agent_metrics import MetricsRegistry, AgentMetricsCallback
 
-__all__ = ['setup_logger', 'load_config'] 
\ No newline at end of file
+__all__ = ['setup_logger', 'load_config', 'ChatAgentRunner', 'ChatMemoryStore', 'IntentRouter',
+           'TelegramMessageStreamer', 'TokenBudget', 'ToolRetriever', 'PlanCache',
+           'MetricsRegistry', 'AgentMetricsCallback'] 
\ No newline at end of file
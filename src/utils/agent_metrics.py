@@ -0,0 +1,262 @@
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# המדידה של ההודעה שרצה כרגע ב-context הזה (תהליכון הסוכן וכל מה שהועתק ממנו)
+_active: contextvars.ContextVar[Optional["AgentMetricsCallback"]] = contextvars.ContextVar("agent_metrics", default=None)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class MetricsRegistry:
+    """מדדים בתוך התהליך: מונים והתפלגויות לפי שם (למשל "llm.seconds")
+
+    לכל התפלגות נשמרים count/sum/min/max מאז ההפעלה, והאחוזונים (p50/p95)
+    מחושבים על window הערכים האחרונים - כך רואים נסיגה בביצועים בלי שההיסטוריה
+    הישנה תטשטש אותה.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._counters: Dict[str, float] = {}
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        if not value:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = {"count": 0, "sum": 0.0, "min": value, "max": value,
+                             "recent": deque(maxlen=self.window)}
+                self._histograms[name] = histogram
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["min"] = min(histogram["min"], value)
+            histogram["max"] = max(histogram["max"], value)
+            histogram["recent"].append(value)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """כל המדדים: {"counters": {...}, "histograms": {name: {count, avg, p50, p95, ...}}}"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {name: dict(histogram, recent=list(histogram["recent"]))
+                          for name, histogram in self._histograms.items()}
+        result = {}
+        for name, histogram in histograms.items():
+            recent = histogram.pop("recent")
+            result[name] = {
+                "count": histogram["count"],
+                "sum": round(histogram["sum"], 3),
+                "avg": round(histogram["sum"] / histogram["count"], 3),
+                "min": round(histogram["min"], 3),
+                "max": round(histogram["max"], 3),
+                "p50": round(_percentile(recent, 0.5), 3),
+                "p95": round(_percentile(recent, 0.95), 3),
+            }
+        return {"counters": counters, "histograms": result}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def record_http_request(method: str, url: str, status: Optional[int], seconds: float) -> None:
+    """מאזין בקשות לשכבת התקשורת (add_request_listener): משייך את הבקשה להודעה ולכלי שרצים"""
+    metrics = _active.get()
+    if metrics is not None:
+        metrics.on_http_request(method, url, status, seconds)
+
+
+class AgentMetricsCallback(BaseCallbackHandler):
+    """מדידת הודעה אחת: זמני קריאות למודל, טוקנים, איטרציות, זמן וקריאות HTTP לכל כלי
+
+    נוצר לכל הודעה ומועבר ל-invoke של הסוכן (config callbacks) בתוך track().
+    בסוף ההודעה הסיכום נרשם ב-MetricsRegistry ונכתב כשורת JSON אחת ללוג
+    (אם הועבר), כך שאפשר לראות לאן הלכו השניות בכל בקשה. בקשות HTTP מגיעות
+    דרך record_http_request ומשויכות לכלי שרץ באותו רגע.
+    """
+
+    def __init__(self, registry: MetricsRegistry, path: str = "agent", log: Optional[logging.Logger] = None):
+        """
+        Args:
+            registry: המאגר שאליו נכנסים המדדים
+            path: איך ההודעה טופלה (agent / router / plan_cache)
+            log: לוגר לשורת JSON אחת לכל הודעה
+        """
+        self.registry = registry
+        self.path = path
+        self.log = log
+        self.started: Optional[float] = None
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.tools: List[Dict[str, Any]] = []
+        self.http_calls = 0
+        self.http_seconds = 0.0
+        self.http_errors = 0
+        self._llm_runs: Dict[UUID, float] = {}
+        self._tool_runs: Dict[UUID, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    # --- קריאות למודל ---
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs) -> None:
+        self._llm_runs[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs) -> None:
+        self._llm_runs[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        started = self._llm_runs.pop(run_id, None)
+        if started is None:
+            return
+        prompt_tokens, completion_tokens = self._token_usage(response)
+        self.llm_calls.append({"seconds": time.perf_counter() - started,
+                               "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        started = self._llm_runs.pop(run_id, None)
+        if started is not None:
+            self.llm_calls.append({"seconds": time.perf_counter() - started, "error": str(error)})
+
+    @staticmethod
+    def _token_usage(response):
+        """טוקנים מהתשובה: usage_metadata של ההודעה (גם בהזרמה), אחרת token_usage של OpenAI"""
+        for generations in response.generations or []:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    return usage.get("input_tokens"), usage.get("output_tokens")
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+    # --- כלים ---
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs) -> None:
+        with self._lock:
+            self._tool_runs[run_id] = {"tool": serialized.get("name", "tool"), "started": time.perf_counter(),
+                                       "http_calls": 0, "http_seconds": 0.0}
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs) -> None:
+        self._end_tool(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end_tool(run_id, error)
+
+    def _end_tool(self, run_id: UUID, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            run = self._tool_runs.pop(run_id, None)
+        if run is None:
+            return
+        record = {"tool": run["tool"], "seconds": time.perf_counter() - run["started"],
+                  "http_calls": run["http_calls"], "http_seconds": run["http_seconds"]}
+        if error is not None:
+            record["error"] = str(error)
+        self.tools.append(record)
+
+    # --- בקשות HTTP (מתוך record_http_request) ---
+
+    def on_http_request(self, method: str, url: str, status: Optional[int], seconds: float) -> None:
+        with self._lock:
+            self.http_calls += 1
+            self.http_seconds += seconds
+            if status is None or status >= 400:
+                self.http_errors += 1
+            # הכלים של הסוכן רצים אחד אחרי השני - הבקשה שייכת לכלי שרץ עכשיו
+            for run in self._tool_runs.values():
+                run["http_calls"] += 1
+                run["http_seconds"] += seconds
+
+    # --- הודעה ---
+
+    @contextmanager
+    def track(self) -> Iterator["AgentMetricsCallback"]:
+        """מדידת ההודעה: הזמן הכולל ובקשות ה-HTTP בתוך ה-context, ורישום הסיכום בסוף"""
+        self.started = time.perf_counter()
+        token = _active.set(self)
+        error = None
+        try:
+            yield self
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _active.reset(token)
+            self.finish(error)
+
+    def summary(self, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        def tokens(key: str) -> Optional[int]:
+            values = [call.get(key) for call in self.llm_calls if call.get(key) is not None]
+            return sum(values) if values else None
+
+        summary = {
+            "path": self.path,
+            "seconds": round(time.perf_counter() - self.started, 3) if self.started is not None else None,
+            "iterations": len(self.llm_calls),
+            "llm_seconds": round(sum(call["seconds"] for call in self.llm_calls), 3),
+            "llm_calls": [round(call["seconds"], 3) for call in self.llm_calls],
+            "prompt_tokens": tokens("prompt_tokens"),
+            "completion_tokens": tokens("completion_tokens"),
+            "tool_seconds": round(sum(tool["seconds"] for tool in self.tools), 3),
+            "tools": [dict(tool, seconds=round(tool["seconds"], 3), http_seconds=round(tool["http_seconds"], 3))
+                      for tool in self.tools],
+            "http_calls": self.http_calls,
+            "http_seconds": round(self.http_seconds, 3),
+            "http_errors": self.http_errors,
+        }
+        if error is not None:
+            summary["error"] = type(error).__name__
+        return summary
+
+    def finish(self, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        """רישום ההודעה במאגר ובלוג; מחזיר את הסיכום"""
+        summary = self.summary(error)
+        registry = self.registry
+        registry.increment(f"messages.{self.path}")
+        if error is not None:
+            registry.increment(f"messages.{self.path}.errors")
+        if summary["seconds"] is not None:
+            registry.observe("message.seconds", summary["seconds"])
+            registry.observe(f"message.{self.path}.seconds", summary["seconds"])
+        registry.observe("message.http_calls", self.http_calls)
+        if self.llm_calls:
+            registry.observe("agent.iterations", len(self.llm_calls))
+        for call in self.llm_calls:
+            registry.observe("llm.seconds", call["seconds"])
+            if call.get("prompt_tokens") is not None:
+                registry.observe("llm.prompt_tokens", call["prompt_tokens"])
+            if call.get("completion_tokens") is not None:
+                registry.observe("llm.completion_tokens", call["completion_tokens"])
+            if "error" in call:
+                registry.increment("llm.errors")
+        for tool in self.tools:
+            registry.observe(f"tool.{tool['tool']}.seconds", tool["seconds"])
+            registry.observe(f"tool.{tool['tool']}.http_calls", tool["http_calls"])
+            if "error" in tool:
+                registry.increment(f"tool.{tool['tool']}.errors")
+        registry.increment("http.requests", self.http_calls)
+        registry.increment("http.errors", self.http_errors)
+        registry.observe("message.http_seconds", self.http_seconds)
+        if self.log is not None:
+            self.log.info(json.dumps(summary, ensure_ascii=False))
+        logger.debug(f"Message metrics: {summary['seconds']}s, {summary['iterations']} LLM calls, "
+                     f"{len(self.tools)} tools, {self.http_calls} HTTP calls")
+        return summary
@@ -0,0 +1,61 @@
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+class ChatAgentRunner:
+    """הרצת הסוכן מחוץ ללולאת האירועים עם סדר הודעות לכל צ'אט ותקרת מקביליות גלובלית
+
+    הודעות מאותו צ'אט מבוצעות אחת אחרי השנייה לפי סדר ההגעה, בעוד שצ'אטים
+    שונים רצים במקביל על מאגר תהליכונים חסום בגודלו.
+    """
+
+    def __init__(self, max_workers: int = 4, max_concurrent: Optional[int] = None):
+        """
+        Args:
+            max_workers: מספר התהליכונים במאגר שמריץ את הסוכן
+            max_concurrent: מספר מקסימלי של הרצות במקביל (ברירת מחדל: max_workers)
+        """
+        self.max_workers = max_workers
+        self.max_concurrent = max_concurrent or max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._chat_locks: Dict[Hashable, asyncio.Lock] = {}
+        self._pending: Dict[Hashable, int] = {}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # נוצר בעצלות כדי להיקשר ללולאת האירועים הפעילה
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    async def run(self, chat_id: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """הרצת func במאגר התהליכונים בתור של הצ'אט הנתון"""
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        self._pending[chat_id] = self._pending.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                async with self._get_semaphore():
+                    loop = asyncio.get_running_loop()
+                    # העברת ה-context הנוכחי לתהליכון (למשל לצורך לוגים ומדדים)
+                    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+                    logger.debug(f"Running agent task for chat {chat_id}")
+                    return await loop.run_in_executor(self.executor, call)
+        finally:
+            self._pending[chat_id] -= 1
+            if not self._pending[chat_id]:
+                # אין הודעות ממתינות לצ'אט - שחרור המנעול שלו
+                del self._pending[chat_id]
+                self._chat_locks.pop(chat_id, None)
+
+    def active_chats(self) -> int:
+        """מספר הצ'אטים שיש להם הודעות בעיבוד או בהמתנה"""
+        return len(self._pending)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """עצירת מאגר התהליכונים"""
+        self.executor.shutdown(wait=wait)
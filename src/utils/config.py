@@ -36,5 +36,78 @@ def load_config() -> Dict[str, Any]:
         'WC_CONSUMER_KEY': os.getenv('WC_CONSUMER_KEY'),
         'WC_CONSUMER_SECRET': os.getenv('WC_CONSUMER_SECRET'),
         'OPENAI_API_KEY': os.getenv('OPENAI_API_KEY'),
-        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'INFO')
-    } 
\ No newline at end of file
+        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'INFO'),
+        
+        # WooCommerce transport settings
+        'WC_POOL_SIZE': int(os.getenv('WC_POOL_SIZE', '10')),
+        'WC_TIMEOUT': float(os.getenv('WC_TIMEOUT', '30')),
+        'WC_ENDPOINT_TIMEOUTS': os.getenv('WC_ENDPOINT_TIMEOUTS', ''),
+        'WC_VERIFY_SSL': os.getenv('WC_VERIFY_SSL', 'true').lower() != 'false',
+        'WC_PAGE_WORKERS': int(os.getenv('WC_PAGE_WORKERS', '4')),
+        'WC_COALESCE_GETS': os.getenv('WC_COALESCE_GETS', 'true').lower() != 'false',
+        'WC_JSON_BACKEND': os.getenv('WC_JSON_BACKEND', 'auto'),
+        
+        # Store API rate limiting and retries
+        'WC_RATE_LIMIT': float(os.getenv('WC_RATE_LIMIT', '10')),
+        'WC_RATE_BURST': float(os.getenv('WC_RATE_BURST', '0')) or None,
+        'WC_MAX_CONCURRENCY': int(os.getenv('WC_MAX_CONCURRENCY', '0')),
+        'WC_MAX_RETRIES': int(os.getenv('WC_MAX_RETRIES', '3')),
+        'WC_RETRY_BACKOFF': float(os.getenv('WC_RETRY_BACKOFF', '0.5')),
+        
+        # Per-endpoint circuit breaker
+        'CIRCUIT_FAILURE_THRESHOLD': int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),
+        'CIRCUIT_RESET_TIMEOUT': float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30')),
+        'CIRCUIT_FALLBACK_SIZE': int(os.getenv('CIRCUIT_FALLBACK_SIZE', '128')),
+        
+        # Product cache settings
+        'PRODUCT_CACHE_TTL': float(os.getenv('PRODUCT_CACHE_TTL', '300')),
+        'PRODUCT_CACHE_SIZE': int(os.getenv('PRODUCT_CACHE_SIZE', '1000')),
+        'PRODUCT_INDEX_TTL': float(os.getenv('PRODUCT_INDEX_TTL', '600')),
+        'PRODUCT_MATCH_STRICT_SCORE': float(os.getenv('PRODUCT_MATCH_STRICT_SCORE', '0.85')),
+        'CATEGORY_TREE_TTL': float(os.getenv('CATEGORY_TREE_TTL', '300')),
+        
+        # Store mirror settings (SQLite; empty path disables the mirror)
+        'STORE_MIRROR_PATH': os.getenv('STORE_MIRROR_PATH') or None,
+        'STORE_MIRROR_MAX_AGE': float(os.getenv('STORE_MIRROR_MAX_AGE', '900')),
+        'SYNC_INTERVAL': float(os.getenv('SYNC_INTERVAL', '60')),
+        'SYNC_RECONCILE_INTERVAL': float(os.getenv('SYNC_RECONCILE_INTERVAL', '3600')),
+        
+        # Webhook receiver settings (disabled unless a secret is set)
+        'WEBHOOK_SECRET': os.getenv('WEBHOOK_SECRET') or None,
+        'WEBHOOK_HOST': os.getenv('WEBHOOK_HOST', '127.0.0.1'),
+        'WEBHOOK_PORT': int(os.getenv('WEBHOOK_PORT', '8085')),
+        'WEBHOOK_PATH': os.getenv('WEBHOOK_PATH', '/woocommerce/webhook'),
+        
+        # Customer stats settings
+        'CUSTOMER_STATS_TTL': float(os.getenv('CUSTOMER_STATS_TTL', '60')),
+        
+        # Concurrency settings
+        'AGENT_MAX_WORKERS': int(os.getenv('AGENT_MAX_WORKERS', '4')),
+        'AGENT_MAX_CONCURRENT': int(os.getenv('AGENT_MAX_CONCURRENT', '0')) or None,
+        'BOT_CONCURRENT_UPDATES': int(os.getenv('BOT_CONCURRENT_UPDATES', '32')),
+        
+        # Deterministic intent routing in front of the agent
+        'INTENT_ROUTER_ENABLED': os.getenv('INTENT_ROUTER_ENABLED', 'true').lower() != 'false',
+        
+        # Streaming agent answers into the placeholder message
+        'STREAM_RESPONSES': os.getenv('STREAM_RESPONSES', 'true').lower() != 'false',
+        'STREAM_EDIT_INTERVAL': float(os.getenv('STREAM_EDIT_INTERVAL', '1.0')),
+        
+        # Token budget for tool outputs, the agent scratchpad and conversation memory (0 disables)
+        'TOOL_OUTPUT_MAX_TOKENS': int(os.getenv('TOOL_OUTPUT_MAX_TOKENS', '400')),
+        'AGENT_SCRATCHPAD_MAX_TOKENS': int(os.getenv('AGENT_SCRATCHPAD_MAX_TOKENS', '3000')),
+        'MEMORY_MAX_TOKENS': int(os.getenv('MEMORY_MAX_TOKENS', '2000')),
+        
+        # Tools sent to the model per message (0 sends all of them)
+        'TOOL_RETRIEVER_TOP_K': int(os.getenv('TOOL_RETRIEVER_TOP_K', '8')),
+        
+        # Cached tool plans for repeated read-only questions
+        'PLAN_CACHE_ENABLED': os.getenv('PLAN_CACHE_ENABLED', 'true').lower() != 'false',
+        'PLAN_CACHE_SIZE': int(os.getenv('PLAN_CACHE_SIZE', '256')),
+        'PLAN_CACHE_PATH': os.getenv('PLAN_CACHE_PATH') or None,
+        
+        # Conversation memory settings
+        'MEMORY_MAX_CHATS': int(os.getenv('MEMORY_MAX_CHATS', '100')),
+        'MEMORY_IDLE_TTL': float(os.getenv('MEMORY_IDLE_TTL', '3600')),
+        'MEMORY_SPILL_DIR': os.getenv('MEMORY_SPILL_DIR') or None
+    }
\ No newline at end of file
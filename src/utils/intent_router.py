@@ -0,0 +1,175 @@
+import re
+import logging
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Pattern
+
+logger = logging.getLogger(__name__)
+
+# ניקוד וטעמים
+_NIQQUD = re.compile(r"[֑-ׇ]")
+# סימני פיסוק בסוף ההודעה ורווחים כפולים
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,:;…]+$")
+_SPACES = re.compile(r"\s+")
+
+# פתיחות וסיומות מנומסות שלא משנות את הבקשה
+_POLITE_PREFIX = (
+    r"(?:(?:בבקשה|אפשר|תוכל|תוכלי|אני רוצה|אני צריך|אני צריכה|רציתי|תן לי|תני לי|"
+    r"בוא נראה|תראה לי|תראי לי|תציג לי|תציגי לי|הצג לי|הראה לי)\s+)*"
+)
+_POLITE_SUFFIX = r"(?:\s+(?:בבקשה|תודה|עכשיו))*"
+
+# פעלי הצגה (בלי "לי", שנבלע בפתיחה המנומסת)
+_SHOW = r"(?:(?:הצג|תציג|תציגי|הציגו|הראה|תראה|תראי|הצגת|רשום|תרשום|מה|אילו|איזה)\s+)?"
+_ALL = r"(?:(?:את|כל|לי)\s+)*"
+_LIST_OF = r"(?:(?:רשימת|רשימה של|רשימה|את כל)\s+)?"
+
+# סטטוסים של הזמנות בעברית -> הסטטוס ב-WooCommerce
+ORDER_STATUSES = {
+    "ממתינות לתשלום": "pending",
+    "ממתין לתשלום": "pending",
+    "ממתינות": "pending",
+    "בטיפול": "processing",
+    "בעיבוד": "processing",
+    "בהמתנה": "on-hold",
+    "שהושלמו": "completed",
+    "הושלמו": "completed",
+    "שבוטלו": "cancelled",
+    "בוטלו": "cancelled",
+    "שזוכו": "refunded",
+    "זוכו": "refunded",
+    "שנכשלו": "failed",
+    "נכשלו": "failed",
+}
+_ORDER_STATUS = "|".join(sorted(map(re.escape, ORDER_STATUSES), key=len, reverse=True))
+
+# פעלים שמסמנים הוראה נוספת אחרי שם המוצר ("...ותעדכן ל-5", "...ותמחק אותו")
+_INSTRUCTION_VERBS = (
+    r"תעדכן|עדכן|תמחק|מחק|תשנה|שנה|תוסיף|הוסף|תוריד|הורד|תעלה|העלה|תסיר|הסר|תצור|צור|"
+    r"תגדיר|הגדר|תקבע|קבע|תשייך|שייך|תציג|הצג|תראה|הראה|תבטל|בטל"
+)
+# שם מוצר הוא שאר ההודעה - אבל לא "כל המוצרים", ולא שם שנמשך לפסוקית או להוראה נוספת
+_NOT_A_NAME = (
+    rf"(?:כל\b|.*(?:,|\s(?:ו)?(?:{_INSTRUCTION_VERBS})(?:\s|$)|\sו(?:גם|אז|ת\S+)(?:\s|$)|"
+    rf"\s(?:אותו|אותה|אותם|אותן)(?:\s|$)))"
+)
+_PRODUCT_NAME = rf"(?P<name>(?!{_NOT_A_NAME})\S.*?)"
+
+
+class IntentRule(NamedTuple):
+    """כלל ניתוב: תבנית שחייבת להתאים להודעה כולה, והכלי שמקבל את הארגומנט שחולץ"""
+    intent: str
+    tool: str
+    pattern: Pattern
+    argument: Optional[Callable[[re.Match], str]] = None
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    tool: str
+    argument: Optional[str]
+
+
+def _rule(intent: str, tool: str, body: str, argument: Optional[Callable[[re.Match], str]] = None) -> IntentRule:
+    return IntentRule(intent, tool, re.compile(f"^{_POLITE_PREFIX}(?:{body}){_POLITE_SUFFIX}$"), argument)
+
+
+DEFAULT_RULES: List[IntentRule] = [
+    _rule("list_products", "list_products",
+          rf"{_SHOW}{_ALL}{_LIST_OF}(?:ה)?מוצרים(?:\s+(?:בחנות|שלי|שיש|שיש בחנות|בחנות שלי|יש לי))?"),
+    _rule("low_stock", "get_low_stock_products",
+          rf"{_SHOW}{_ALL}(?:(?:ה)?מוצרים\s+(?:עם|ב|שב|שהם ב)?\s*)?(?:ה)?מלאי\s+(?:ה)?נמוך|"
+          rf"{_SHOW}{_ALL}(?:ה)?מוצרים\s+ש?(?:(?:עומדים|כמעט)\s+)?(?:נגמרים|להיגמר|אוזלים|לאזול|נגמרו)"),
+    _rule("order_details", "get_order_details",
+          rf"{_SHOW}{_ALL}(?:(?:פרטי|פרטים על|פרטים של|מה עם|מה המצב של|סטטוס של)\s+)?(?:ה)?הזמנה\s+"
+          rf"(?:(?:מספר|מס)\s+)?(?P<order_id>\d+)",
+          lambda m: m.group("order_id")),
+    _rule("list_orders", "list_orders",
+          rf"{_SHOW}{_ALL}{_LIST_OF}(?:ה)?הזמנות(?:\s+(?:ה|בסטטוס\s+)?(?P<status>{_ORDER_STATUS}))?",
+          lambda m: ORDER_STATUSES[m.group("status")] if m.group("status") else ""),
+    _rule("list_coupons", "list_coupons",
+          rf"{_SHOW}{_ALL}{_LIST_OF}(?:ה)?(?:קופונים|קודי\s+(?:ה)?הנחה|קודי\s+קופון)(?:\s+(?:בחנות|שלי|הפעילים))?"),
+    _rule("list_categories", "list_categories",
+          rf"{_SHOW}{_ALL}{_LIST_OF}(?:ה)?קטגוריות(?:\s+(?:בחנות|שלי))?"),
+    _rule("list_customers", "list_customers",
+          rf"{_SHOW}{_ALL}{_LIST_OF}(?:ה)?לקוחות(?:\s+(?:בחנות|שלי))?"),
+    _rule("sales", "get_sales",
+          rf"{_SHOW}{_ALL}(?:(?:נתוני|סך|סך כל|סיכום)\s+)?(?:ה)?מכירות|כמה\s+מכרתי|כמה\s+מכרנו"),
+    _rule("product_stock", "get_product_stock_status",
+          rf"{_SHOW}{_ALL}(?:(?:מה|כמה)\s+)?(?:ה)?מלאי\s+(?:של|ל|עבור)\s*(?:ה)?(?:מוצר\s+)?{_PRODUCT_NAME}",
+          lambda m: m.group("name")),
+    _rule("product_details", "get_product_details",
+          rf"{_SHOW}{_ALL}(?:פרטי|פרטים על|פרטים של|מידע על)\s+(?:ה)?מוצר\s+{_PRODUCT_NAME}",
+          lambda m: m.group("name")),
+]
+
+
+# הודעות שנראות כמו פקודה אבל חייבות להגיע לסוכן (בקשה מורכבת או לא חד-משמעית)
+UNROUTED_EXAMPLES = (
+    "מה המלאי של חולצה כחולה ותעדכן ל 5",
+    "מה המלאי של חולצה כחולה, תעדכן ל-5",
+    "מה המלאי של חולצה כחולה עדכן ל 5",
+    "פרטי מוצר חולצה ותמחק אותו",
+    "פרטי מוצר חולצה כחולה ואז תוריד את המחיר",
+    "מה המלאי של כל המוצרים",
+    "הצג מוצרים והורד מחיר לחולצה",
+)
+
+
+def normalize_message(text: str) -> str:
+    """ניקוי הודעה לפני התאמה: ניקוד, פיסוק בסוף, # לפני מספרים ורווחים כפולים"""
+    text = _NIQQUD.sub("", text or "")
+    text = text.replace("#", " ")
+    text = _TRAILING_PUNCTUATION.sub("", text.strip())
+    return _SPACES.sub(" ", text).strip()
+
+
+class IntentRouter:
+    """ניתוב פקודות נפוצות ישירות לכלים, בלי לעבור דרך הסוכן (LLM)
+
+    כל כלל הוא תבנית שחייבת להתאים להודעה כולה (אחרי ניקוי), כך שרק
+    בקשה חד-משמעית כמו "הצג הזמנות בטיפול" או "הזמנה 1234" מנותבת; כל
+    הודעה שיש בה משהו מעבר לפקודה ("הצג מוצרים והורד מחיר...") ממשיכה
+    לסוכן כרגיל. הכלים הם אותן פונקציות שהסוכן מקבל.
+    """
+
+    def __init__(self, tools: Dict[str, Callable], rules: Optional[Iterable[IntentRule]] = None):
+        """
+        Args:
+            tools: שם כלי -> הפונקציה שלו
+            rules: כללי הניתוב (ברירת מחדל: DEFAULT_RULES); כללים לכלים שלא קיימים מושמטים
+        """
+        self.tools = dict(tools)
+        self.rules = [rule for rule in (rules if rules is not None else DEFAULT_RULES) if rule.tool in self.tools]
+        self.routed = 0
+        self.passed = 0
+        for example in UNROUTED_EXAMPLES:
+            misrouted = self._match_rule(normalize_message(example))
+            if misrouted is not None:
+                logger.warning(f"Intent rule {misrouted[0].intent} captures a message meant for the agent: {example!r}")
+
+    def match(self, text: str) -> Optional[IntentMatch]:
+        """הכלל הראשון שמתאים להודעה כולה, או None - ואז ההודעה הולכת לסוכן"""
+        matched = self._match_rule(normalize_message(text))
+        if matched is None:
+            self.passed += 1
+            return None
+        rule, found = matched
+        argument = rule.argument(found).strip() if rule.argument else None
+        self.routed += 1
+        logger.debug(f"Routed message to {rule.tool} (intent={rule.intent}, argument={argument!r})")
+        return IntentMatch(rule.intent, rule.tool, argument)
+
+    def _match_rule(self, message: str):
+        """הכלל הראשון שמתאים להודעה המנוקה, יחד עם ההתאמה"""
+        if message:
+            for rule in self.rules:
+                found = rule.pattern.match(message)
+                if found:
+                    return rule, found
+        return None
+
+    def dispatch(self, match: IntentMatch) -> str:
+        """הרצת הכלי עם הארגומנט שחולץ"""
+        func = self.tools[match.tool]
+        if match.argument is None:
+            return func()
+        return func(match.argument)
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional
+
+from langchain.schema import messages_from_dict, messages_to_dict
+
+logger = logging.getLogger(__name__)
+
+class ChatMemoryStore:
+    """מאגר זיכרון שיחה נפרד לכל צ'אט עם פינוי LRU ותפוגה לפי זמן חוסר פעילות
+
+    כשמספר השיחות החיות עובר את max_chats, השיחה שלא נגעו בה הכי הרבה זמן
+    מפונה. אם הוגדרה spill_dir, השיחה המפונה נשמרת לדיסק ונטענת בחזרה בפנייה
+    הבאה מאותו צ'אט. שיחה שלא הייתה פעילה יותר מ-idle_ttl שניות נמחקת.
+    """
+
+    def __init__(self, memory_factory: Callable[[], Any], max_chats: int = 100,
+                 idle_ttl: float = 3600, spill_dir: Optional[str] = None):
+        """
+        Args:
+            memory_factory: פונקציה שיוצרת אובייקט זיכרון חדש של LangChain
+            max_chats: מספר מקסימלי של שיחות חיות בזיכרון
+            idle_ttl: זמן חוסר פעילות (בשניות) שאחריו שיחה נמחקת
+            spill_dir: תיקייה לשמירת שיחות מפונות (אופציונלי)
+        """
+        self.memory_factory = memory_factory
+        self.max_chats = max_chats
+        self.idle_ttl = idle_ttl
+        self.spill_dir = spill_dir
+        self._entries: "OrderedDict[Hashable, List]" = OrderedDict()  # chat_id -> [memory, last_used]
+        self._evict_callbacks: List[Callable[[Hashable], None]] = []
+        self._lock = threading.RLock()
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def on_evict(self, callback: Callable[[Hashable], None]) -> None:
+        """רישום פונקציה שתיקרא כששיחה מפונה מהזיכרון (למשל לשחרור סוכן הצ'אט)"""
+        self._evict_callbacks.append(callback)
+
+    def get(self, chat_id: Hashable) -> Any:
+        """קבלת הזיכרון של הצ'אט, יצירה או טעינה מהדיסק במידת הצורך"""
+        with self._lock:
+            now = time.monotonic()
+            self.evict_expired(now)
+
+            entry = self._entries.get(chat_id)
+            if entry is None:
+                memory = self._load(chat_id) or self.memory_factory()
+                entry = [memory, now]
+                self._entries[chat_id] = entry
+                while len(self._entries) > self.max_chats:
+                    old_id, (old_memory, _) = self._entries.popitem(last=False)
+                    logger.debug(f"Evicting conversation {old_id} (LRU cap {self.max_chats})")
+                    self._spill(old_id, old_memory)
+                    self._notify_evicted(old_id)
+            else:
+                entry[1] = now
+                self._entries.move_to_end(chat_id)
+            return entry[0]
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """מחיקת שיחות שלא היו פעילות יותר מ-idle_ttl שניות"""
+        with self._lock:
+            now = now if now is not None else time.monotonic()
+            expired = [chat_id for chat_id, (_, last_used) in self._entries.items()
+                       if now - last_used > self.idle_ttl]
+            for chat_id in expired:
+                logger.debug(f"Conversation {chat_id} expired after {self.idle_ttl}s idle")
+                del self._entries[chat_id]
+                self._notify_evicted(chat_id)
+            return len(expired)
+
+    def clear(self, chat_id: Hashable) -> None:
+        """מחיקת היסטוריית השיחה של צ'אט (בזיכרון ובדיסק)"""
+        with self._lock:
+            if self._entries.pop(chat_id, None) is not None:
+                self._notify_evicted(chat_id)
+            path = self._spill_path(chat_id)
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, chat_id: Hashable) -> bool:
+        return chat_id in self._entries
+
+    def _notify_evicted(self, chat_id: Hashable) -> None:
+        for callback in self._evict_callbacks:
+            try:
+                callback(chat_id)
+            except Exception as e:
+                logger.error(f"Error in eviction callback for chat {chat_id}: {e}")
+
+    def _spill_path(self, chat_id: Hashable) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        return os.path.join(self.spill_dir, f"chat_{chat_id}.json")
+
+    def _spill(self, chat_id: Hashable, memory: Any) -> None:
+        path = self._spill_path(chat_id)
+        if not path:
+            return
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "saved_at": time.time(),
+                    "messages": messages_to_dict(memory.chat_memory.messages)
+                }, f, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Error spilling conversation {chat_id} to disk: {e}")
+
+    def _load(self, chat_id: Hashable) -> Optional[Any]:
+        path = self._spill_path(chat_id)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            os.remove(path)
+            if time.time() - data.get("saved_at", 0) > self.idle_ttl:
+                return None
+            memory = self.memory_factory()
+            memory.chat_memory.messages = messages_from_dict(data.get("messages", []))
+            logger.debug(f"Restored conversation {chat_id} from disk")
+            return memory
+        except Exception as e:
+            logger.error(f"Error loading conversation {chat_id} from disk: {e}")
+            return None
@@ -0,0 +1,167 @@
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+from langchain.callbacks.base import BaseCallbackHandler
+from telegram.error import BadRequest, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# אורך הודעה מקסימלי בטלגרם
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# סמן שמוצג בסוף הטקסט כל עוד התשובה נכתבת
+CURSOR = " ▌"
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """חלוקת טקסט ארוך להודעות בגודל המותר, עדיף בסוף שורה"""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    parts.append(text)
+    return parts
+
+
+class TelegramMessageStreamer(BaseCallbackHandler):
+    """הזרמת תשובת הסוכן להודעת "מעבד..." בטלגרם בעריכות חוזרות
+
+    ה-callbacks של LangChain נקראים בתהליכון של הסוכן (ChatAgentRunner):
+    כל טוקן של המודל וכל כלי שמתחיל לרוץ מעדכנים את הטקסט, והעריכה עצמה
+    מתוזמנת על לולאת האירועים של הבוט (run_coroutine_threadsafe). העריכות
+    מוגבלות לאחת לכל min_interval שניות; בינתיים נשמר רק הטקסט האחרון, כך
+    שעשרות טוקנים מתאחדים לעריכה אחת. בסוף finish מחליף את ההודעה בתשובה
+    הסופית - בלי למחוק אותה ולשלוח חדשה.
+    """
+
+    def __init__(self, bot, chat_id: int, message_id: int, loop: asyncio.AbstractEventLoop,
+                 min_interval: float = 1.0):
+        """
+        Args:
+            bot: הבוט של טלגרם (context.bot)
+            chat_id, message_id: ההודעה שנערכת
+            loop: לולאת האירועים של הבוט
+            min_interval: זמן מינימלי בשניות בין עריכות של ההודעה
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.loop = loop
+        self.min_interval = min_interval
+        self.edits = 0
+        self._progress: List[str] = []
+        self._answer = ""
+        self._sent = ""
+        self._last_edit = 0.0
+        self._pending: Optional[Future] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    # --- callbacks (תהליכון הסוכן) ---
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs) -> None:
+        # קריאה חדשה למודל - טקסט של שלב קודם (לפני קריאה לכלים) כבר לא רלוונטי
+        with self._lock:
+            self._answer = ""
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, **kwargs) -> None:
+        with self._lock:
+            self._answer = ""
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if token:
+            with self._lock:
+                self._answer += token
+            self._schedule()
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs) -> None:
+        with self._lock:
+            self._progress.append(f"⚙️ {serialized.get('name', 'tool')}...")
+        self._schedule()
+
+    # --- עריכות (לולאת האירועים) ---
+
+    def _render(self) -> str:
+        with self._lock:
+            lines = list(self._progress)
+            if self._answer:
+                lines.append(self._answer)
+        text = "\n".join(lines)
+        if not text:
+            return ""
+        text += CURSOR
+        if len(text) > TELEGRAM_MESSAGE_LIMIT:
+            # בזמן ההזרמה מוצג הסוף - ההמשך יגיע בהודעות נפרדות ב-finish
+            text = "…" + text[-(TELEGRAM_MESSAGE_LIMIT - 1):]
+        return text
+
+    def _schedule(self) -> None:
+        """תזמון עריכה אחת אם אין כבר עריכה שממתינה"""
+        with self._lock:
+            if self._closed or self._pending is not None:
+                return
+            self._pending = asyncio.run_coroutine_threadsafe(self._flush(), self.loop)
+
+    async def _flush(self) -> None:
+        wait = self._last_edit + self.min_interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        with self._lock:
+            self._pending = None
+            if self._closed:
+                return
+        text = self._render()
+        if text and text != self._sent:
+            try:
+                await self._edit(text)
+            except Exception as e:
+                # עריכת ביניים שנכשלה לא עוצרת את הסוכן; finish ינסה שוב עם התשובה המלאה
+                logger.debug(f"Error editing streamed message: {e}")
+
+    async def _edit(self, text: str) -> bool:
+        """עריכת ההודעה; False אם טלגרם ביקש להאט"""
+        try:
+            await self.bot.edit_message_text(text=text, chat_id=self.chat_id, message_id=self.message_id)
+            self.edits += 1
+        except RetryAfter as e:
+            # העריכה הבאה תחכה כמה שטלגרם ביקש
+            logger.debug(f"Telegram throttled message edits, retry after {e.retry_after}s")
+            self._last_edit = time.monotonic() + float(e.retry_after)
+            return False
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
+        self._sent = text
+        self._last_edit = time.monotonic()
+        return True
+
+    async def finish(self, text: str) -> None:
+        """הצגת התשובה הסופית במקום ההודעה; מה שחורג מאורך הודעה נשלח בהודעות נוספות"""
+        with self._lock:
+            self._closed = True
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.cancel()
+        first, *rest = split_message(text or "…")
+        try:
+            for _ in range(2):
+                # ניסיון שני רק אם טלגרם ביקש להאט
+                wait = self._last_edit + self.min_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                if await self._edit(first):
+                    break
+            else:
+                raise RuntimeError("message edits are throttled")
+        except Exception as e:
+            logger.warning(f"Could not edit the streamed message, sending the answer instead: {e}")
+            rest.insert(0, first)
+        for part in rest:
+            await self.bot.send_message(chat_id=self.chat_id, text=part)
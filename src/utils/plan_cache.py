@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from .intent_router import normalize_message
+from .tool_retriever import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class PlannedCall(NamedTuple):
+    tool: str
+    args: Dict[str, Any]
+
+
+def plan_key(text: str) -> str:
+    """מפתח למטמון: ההודעה אחרי ניקוי, בלי מילות נימוס ואותיות שימוש
+
+    כך "הצג את המכירות שלי" ו"מכירות" מקבלות אותו מפתח, אבל שמות מוצרים,
+    מספרי הזמנות וכו' נשארים חלק מהמפתח.
+    """
+    return " ".join(tokenize(text))
+
+
+def _flatten(text: str) -> str:
+    return " ".join(str(text).split())
+
+
+def _sent_in_full(observation: str, full_outputs: Sequence[str]) -> bool:
+    """פלט שנחתך לפני המודל (השורה האחרונה היא הערת הקיצור) ונשלח למשתמש במלואו"""
+    if "\n" not in observation:
+        return False
+    shown = observation.rsplit("\n", 1)[0]
+    return any(full != observation and full.startswith(shown) for full in full_outputs)
+
+
+def tools_fingerprint(tools: Sequence) -> str:
+    """טביעת אצבע של סט הכלים (שמות, תיאורים וסכמות) - שינוי בכלים מבטל את התוכניות השמורות"""
+    signature = [[tool.name, tool.description, tool.args] for tool in tools]
+    return hashlib.sha256(json.dumps(signature, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+class PlanCache:
+    """מטמון תוכניות לשאלות קריאה-בלבד שחוזרות על עצמן ("מה המכירות שלי")
+
+    אחרי ריצה של הסוכן נשמרת התוכנית שבחר - אילו כלים ועם אילו ארגומנטים -
+    בתנאי שכל הכלים הם לקריאה בלבד, שאף כלי לא נכשל, ושכל ארגומנט מופיע
+    בהודעה עצמה (בקשה כמו "תראה לי את ההזמנות שלו" תלויה בהקשר השיחה ולא
+    נשמרת). בנוסף, הפלט של כל כלי חייב להגיע למשתמש כמו שהוא - בתוך התשובה
+    של הסוכן, או כפלט מלא שנחתך לפני המודל ונשלח ישירות למשתמש: תשובה
+    שהמודל הסיק מהפלט ("מה המוצר הכי יקר") לא ניתנת לשחזור מהפלט לבדו.
+    כשאותה שאלה חוזרת, התוכנית מורצת שוב ישירות מול הכלים -
+    תוצאות טריות, בלי אף קריאה למודל. התוכניות נשמרות יחד עם טביעת האצבע
+    של סט הכלים, ושינוי בכלים מוחק אותן.
+    """
+
+    def __init__(self, tools: Sequence, read_only: Iterable[str], max_entries: int = 256,
+                 path: Optional[str] = None):
+        """
+        Args:
+            tools: הכלים שהתוכניות מריצות (לחישוב טביעת האצבע)
+            read_only: שמות הכלים שמותר לשמור ולהריץ מחדש
+            max_entries: מספר תוכניות מקסימלי (LRU)
+            path: קובץ JSON לשמירת התוכניות בין הפעלות (אופציונלי)
+        """
+        self.fingerprint = tools_fingerprint(tools)
+        self.read_only = set(read_only)
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._plans: "OrderedDict[str, List[PlannedCall]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def get(self, text: str) -> Optional[List[PlannedCall]]:
+        """התוכנית השמורה להודעה, או None"""
+        key = plan_key(text)
+        with self._lock:
+            plan = self._plans.get(key) if key else None
+            if plan is None:
+                self.misses += 1
+            else:
+                self._plans.move_to_end(key)
+                self.hits += 1
+            hits, misses = self.hits, self.misses
+        logger.info(f"Plan cache {'miss' if plan is None else 'hit'} for {key!r} "
+                    f"({hits} hits, {misses} misses, hit rate {hits / (hits + misses):.0%})")
+        return plan
+
+    def record(self, text: str, steps: Sequence, output: str, full_outputs: Sequence[str] = ()) -> bool:
+        """שמירת התוכנית מתוך intermediate_steps של ריצת הסוכן, אם היא ניתנת להרצה חוזרת
+
+        Args:
+            text: הודעת המשתמש
+            steps: intermediate_steps של הריצה
+            output: התשובה הסופית של הסוכן
+            full_outputs: הפלטים המלאים שנשלחו ישירות למשתמש (TokenBudget.collect)
+        """
+        key = plan_key(text)
+        if not key or not steps:
+            return False
+        message = normalize_message(text).lower()
+        answer = _flatten(output)
+        plan = []
+        for action, observation in steps:
+            args = action.tool_input if isinstance(action.tool_input, dict) else None
+            if action.tool not in self.read_only or args is None:
+                return False
+            if str(observation).startswith(("שגיאה", "ארגומנטים לא תקינים")):
+                return False
+            passed_through = _flatten(observation) and _flatten(observation) in answer
+            if not passed_through and not _sent_in_full(str(observation), full_outputs):
+                # המודל עיבד את הפלט - הרצה חוזרת של הכלים לא תיתן את אותה תשובה
+                return False
+            if any(str(value).lower() not in message for value in args.values() if value not in (None, "")):
+                # ארגומנט שלא מופיע בהודעה הגיע מההקשר של השיחה
+                return False
+            call = PlannedCall(action.tool, dict(args))
+            if call not in plan:
+                plan.append(call)
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        logger.debug(f"Cached plan for {key!r}: {[call.tool for call in plan]}")
+        if self.path:
+            self._save()
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._plans.clear()
+        if self.path:
+            self._save()
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read plan cache {self.path}: {e}")
+            return
+        if data.get("fingerprint") != self.fingerprint:
+            logger.info("Tool set changed, discarding cached plans")
+            return
+        for key, calls in data.get("plans", {}).items():
+            self._plans[key] = [PlannedCall(tool, args) for tool, args in calls]
+
+    def _save(self) -> None:
+        with self._lock:
+            data = {"fingerprint": self.fingerprint,
+                    "plans": {key: [list(call) for call in plan] for key, plan in self._plans.items()}}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save plan cache {self.path}: {e}")
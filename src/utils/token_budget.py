@@ -0,0 +1,161 @@
+import math
+import logging
+import contextvars
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # אופציונלי - בלעדיו הספירה היא הערכה לפי אורך הטקסט
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# הקידוד של מודלי GPT-4
+TOKEN_ENCODING = "cl100k_base"
+
+# מה שהמודל מקבל במקום פלט ישן שנחתך מה-scratchpad
+DROPPED_OBSERVATION = "(הפלט של הכלי הושמט כדי לחסוך מקום. אם צריך אותו שוב, יש להריץ את הכלי מחדש)"
+
+# הפלטים המלאים של הכלים שנחתכו בהרצה הנוכחית של הסוכן
+_full_outputs: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("full_tool_outputs", default=None)
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        # הקידוד נטען מהרשת בפעם הראשונה - בלי גישה ממשיכים עם הערכה
+        logger.warning(f"Could not load the {TOKEN_ENCODING} encoding, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """מספר הטוקנים בטקסט (הערכה שמרנית לפי אורך אם tiktoken לא זמין)"""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # עברית יוצאת בערך טוקן לכל 1-2 תווים
+    return math.ceil(len(text) / 2)
+
+
+class TokenBudget:
+    """תקציב טוקנים לסוכן: פלט כלים, ה-scratchpad של הריצה וזיכרון השיחה
+
+    פלט כלי שחורג מ-tool_output_tokens נחתך לשורות הראשונות עבור המודל,
+    והטקסט המלא נאסף (collect) כדי לשלוח אותו ישירות למשתמש - המודל מסכם
+    במקום להעתיק רשימה ארוכה. בתוך ריצה, פלטים ישנים שחורגים מ-scratchpad_tokens
+    מוחלפים בהודעה קצרה, והזיכרון נחתך מההחלפות הישנות עד memory_tokens.
+    ערך 0 מבטל את ההגבלה המתאימה.
+    """
+
+    def __init__(self, tool_output_tokens: int = 400, scratchpad_tokens: int = 3000, memory_tokens: int = 2000):
+        """
+        Args:
+            tool_output_tokens: טוקנים מקסימליים לפלט של כלי שחוזר למודל
+            scratchpad_tokens: טוקנים מקסימליים לכל פלטי הכלים בריצה אחת
+            memory_tokens: טוקנים מקסימליים להיסטוריית השיחה
+        """
+        self.tool_output_tokens = tool_output_tokens
+        self.scratchpad_tokens = scratchpad_tokens
+        self.memory_tokens = memory_tokens
+        self.truncated = 0
+        self.tokens_saved = 0
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "TokenBudget":
+        """יצירת תקציב מתוך מילון ההגדרות של load_config"""
+        return cls(tool_output_tokens=config['TOOL_OUTPUT_MAX_TOKENS'],
+                   scratchpad_tokens=config['AGENT_SCRATCHPAD_MAX_TOKENS'],
+                   memory_tokens=config['MEMORY_MAX_TOKENS'])
+
+    def truncate(self, text: str) -> Tuple[str, bool]:
+        """קיצור פלט לתקציב של כלי: שורות שלמות מההתחלה והערה כמה הושמטו"""
+        if not self.tool_output_tokens or count_tokens(text) <= self.tool_output_tokens:
+            return text, False
+        lines = text.split("\n")
+        kept: List[str] = []
+        used = 0
+        for line in lines:
+            used += count_tokens(line) + 1
+            if used > self.tool_output_tokens:
+                break
+            kept.append(line)
+        if not kept:
+            # שורה אחת ארוכה מדי - חיתוך לפי תווים
+            kept = [lines[0][:self.tool_output_tokens]]
+        note = (f"… (הוצגו {len(kept)} מתוך {len(lines)} שורות. "
+                f"הפלט המלא נשלח ישירות למשתמש - אין לחזור עליו, רק לסכם או לענות על השאלה)")
+        return "\n".join(kept + [note]), True
+
+    def wrap_tools(self, tools: Sequence) -> List:
+        """עותקים של הכלים שהפלט שלהם עובר דרך truncate; הכלים המקוריים לא משתנים"""
+        if not self.tool_output_tokens:
+            return list(tools)
+        return [tool.model_copy(update={"func": self._wrap(tool.name, tool.func)}) for tool in tools]
+
+    def _wrap(self, name: str, func):
+        @wraps(func)
+        def budgeted(*args, **kwargs):
+            output = func(*args, **kwargs)
+            if not isinstance(output, str):
+                return output
+            short, truncated = self.truncate(output)
+            if truncated:
+                saved = count_tokens(output) - count_tokens(short)
+                self.truncated += 1
+                self.tokens_saved += saved
+                logger.debug(f"Tool {name} output truncated for the model ({saved} tokens saved)")
+                collected = _full_outputs.get()
+                if collected is not None and output not in collected:
+                    collected.append(output)
+            return short
+        return budgeted
+
+    @contextmanager
+    def collect(self) -> Iterator[List[str]]:
+        """איסוף הפלטים המלאים שנחתכו בזמן ריצת הסוכן (בתוך אותו context)"""
+        outputs: List[str] = []
+        token = _full_outputs.set(outputs)
+        try:
+            yield outputs
+        finally:
+            _full_outputs.reset(token)
+
+    def trim_steps(self, steps: List[Tuple]) -> List[Tuple]:
+        """trim_intermediate_steps של AgentExecutor: הפלטים האחרונים נשמרים, ישנים מוחלפים
+
+        הצעדים עצמם לא נמחקים - כל קריאה לכלי חייבת תשובה תואמת בהודעות למודל.
+        """
+        if not self.scratchpad_tokens:
+            return steps
+        trimmed = []
+        used = 0
+        for action, observation in reversed(steps):
+            used += count_tokens(str(observation))
+            if used > self.scratchpad_tokens and trimmed:
+                observation = DROPPED_OBSERVATION
+            trimmed.append((action, observation))
+        trimmed.reverse()
+        return trimmed
+
+    def trim_memory(self, memory) -> int:
+        """מחיקת ההחלפות הישנות בזיכרון עד שההיסטוריה בתקציב; מחזיר כמה הודעות נמחקו"""
+        if not self.memory_tokens:
+            return 0
+        messages = list(memory.chat_memory.messages)
+        sizes = [count_tokens(str(message.content)) for message in messages]
+        dropped = 0
+        # ההחלפה האחרונה (שאלה ותשובה) נשארת תמיד
+        while len(messages) - dropped > 2 and sum(sizes[dropped:]) > self.memory_tokens:
+            dropped += 2
+        if dropped:
+            memory.chat_memory.messages = messages[dropped:]
+            logger.debug(f"Dropped {dropped} old messages from conversation memory (token budget)")
+        return dropped
@@ -0,0 +1,196 @@
+import re
+import math
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from .intent_router import _NOT_A_NAME, DEFAULT_RULES, IntentRule, normalize_message
+
+logger = logging.getLogger(__name__)
+
+_HEBREW_WORD = re.compile(r"[א-ת]{2,}")
+_WORD = re.compile(r"[א-תa-z0-9]+")
+
+# ה הידיעה ו-ו החיבור בתחילת מילה, וסיומות ריבוי ונקבה נפוצות. שאר אותיות
+# השימוש (ב/ל/מ/ש/כ) הן לעתים קרובות חלק מהשורש ("מלאי", "שנה"), ולכן לא מוסרות
+_PREFIXES = ("וה", "ו", "ה")
+_SUFFIXES = ("ים", "ות", "ה", "ת")
+# אורך מינימלי של מה שנשאר אחרי הסרת תחילית או סיומת
+_MIN_STEM = 3
+
+# המשאב שכלי עובד עליו לפי שמו - הספציפי קודם ("get_low_stock_products" הוא כלי מלאי)
+_RESOURCES = (
+    ("stock", "stock"), ("categor", "category"), ("coupon", "coupon"), ("order", "order"),
+    ("customer", "customer"), ("product", "product"), ("price", "product"), ("discount", "product"),
+)
+
+# מילים שמופיעות כמעט בכל בקשה ולא עוזרות להבדיל בין כלים
+STOP_WORDS = {
+    "את", "של", "על", "עם", "לי", "כל", "אני", "רוצה", "צריך", "בבקשה", "תודה", "אפשר", "מה", "זה",
+    "הצג", "תציג", "הראה", "תראה", "מציג", "חדש", "חדשה", "אנא", "שלי", "יש", "בחנות", "החנות",
+}
+
+# מילות מפתח לכל כלי, מעבר לתיאור שלו - ניסוחים שמשתמשים כותבים בפועל
+TOOL_HINTS: Dict[str, str] = {
+    "list_products": "מוצרים קטלוג פריטים רשימת מוצרים",
+    "create_product": "צור מוצר הוסף מוצר פריט חדש",
+    "edit_product": "ערוך מוצר שנה שם תיאור עדכן מוצר",
+    "delete_product": "מחק מוצר הסר מוצר",
+    "get_product_details": "פרטי מוצר מידע על מוצר",
+    "update_price": "מחיר שנה מחיר הורד מחיר העלה מחיר אחוז שקל",
+    "remove_discount": "מבצע הנחה בטל מבצע הסר הנחה",
+    "get_sales": "מכירות הכנסות כמה מכרתי דוח",
+    "create_coupon": "קופון צור קופון קוד הנחה",
+    "list_coupons": "קופונים קודי הנחה",
+    "edit_coupon": "ערוך קופון שנה קופון תוקף",
+    "delete_coupon": "מחק קופון בטל קופון",
+    "list_orders": "הזמנות רשימת הזמנות",
+    "get_order_details": "הזמנה פרטי הזמנה מספר הזמנה",
+    "update_order_status": "סטטוס הזמנה עדכן הזמנה הושלמה בוטלה בטיפול משלוח",
+    "search_orders": "חפש הזמנות הזמנות של לקוח תאריך",
+    "create_order": "צור הזמנה הזמנה חדשה",
+    "list_categories": "קטגוריות",
+    "create_category": "צור קטגוריה קטגוריה חדשה",
+    "update_category": "ערוך קטגוריה שנה קטגוריה",
+    "delete_category": "מחק קטגוריה",
+    "assign_product_to_categories": "שייך מוצר לקטגוריה העבר קטגוריה",
+    "list_customers": "לקוחות",
+    "get_customer_details": "פרטי לקוח לקוח",
+    "update_customer": "עדכן לקוח שנה טלפון כתובת אימייל",
+    "search_customers": "חפש לקוח",
+    "create_customer": "צור לקוח לקוח חדש רשום לקוח",
+    "get_low_stock_products": "מלאי נמוך נגמרים אוזלים",
+    "update_product_stock": "מלאי עדכן מלאי הוסף למלאי הורד מהמלאי יחידות כמות",
+    "get_product_stock_status": "מלאי כמה יש במלאי סטטוס מלאי",
+    "manage_product_stock_by_attributes": "מלאי לפי מאפיינים צבע מידה וריאציות",
+    "set_product_low_stock_threshold": "סף התראה מלאי נמוך",
+}
+
+
+def _variants(word: str) -> List[str]:
+    """המילה, ובנוסף לה בלי ה/ו בתחילתה ובלי סיומת - כך ש"המוצרים" ו"מוצר" נפגשים
+
+    הסיומת מוסרת גם מהמילה המקורית וגם מהמילה בלי התחילית: ה' שהיא חלק
+    מהשורש ("הזמנות") לא נבדלת מה' הידיעה ("ההזמנה"), וכך שתי הצורות
+    נפגשות ב"הזמנ".
+    """
+    variants = [word]
+    stem = word
+    for prefix in _PREFIXES:
+        if stem.startswith(prefix) and len(stem) - len(prefix) >= _MIN_STEM:
+            stem = stem[len(prefix):]
+            variants.append(stem)
+            break
+    for base in (word, stem):
+        for suffix in _SUFFIXES:
+            if base.endswith(suffix) and len(base) - len(suffix) >= _MIN_STEM:
+                variants.append(base[:-len(suffix)])
+                break
+    return list(dict.fromkeys(variants))
+
+
+def tokenize(text: str) -> List[str]:
+    terms = []
+    for word in _WORD.findall(normalize_message(text).lower().replace("_", " ")):
+        if word in STOP_WORDS:
+            continue
+        terms.extend(_variants(word))
+    return terms
+
+
+def router_hints(rules: Iterable[IntentRule] = DEFAULT_RULES) -> Dict[str, str]:
+    """המילים העבריות מתבניות הניתוב - כל ניסוח שהנתב מכיר מצביע גם על הכלי שלו"""
+    hints: Dict[str, List[str]] = {}
+    for rule in rules:
+        # בלי הפעלים שהתבנית דוחה אחרי שם מוצר - הם לא מתארים את הכלי
+        pattern = rule.pattern.pattern.replace(_NOT_A_NAME, "")
+        hints.setdefault(rule.tool, []).extend(_HEBREW_WORD.findall(pattern))
+    return {tool: " ".join(words) for tool, words in hints.items()}
+
+
+def _tool_resource(name: str) -> Optional[str]:
+    """המשאב של הכלי (product / order / coupon ...), או None לכלי כללי כמו get_sales"""
+    for marker, resource in _RESOURCES:
+        if marker in name:
+            return resource
+    return None
+
+
+def _tool_text(tool) -> str:
+    parts = [tool.name, tool.description or ""]
+    schema = getattr(tool, "args_schema", None)
+    fields = getattr(schema, "model_fields", {}) if schema is not None else {}
+    parts.extend(field.description or "" for field in fields.values())
+    return " ".join(parts)
+
+
+class ToolRetriever:
+    """בחירת הכלים הרלוונטיים להודעה (TF-IDF מקומי, בלי קריאה למודל)
+
+    כל כלי מיוצג בשמו, בתיאור שלו ובתיאורי הארגומנטים, במילות המפתח של
+    TOOL_HINTS ובמילים מתבניות הניתוב של IntentRouter. ההודעה מדורגת מול
+    כולם ב-cosine similarity, ורק הכלים המובילים (עד top_k) עם ציון חיובי
+    נשלחים לסוכן. המקומות הפנויים מתמלאים בשאר הכלים של המשאב של הכלי
+    המוביל (כל כלי ההזמנות כשכלי הזמנות מוביל) ולא בכלים שלא קשורים להודעה.
+    הודעה שלא מתאימה לאף כלי (למשל "כן, תמחק אותו" בהמשך שיחה) מקבלת את כל
+    הכלים, כדי שהסוכן לא יישאר בלי הכלי הנכון.
+    """
+
+    def __init__(self, tools: Sequence, top_k: int = 8, min_score: float = 0.05,
+                 hints: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            tools: כל הכלים של הסוכן
+            top_k: כמה כלים לשלוח (0 - תמיד את כולם)
+            min_score: ציון מינימלי של הכלי המוביל; מתחתיו נשלחים כל הכלים
+            hints: מילות מפתח נוספות לכל כלי (ברירת מחדל: TOOL_HINTS ותבניות הניתוב)
+        """
+        self.tools = list(tools)
+        self.top_k = top_k
+        self.min_score = min_score
+        if hints is None:
+            routed = router_hints()
+            hints = {name: f"{TOOL_HINTS.get(name, '')} {routed.get(name, '')}" for name in TOOL_HINTS.keys() | routed.keys()}
+        self.hints = hints
+        self.selected = 0
+        self.fallbacks = 0
+
+        documents = [Counter(tokenize(f"{_tool_text(tool)} {hints.get(tool.name, '')}")) for tool in self.tools]
+        document_frequency = Counter(term for document in documents for term in document)
+        count = len(documents)
+        self._idf = {term: math.log((1 + count) / (1 + df)) + 1 for term, df in document_frequency.items()}
+        self._vectors = [self._weigh(document) for document in documents]
+
+    def _weigh(self, terms: Counter) -> Dict[str, float]:
+        vector = {term: (1 + math.log(tf)) * self._idf[term] for term, tf in terms.items() if term in self._idf}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    def scores(self, message: str) -> List[float]:
+        query = self._weigh(Counter(tokenize(message)))
+        return [sum(weight * vector.get(term, 0.0) for term, weight in query.items()) for vector in self._vectors]
+
+    def select(self, message: str) -> List:
+        """הכלים שיישלחו לסוכן עבור ההודעה"""
+        if not self.top_k or self.top_k >= len(self.tools):
+            return self.tools
+        scores = self.scores(message)
+        ranked = sorted(range(len(self.tools)), key=lambda i: scores[i], reverse=True)
+        if scores[ranked[0]] < self.min_score:
+            self.fallbacks += 1
+            logger.debug("No tool matched the message, sending all tools")
+            return self.tools
+        self.selected += 1
+        chosen_ids = [i for i in ranked[:self.top_k] if scores[i] > 0]
+        # כלי עם ציון 0 לא קשור להודעה - במקומו, כלים נוספים של אותו משאב כמו הכלי המוביל
+        resource = _tool_resource(self.tools[ranked[0]].name)
+        if resource is not None:
+            for i, tool in enumerate(self.tools):
+                if len(chosen_ids) >= self.top_k:
+                    break
+                if i not in chosen_ids and _tool_resource(tool.name) == resource:
+                    chosen_ids.append(i)
+        # בסדר המקורי, כך שאותה קבוצת כלים נותנת תמיד אותו פרומפט
+        chosen = [self.tools[i] for i in sorted(chosen_ids)]
+        logger.debug(f"Selected tools: {[tool.name for tool in chosen]}")
+        return chosen
@@ -0,0 +1,179 @@
+"""
+סכמות הארגומנטים של כלי הסוכן.
+
+כל כלי מקבל ארגומנטים מוקלדים (JSON schema) שהמודל ממלא ישירות ב-function
+calling, במקום מחרוזת חופשית שהכלי מפרק בעצמו. התיאורים כאן הם מה שהמודל
+רואה, ולכן הם בעברית כמו שאר תיאורי הכלים.
+"""
+
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+OrderStatus = Literal["pending", "processing", "on-hold", "completed", "cancelled", "refunded", "failed"]
+
+
+class NoArgs(BaseModel):
+    """כלי בלי ארגומנטים"""
+
+
+class ProductNameArgs(BaseModel):
+    product_name: str = Field(description="שם המוצר (או חלק ממנו)")
+
+
+class UpdatePriceArgs(BaseModel):
+    product_name: str = Field(description="שם המוצר")
+    new_price: Optional[float] = Field(None, description="מחיר חדש בשקלים")
+    discount_percent: Optional[float] = Field(None, description="אחוז הורדה מהמחיר הנוכחי (במקום מחיר חדש)")
+
+
+class CreateProductArgs(BaseModel):
+    name: str = Field(description="שם המוצר")
+    regular_price: float = Field(description="מחיר בשקלים")
+    description: str = Field("", description="תיאור המוצר")
+    stock_quantity: Optional[int] = Field(None, description="כמות במלאי")
+
+
+class EditProductArgs(BaseModel):
+    product_name: str = Field(description="שם המוצר הקיים")
+    name: Optional[str] = Field(None, description="שם חדש")
+    description: Optional[str] = Field(None, description="תיאור חדש")
+    regular_price: Optional[float] = Field(None, description="מחיר חדש")
+    stock_quantity: Optional[int] = Field(None, description="כמות חדשה במלאי")
+
+
+class CreateCouponArgs(BaseModel):
+    code: str = Field(description="קוד הקופון")
+    discount_type: Literal["percent", "fixed_cart"] = Field(description="percent - אחוזים, fixed_cart - סכום קבוע")
+    amount: float = Field(description="גובה ההנחה")
+    description: Optional[str] = Field(None, description="תיאור")
+    expiry_date: Optional[str] = Field(None, description="תאריך תפוגה YYYY-MM-DD")
+    min_amount: Optional[float] = Field(None, description="סכום הזמנה מינימלי")
+    max_amount: Optional[float] = Field(None, description="סכום הזמנה מקסימלי")
+
+
+class EditCouponArgs(BaseModel):
+    code: str = Field(description="הקוד הנוכחי של הקופון")
+    new_code: Optional[str] = Field(None, description="קוד חדש")
+    discount_type: Optional[Literal["percent", "fixed_cart"]] = Field(None, description="סוג הנחה חדש")
+    amount: Optional[float] = Field(None, description="גובה הנחה חדש")
+    description: Optional[str] = Field(None, description="תיאור חדש")
+    expiry_date: Optional[str] = Field(None, description="תאריך תפוגה חדש YYYY-MM-DD")
+    min_amount: Optional[float] = Field(None, description="סכום הזמנה מינימלי חדש")
+    max_amount: Optional[float] = Field(None, description="סכום הזמנה מקסימלי חדש")
+
+
+class CouponCodeArgs(BaseModel):
+    code: str = Field(description="קוד הקופון")
+
+
+class ListOrdersArgs(BaseModel):
+    status: Optional[OrderStatus] = Field(None, description="סינון לפי סטטוס (ריק - כל ההזמנות)")
+
+
+class OrderIdArgs(BaseModel):
+    order_id: int = Field(description="מספר ההזמנה")
+
+
+class UpdateOrderStatusArgs(BaseModel):
+    order_id: int = Field(description="מספר ההזמנה")
+    status: OrderStatus = Field(description="הסטטוס החדש")
+
+
+class SearchOrdersArgs(BaseModel):
+    search_term: Optional[str] = Field(None, description="טקסט חופשי לחיפוש")
+    customer_id: Optional[int] = Field(None, description="מזהה לקוח")
+    status: Optional[OrderStatus] = Field(None, description="סטטוס")
+    date_from: Optional[str] = Field(None, description="מתאריך YYYY-MM-DD")
+    date_to: Optional[str] = Field(None, description="עד תאריך YYYY-MM-DD")
+
+
+class OrderItem(BaseModel):
+    product_id: int = Field(description="מזהה המוצר")
+    quantity: int = Field(1, description="כמות")
+
+
+class CreateOrderArgs(BaseModel):
+    first_name: str = Field(description="שם פרטי")
+    last_name: str = Field(description="שם משפחה")
+    email: str = Field(description="אימייל")
+    phone: str = Field(description="טלפון")
+    address: str = Field(description="כתובת")
+    city: str = Field(description="עיר")
+    postcode: str = Field(description="מיקוד")
+    items: List[OrderItem] = Field(description="המוצרים בהזמנה")
+    shipping_method: Optional[str] = Field(None, description="שיטת משלוח")
+
+
+class CreateCategoryArgs(BaseModel):
+    name: str = Field(description="שם הקטגוריה")
+    description: str = Field("", description="תיאור")
+    parent_name: Optional[str] = Field(None, description="שם קטגוריית האב")
+
+
+class UpdateCategoryArgs(BaseModel):
+    category_name: str = Field(description="שם הקטגוריה הקיימת")
+    new_name: Optional[str] = Field(None, description="שם חדש")
+    description: Optional[str] = Field(None, description="תיאור חדש")
+    parent_name: Optional[str] = Field(None, description="שם קטגוריית האב החדשה")
+
+
+class CategoryNameArgs(BaseModel):
+    category_name: str = Field(description="שם הקטגוריה")
+
+
+class AssignCategoriesArgs(BaseModel):
+    product_name: str = Field(description="שם המוצר")
+    category_names: List[str] = Field(description="שמות הקטגוריות")
+
+
+class CustomerQueryArgs(BaseModel):
+    customer_info: str = Field(description="שם או אימייל של הלקוח")
+
+
+class UpdateCustomerArgs(BaseModel):
+    customer: str = Field(description="מזהה, שם או אימייל של הלקוח")
+    first_name: Optional[str] = Field(None, description="שם פרטי חדש")
+    last_name: Optional[str] = Field(None, description="שם משפחה חדש")
+    email: Optional[str] = Field(None, description="אימייל חדש")
+    phone: Optional[str] = Field(None, description="טלפון חדש")
+    address: Optional[str] = Field(None, description="כתובת חדשה")
+    city: Optional[str] = Field(None, description="עיר חדשה")
+    postcode: Optional[str] = Field(None, description="מיקוד חדש")
+
+
+class SearchCustomersArgs(BaseModel):
+    search_query: str = Field(description="טקסט חופשי לחיפוש")
+
+
+class CreateCustomerArgs(BaseModel):
+    first_name: str = Field(description="שם פרטי")
+    last_name: str = Field(description="שם משפחה")
+    email: str = Field(description="אימייל")
+    phone: Optional[str] = Field(None, description="טלפון")
+    address: Optional[str] = Field(None, description="כתובת")
+    city: Optional[str] = Field(None, description="עיר")
+    postcode: Optional[str] = Field(None, description="מיקוד")
+
+
+class UpdateStockArgs(BaseModel):
+    product_name: str = Field(description="שם המוצר")
+    operation: Literal["set", "add", "subtract"] = Field(
+        description="set - קביעת כמות מדויקת, add - הוספה למלאי, subtract - הורדה מהמלאי")
+    quantity: int = Field(description="הכמות")
+
+
+class AttributeStock(BaseModel):
+    attribute: str = Field(description="שם המאפיין, למשל צבע או מידה")
+    value: str = Field(description="ערך המאפיין, למשל כחול או M")
+    quantity: int = Field(description="הכמות במלאי")
+
+
+class AttributeStockArgs(BaseModel):
+    product_name: str = Field(description="שם המוצר")
+    stock: List[AttributeStock] = Field(description="כמות לכל ערך מאפיין")
+
+
+class LowStockThresholdArgs(BaseModel):
+    product_name: str = Field(description="שם המוצר")
+    threshold: int = Field(description="סף ההתראה ביחידות")